@@ -0,0 +1,107 @@
+"""Ders tablosu parser benchmark'ı: eski BeautifulSoup yolu vs lxml parser
+
+Kullanım: python benchmarks/bench_parser.py [--repeat 20]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TELEGRAM_TOKEN', 'benchmark')  # bot.py import'u için
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+import bot  # noqa: E402
+
+HEADER = [
+    "CRN", "Ders Kodu", "Ders", "Öğretim Yöntemi", "Eğitmen", "Bina", "Gün", "Saat",
+    "Derslik", "Kontenjan", "Yazılan", "Rezervasyon", "Sınıf Restriksiyonu", "Önşartlar",
+    "Major Restriksiyonu",
+]
+DAYS = ["Pazartesi", "Salı", "Çarşamba", "Perşembe", "Cuma"]
+
+
+def generate_page(row_count, seed=42, indent=False):
+    """OBS DersProgramSearch sayfasına benzeyen HTML üret (sayfa iskeleti + ders tablosu)
+
+    indent=True: sunucu şablonundan çıkmış gibi her satır/hücre ayrı satırda ve girintili
+    (hücreler arası boşluk metinleri parser'ın ve akış taramasının gördüğü gibi olur).
+    """
+    rnd = random.Random(seed)
+    row_sep, cell_sep = ('\n        ', '\n            ') if indent else ('', '')
+    parts = [
+        '<!DOCTYPE html><html lang="tr"><head><meta charset="utf-8"><title>Ders Programı</title>',
+        '<link rel="stylesheet" href="/Content/bootstrap.min.css">',
+        '<script>' + 'var obsConfig = {"lang": "tr"};' * 200 + '</script>',
+        '</head><body><nav class="navbar">' + '<a class="nav-link" href="#">Menü</a>' * 40 + '</nav>',
+        '<div class="container"><table id="dersProgramContainer" class="table table-bordered">',
+        '<thead><tr>' + ''.join(f'{cell_sep}<th>{h}</th>' for h in HEADER) + f'{row_sep}</tr></thead><tbody>',
+    ]
+    for i in range(row_count):
+        crn = 10000 + i * 7
+        capacity = rnd.choice([30, 40, 50, 60, 80, 100])
+        enrolled = min(capacity, rnd.randint(capacity - 10, capacity + 5))
+        day_a, day_b = rnd.sample(DAYS, 2)
+        cells = [
+            f'<td>{crn}</td>',
+            f'<td><a href="/public/DersPlan/DersBilgi/{crn}">BLG {100 + i % 400}E</a></td>',
+            f'<td>Ders Adı Örneği {i} - Introduction to Something</td>',
+            '<td>Yüz yüze</td>',
+            f'<td>Dr. Öğr. Üyesi Ad Soyad {i % 37}<br>Prof. Dr. Diğer Hoca {i % 11}</td>',
+            '<td>EEB<br>EEB</td>', f'<td>{day_a}<br>{day_b}</td>', '<td>0830/1129<br>1330/1529</td>',
+            '<td>EEB 1302<br>EEB 5202</td>', f'<td>{capacity}</td>', f'<td>{enrolled}</td>',
+            '<td>Yok</td>', '<td>2. Sınıf, 3. Sınıf, 4. Sınıf</td>',
+            '<td>(BLG 102E MIN DD veya BLG 102 MIN DD)</td>', '<td>BLGE, BLG, YZVE</td>',
+        ]
+        parts.append(f'{row_sep}<tr>' + ''.join(cell_sep + cell for cell in cells) + f'{row_sep}</tr>')
+    parts.append('</tbody></table></div><footer>' + '<p>İTÜ Bilgi İşlem</p>' * 20 + '</footer></body></html>')
+    return "".join(parts).encode('utf-8')
+
+
+def legacy_parse(html):
+    """Eski search_course yolu: html.parser ile tüm ağaç + her satırda find_all/get_text"""
+    soup = BeautifulSoup(html.decode('utf-8'), 'html.parser')
+    table = soup.find('table', {'id': 'dersProgramContainer'}) or soup.find('table')
+    rows = []
+    for tr in table.find('tbody').find_all('tr'):
+        cells = tr.find_all('td')
+        if len(cells) < 11:
+            continue
+        rows.append([cell.get_text(strip=True) for cell in cells])
+    return rows
+
+
+def best_of(func, arg, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--sizes', default='50,200,600', help='virgülle ayrılmış satır sayıları')
+    args = parser.parse_args()
+
+    print(f"{'satır':>6} {'boyut':>9} {'bs4 (ms)':>10} {'lxml (ms)':>10} {'hızlanma':>9}")
+    for row_count in (int(size) for size in args.sizes.split(',')):
+        html = generate_page(row_count)
+
+        # İki yol da aynı CRN/kontenjan/yazılan değerlerini üretmeli
+        legacy = [(r[0], int(r[9]), int(r[10])) for r in legacy_parse(html)]
+        fast = [(r[bot.ROW_CRN], r[bot.ROW_CAPACITY], r[bot.ROW_ENROLLED]) for r in bot.parse_program_table(html)]
+        assert legacy == fast, "parser sonuçları uyuşmuyor"
+
+        legacy_time = best_of(legacy_parse, html, args.repeat)
+        fast_time = best_of(bot.parse_program_table, html, args.repeat)
+        print(f"{row_count:>6} {len(html) / 1024:>7.0f}KB {legacy_time * 1000:>10.2f} "
+              f"{fast_time * 1000:>10.2f} {legacy_time / fast_time:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""Takip kaydı benchmark'ı: eski {chat_id: [(program_code, crn), ...]} yapısı vs WatchRegistry
+
+Bellek tracemalloc ile ölçülür; iki yapı da aynı `KOD_CRN` mesajlarından kurulur, böylece eski
+yapının takip başına tuttuğu metin nesneleri de ölçüme girer. Ayrıca üyelik kontrolü, silme ve
+program → sohbet sorgusu süreleri.
+
+Kullanım: python benchmarks/bench_registry.py [--watches 10000,100000] [--per-chat 5]
+"""
+import argparse
+import gc
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TELEGRAM_TOKEN', 'benchmark')  # bot.py import'u için
+
+import bot  # noqa: E402
+
+logging.getLogger(bot.__name__).setLevel(logging.WARNING)  # program listesi logları tabloya karışmasın
+
+
+def generate_watches(watch_count, per_chat, seed=5):
+    """[(chat_id, "KOD_CRN"), ...] - kullanıcı mesajları; ayrıştırma kurulumun (ve ölçümün) parçası"""
+    rnd = random.Random(seed)
+    codes = sorted(bot.get_manual_program_list())
+    chat_count = max(1, watch_count // per_chat)
+    watches = []
+    for i in range(watch_count):
+        watches.append((500000 + i % chat_count, f"{rnd.choice(codes)}_{rnd.randint(10000, 39999)}"))
+    return watches
+
+
+def build_legacy(watches):
+    watched = {}
+    for chat_id, text in watches:
+        program_code, crn = text.split('_')
+        courses = watched.setdefault(chat_id, [])
+        if (program_code, crn) not in courses:
+            courses.append((program_code, crn))
+    return watched
+
+
+def build_registry(watches):
+    registry = bot.WatchRegistry()
+    for chat_id, text in watches:
+        program_code, crn = text.split('_')
+        registry.add(chat_id, program_code, crn)
+    return registry
+
+
+def measure(build, watches):
+    """(yapı, ayrılan bayt, kurulum süresi) - girdi listesi ölçüme dahil değil"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    structure = build(watches)
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return structure, size, elapsed
+
+
+def legacy_watchers(watched, program_code):
+    watchers = {}
+    for chat_id, courses in watched.items():
+        for watched_program, crn in courses:
+            if watched_program == program_code:
+                watchers.setdefault(crn, []).append(chat_id)
+    return watchers
+
+
+def per_op(func, items, repeat=1):
+    """İşlem başına süre; repeat > 1 ise en iyi tur (tek çekirdekli makinede gürültüyü eler)"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            func(*item)
+        elapsed = (time.perf_counter() - start) / len(items)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--watches', default='10000,100000', help='virgülle ayrılmış takip sayıları')
+    parser.add_argument('--per-chat', type=int, default=5, help='sohbet başına ortalama takip')
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=7, help='üyelik/sorgu ölçümlerinde en iyi tur sayısı')
+    args = parser.parse_args()
+
+    print(f"{'takip':>7} {'yapı':>9} {'bellek':>9} {'B/takip':>8} {'kurulum':>9} "
+          f"{'üyelik':>9} {'silme':>9} {'program→sohbet':>15}")
+    for watch_count in (int(count) for count in args.watches.split(',')):
+        watches = generate_watches(watch_count, args.per_chat)
+        rnd = random.Random(9)
+        sample = [(chat_id, *text.split('_')) for chat_id, text in (rnd.choice(watches) for _ in range(args.lookups))]
+        programs = [(program_code,) for _, program_code, _ in sample[:50]]
+
+        legacy, legacy_bytes, legacy_build = measure(build_legacy, watches)
+        registry, registry_bytes, registry_build = measure(build_registry, watches)
+        assert sum(len(courses) for courses in legacy.values()) == len(registry), "takip sayıları uyuşmuyor"
+        program_code = programs[0][0]
+        assert {crn: sorted(chat_ids) for crn, chat_ids in legacy_watchers(legacy, program_code).items()} == \
+            {crn: sorted(chat_ids) for crn, chat_ids in registry.watchers(program_code).items()}
+
+        rows = (
+            ("liste", legacy_bytes, legacy_build,
+             per_op(lambda chat_id, code, crn: (code, crn) in legacy.get(chat_id, ()), sample, args.repeat),
+             per_op(lambda chat_id, code, crn: (code, crn) in legacy[chat_id] and legacy[chat_id].remove((code, crn)),
+                    sample),
+             per_op(lambda code: legacy_watchers(legacy, code), programs, args.repeat)),
+            ("registry", registry_bytes, registry_build,
+             per_op(registry.contains, sample, args.repeat),
+             per_op(registry.remove, sample),
+             per_op(registry.watchers, programs, args.repeat)),
+        )
+        for name, size, build_s, contains_s, remove_s, watchers_s in rows:
+            print(f"{watch_count:>7} {name:>9} {size / 1024 / 1024:>7.1f}MB {size / watch_count:>8.0f} "
+                  f"{build_s * 1000:>7.0f}ms {contains_s * 1e9:>7.0f}ns {remove_s * 1e9:>7.0f}ns "
+                  f"{watchers_s * 1e6:>13.0f}µs")
+
+    # Sohbet başına hız sınırı durumu: eski sözlük hiç küçülmez, ChatActivity boşta kalanları atar
+    activity = bot.ChatActivity(ttl=0.0)
+    for chat_id in range(100000):
+        activity.touch(chat_id)
+    print(f"\nChatActivity (ttl=0): 100000 sohbet dokunuşu sonrası {len(activity)} girdi "
+          f"(eski LAST_REQUEST_TIME: 100000)")
+
+
+if __name__ == '__main__':
+    main()
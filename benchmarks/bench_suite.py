@@ -0,0 +1,311 @@
+"""Bot maliyet benchmark'ları: sentetik DersProgramSearch sayfaları ve sentetik takip nüfusları
+
+Varsayılan fixture'lar gerçek OBS kaydı değildir; bench_parser.generate_page ile sabit seed'le,
+sunucu şablonu gibi girintili üretilip benchmarks/fixtures altına yazılır. OBS'e erişilebilen bir
+makinede capture_obs.py aynı adlarla anonimleştirilmiş gerçek sayfaları kaydeder; sonuç JSON'unda
+her fixture'ın kaynağı (synthetic/captured) yazılır.
+
+Mikro: sayfa parser'ı, snapshot oluşturma, search_course'taki CRN araması, snapshot farkı.
+Makro: 1k/10k/100k takip get_manual_program_list'teki programlara dağıtılır; poller + bildirim
+yolu sahte OBS (fixture sayfaları) ve sahte Bot ile uçtan uca çalıştırılır.
+Sonuçlar commit'ler arası karşılaştırma için JSON olarak yazılır.
+
+Kullanım: python benchmarks/bench_suite.py [--watches 1000,10000,100000] [--output sonuc.json]
+          python benchmarks/bench_suite.py --write-fixtures   # fixture'ları yeniden üret
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+FIXTURE_DIR = os.path.join(BENCH_DIR, 'fixtures')
+sys.path.insert(0, REPO_DIR)
+TMP_DIR = tempfile.mkdtemp(prefix='bench_suite_')
+os.environ.setdefault('TELEGRAM_TOKEN', 'benchmark')  # bot.py import'u için
+os.environ.setdefault('LOG_LEVEL', 'WARNING')  # bot'un logları ölçümü değil terminali doldurur
+os.environ['WATCH_DB_PATH'] = os.path.join(TMP_DIR, 'watches.db')
+
+import httpx  # noqa: E402
+
+import bot  # noqa: E402
+
+# Fixture adı → satır sayısı (OBS'te küçük/orta/büyük bölüm sayfaları)
+FIXTURES = {'small': 40, 'medium': 200, 'large': 600}
+# Kontenjan, Yazılan, Rezervasyon hücreleri (aradaki boşluklar korunur)
+SEATS_RE = re.compile(rb'(<td>\s*)(\d+)(\s*</td>\s*<td>\s*)(\d+)(\s*</td>\s*<td>\s*Yok\s*</td>)')
+CAPTURED_MARKER = b'<!-- capture_obs.py'
+
+
+def fixture_path(name):
+    return os.path.join(FIXTURE_DIR, f'ders_program_{name}.html')
+
+
+def write_fixtures():
+    sys.path.insert(0, BENCH_DIR)
+    from bench_parser import generate_page
+
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    for name, row_count in FIXTURES.items():
+        html = generate_page(row_count, seed=row_count, indent=True)
+        with open(fixture_path(name), 'wb') as f:
+            f.write(html)
+        print(f"📝 {fixture_path(name)} ({row_count} satır, {len(html) / 1024:.0f}KB)")
+
+
+def load_fixtures():
+    pages = {}
+    for name in FIXTURES:
+        with open(fixture_path(name), 'rb') as f:
+            pages[name] = f.read()
+    return pages
+
+
+def churn_page(html, fraction, seed):
+    """Satırların bir kısmında yazılan sayısını azalt (kontenjan açılması/değişimi)"""
+    rnd = random.Random(seed)
+
+    def replace(match):
+        if rnd.random() >= fraction:
+            return match.group(0)
+        enrolled = max(0, int(match.group(4)) - rnd.randint(1, 3))
+        return b''.join(match.group(1, 2, 3) + (b'%d' % enrolled, match.group(5)))
+
+    return SEATS_RE.sub(replace, html)
+
+
+def timings(func, repeat):
+    """func'ı repeat kez çalıştır: {min_ms, median_ms}"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {"min_ms": round(min(samples) * 1000, 4), "median_ms": round(statistics.median(samples) * 1000, 4)}
+
+
+def run_micro(pages, repeat):
+    results = {}
+    for name, html in pages.items():
+        parsed = bot.parse_program_table(html)
+        snapshot = bot.ProgramSnapshot.from_parsed(parsed)
+        churned = bot.ProgramSnapshot.from_parsed(bot.parse_program_table(churn_page(html, 0.1, seed=1)))
+        crns = [row.crn for row in snapshot.rows]
+        lookups = crns * max(1, 10000 // len(crns))
+
+        def lookup_all():
+            for crn in lookups:
+                bot.check_course('BLG', crn, snapshot)
+
+        lookup = timings(lookup_all, repeat)
+        results[name] = {
+            "rows": len(parsed),
+            "bytes": len(html),
+            "parse": timings(lambda: bot.parse_program_table(html), repeat),
+            "snapshot_build": timings(lambda: bot.ProgramSnapshot.from_parsed(parsed), repeat),
+            "crn_lookup_ns": round(lookup["median_ms"] * 1e6 / len(lookups), 1),
+            "diff": timings(lambda: bot.diff_snapshots('BLG', snapshot, churned), repeat),
+        }
+    return results
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.sent += 1
+
+
+class FakeApplication:
+    def __init__(self):
+        self.tasks = []
+
+    def create_task(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self.tasks.append(task)
+        return task
+
+
+class FakeJobQueue:
+    def jobs(self):
+        return ()
+
+
+class FakeContext:
+    def __init__(self, application):
+        self.application = application
+        self.job_queue = FakeJobQueue()
+
+
+def reset_bot_state():
+    bot.WATCHES.replace({})
+    bot.PROGRAM_SCHEDULES.clear()
+    bot.SEAT_EVENTS.snapshots.clear()
+    bot.SNAPSHOT_CACHE.entries.clear()
+    bot.SNAPSHOT_CACHE.total_bytes = 0
+    bot.WATCH_STORE.pending.clear()
+    bot.WATCH_STORE.pending_seats.clear()
+
+
+def build_watches(watch_count, program_pages, program_rows, seed=7):
+    """Takipleri programlara dağıt: her sohbet ~5 takip, CRN'ler programın gerçek satırlarından"""
+    rnd = random.Random(seed)
+    codes = sorted(program_pages)
+    chat_count = max(1, watch_count // 5)
+    for i in range(watch_count):
+        code = rnd.choice(codes)
+        crn = rnd.choice(program_rows[program_pages[code]])
+        bot.WATCHES.add(100000 + i % chat_count, code, crn)
+
+
+async def measure_loop_lag(samples, interval=0.001):
+    """Event loop gecikmesi: 1 ms'lik uykunun ne kadar geç uyandığı (komut handler'larının bekleyeceği süre)"""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - start - interval)
+
+
+async def poll_round(context):
+    """Tüm programları vadesi gelmiş say, bir poller turu çalıştır ve bildirimleri boşalt"""
+    for schedule in bot.PROGRAM_SCHEDULES.values():
+        schedule.next_due = 0.0
+    for snapshot in bot.SNAPSHOT_CACHE.entries.values():
+        snapshot.fetched_at -= bot.SNAPSHOT_TTL  # önbellek tura engel olmasın
+
+    lag = []
+    monitor = asyncio.ensure_future(measure_loop_lag(lag))
+    start = time.perf_counter()
+    context.application.tasks.clear()
+    await bot.poll_watched_programs(context)
+    await asyncio.gather(*context.application.tasks)
+    polled = time.perf_counter()
+    while bot.NOTIFIER.scheduled:
+        await asyncio.sleep(0.001)
+    end = time.perf_counter()
+    monitor.cancel()
+    return {
+        "programs": len(context.application.tasks),
+        "poll_s": round(polled - start, 4),
+        "notify_drain_s": round(end - polled, 4),
+        "total_s": round(end - start, 4),
+        "loop_lag_p99_ms": round(sorted(lag)[int(len(lag) * 0.99)] * 1000, 2) if lag else None,
+        "loop_lag_max_ms": round(max(lag) * 1000, 2) if lag else None,
+    }
+
+
+async def run_macro_size(watch_count, pages, parse_workers=0):
+    reset_bot_state()
+    codes = bot.get_manual_program_list()
+    bot.PROGRAM_KODLARI.clear()
+    bot.PROGRAM_KODLARI.update(codes)
+
+    # Her program bir fixture'a eşlenir; ikinci sayfa seti kontenjan değişimlerini içerir
+    names = sorted(pages)
+    program_pages = {code: names[i % len(names)] for i, code in enumerate(sorted(codes))}
+    program_rows = {name: [row[bot.ROW_CRN] for row in bot.parse_program_table(html)] for name, html in pages.items()}
+    churned = {name: churn_page(html, 0.05, seed=3) for name, html in pages.items()}
+    id_to_page = {program_id: program_pages[code] for code, program_id in codes.items()}
+    current = {'pages': pages}
+
+    async def handler(request):
+        page = id_to_page[request.url.params['DersBransKoduId']]
+        return httpx.Response(200, content=current['pages'][page])
+
+    bot.OBS_CLIENT = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    bot.OBS_SEMAPHORE = asyncio.Semaphore(bot.OBS_MAX_CONCURRENCY)
+    bot.OBS_RATE_LIMITER = bot.PriorityTokenBucket(1e9, 10 ** 9)  # OBS bütçesi değil bot maliyeti ölçülür
+    fake_bot = FakeBot()
+    bot.NOTIFIER = bot.NotificationQueue(1e9, 0.0, bot.TELEGRAM_SEND_WORKERS)
+    bot.NOTIFIER.start(fake_bot)
+    bot.PARSE_POOL = bot.ParsePool(parse_workers, bot.PARSE_INLINE_MAX_BYTES, max(1, parse_workers) * 2)
+    bot.PARSE_POOL.start()
+
+    build_start = time.perf_counter()
+    build_watches(watch_count, program_pages, program_rows)
+    build_s = time.perf_counter() - build_start
+    chat_count = bot.WATCHES.chat_count()
+
+    context = FakeContext(FakeApplication())
+    rounds = {}
+    rounds["cold"] = await poll_round(context)        # ilk tur: her CRN doğrudan kontrol edilir
+    rounds["unchanged"] = await poll_round(context)   # aynı sayfalar: parse atlanır, olay yok
+    current['pages'] = churned
+    rounds["churned"] = await poll_round(context)     # %5 satırda yer açılır: olay → bildirim
+
+    await bot.NOTIFIER.stop()
+    await bot.close_obs_client()
+    parse_stats = bot.PARSE_POOL.stats()
+    bot.PARSE_POOL.stop()
+    return {
+        "watches": watch_count,
+        "parse_workers": parse_workers,
+        "parse_pool": parse_stats,
+        "chats": chat_count,
+        "build_watches_s": round(build_s, 4),
+        "rounds": rounds,
+        "notifications_sent": fake_bot.sent,
+        "watches_left": len(bot.WATCHES),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--watches', default='1000,10000,100000', help='virgülle ayrılmış takip sayıları')
+    parser.add_argument('--repeat', type=int, default=20, help='mikro benchmark tekrar sayısı')
+    parser.add_argument('--output', help='JSON sonucun yazılacağı dosya (varsayılan: stdout)')
+    parser.add_argument('--parse-workers', type=int, default=0,
+                        help='makro turlarda parse havuzu süreç sayısı (0: inline, loop gecikmesi karşılaştırması)')
+    parser.add_argument('--skip-macro', action='store_true')
+    parser.add_argument('--write-fixtures', action='store_true', help='fixture HTML sayfalarını yeniden üret')
+    args = parser.parse_args()
+
+    if args.write_fixtures:
+        write_fixtures()
+        return
+
+    pages = load_fixtures()
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        "fixtures": {name: "captured" if html.startswith(CAPTURED_MARKER) else "synthetic"
+                     for name, html in pages.items()},
+        "micro": {},
+        "macro": [],
+    }
+
+    results["micro"] = run_micro(pages, args.repeat)
+    if not args.skip_macro:
+        for watch_count in (int(count) for count in args.watches.split(',')):
+            results["macro"].append(asyncio.run(run_macro_size(watch_count, pages, args.parse_workers)))
+
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+        print(f"📊 Sonuçlar yazıldı: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Webhook modu benchmark'ı: sahte güncelleme → handler → sendMessage gecikmesi ve throughput
+
+Telegram'a bağlanmadan çalışır: bot yerel bir sahte Bot API'ye (getMe/sendMessage) yönlendirilir,
+webhook sunucusuna /help güncellemeleri POST edilir ve yanıtın sahte API'ye ulaşma süresi ölçülür.
+
+Kullanım: python benchmarks/bench_webhook.py [--updates 500] [--concurrency 20]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+TMP_DIR = tempfile.mkdtemp(prefix='bench_webhook_')
+os.environ.setdefault('TELEGRAM_TOKEN', '123456:benchmark')  # bot.py import'u için
+os.environ['WATCH_DB_PATH'] = os.path.join(TMP_DIR, 'watches.db')
+os.environ['PROGRAM_CODES_CACHE_PATH'] = os.path.join(TMP_DIR, 'program_codes.json')
+os.environ['WEBHOOK_URL'] = ''  # webhook Telegram'a kaydedilmez
+
+import httpx  # noqa: E402
+
+import bot  # noqa: E402
+from fake_bot_api import FakeBotApi, make_message_update  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def wait_for_server(client, url, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(url)).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.05)
+    raise RuntimeError(f"sunucu başlamadı: {url}")
+
+
+async def run(args):
+    api_port, webhook_port = free_port(), free_port()
+    os.environ['PORT'] = str(webhook_port)
+    bot.save_program_codes(bot.get_manual_program_list())  # OBS'e gidilmesin
+
+    fake_api = FakeBotApi()
+    done = asyncio.Event()
+    fake_api.listeners.append(
+        lambda chat_id, text, sent_at: len(fake_api.first_sent) >= args.updates and done.set())
+    api_runner = await fake_api.start(api_port)
+
+    app = bot.build_application(base_url=f"http://127.0.0.1:{api_port}")
+    bot_task = asyncio.ensure_future(bot.run_application(app, mode='webhook'))
+
+    webhook_url = f"http://127.0.0.1:{webhook_port}{bot.WEBHOOK_PATH}"
+    headers = {'X-Telegram-Bot-Api-Secret-Token': bot.WEBHOOK_SECRET} if bot.WEBHOOK_SECRET else {}
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits) as client:
+        await wait_for_server(client, f"http://127.0.0.1:{webhook_port}/health")
+
+        sent_at = {}
+        ack_times = []
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def post_update(i):
+            chat_id = 100000 + i
+            body = json.dumps(make_message_update(i + 1, chat_id, '/help'))
+            async with semaphore:
+                sent_at[chat_id] = start = time.monotonic()
+                response = await client.post(webhook_url, content=body, headers={
+                    'Content-Type': 'application/json', **headers})
+                ack_times.append(time.monotonic() - start)
+                response.raise_for_status()
+
+        begin = time.monotonic()
+        await asyncio.gather(*(post_update(i) for i in range(args.updates)))
+        await asyncio.wait_for(done.wait(), timeout=args.timeout)
+        elapsed = max(fake_api.first_sent.values()) - begin
+
+    bot_task.cancel()
+    await asyncio.gather(bot_task, return_exceptions=True)
+    await api_runner.cleanup()
+
+    latencies = [fake_api.first_sent[chat_id] - sent for chat_id, sent in sent_at.items()]
+    print(f"{'güncelleme':>10} {'eşzamanlı':>9} {'ack p50':>9} {'ack p99':>9} "
+          f"{'uçtan uca p50':>14} {'p99':>8} {'max':>8} {'throughput':>12}")
+    print(f"{args.updates:>10} {args.concurrency:>9} {percentile(ack_times, 0.5) * 1000:>7.2f}ms "
+          f"{percentile(ack_times, 0.99) * 1000:>7.2f}ms {percentile(latencies, 0.5) * 1000:>12.2f}ms "
+          f"{percentile(latencies, 0.99) * 1000:>6.1f}ms {max(latencies) * 1000:>6.1f}ms "
+          f"{args.updates / elapsed:>8.0f} up/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--updates', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--timeout', type=float, default=60.0, help='tüm yanıtlar için en uzun bekleme (sn)')
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
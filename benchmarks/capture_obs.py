@@ -0,0 +1,111 @@
+"""Gerçek OBS DersProgramSearch sayfalarını benchmark fixture'ı olarak kaydet (anonimleştirilmiş)
+
+Eğitmen kolonundaki adlar sayfa içinde tutarlı takma adlarla (Öğretim Üyesi 1, 2, ...)
+değiştirilir, form token'ları silinir. Sayfanın geri kalanı (satır sonları, girinti,
+script/stil blokları) byte byte korunur; parser ve akış taraması gerçek sayfayı görür.
+Kayıt benchmarks/fixtures/ders_program_<ad>.html olarak yazılır ve bench_suite.py'de aynı
+addaki sentetik sayfanın yerini alır. Anonimleştirmeden sonra tabloda gerçek bir ad kalırsa
+dosya yazılmaz.
+
+Kullanım: python benchmarks/capture_obs.py BLG:large MAT:medium ATA:small
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+os.environ.setdefault('TELEGRAM_TOKEN', 'benchmark')  # bot.py import'u için
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import httpx  # noqa: E402
+import lxml.html  # noqa: E402
+
+import bot  # noqa: E402
+
+FIXTURE_DIR = os.path.join(BENCH_DIR, 'fixtures')
+INSTRUCTOR_HEADERS = ('eğitmen', 'egitmen', 'instructor')
+TOKEN_INPUT_RE = re.compile(rb'<input[^>]*__RequestVerificationToken[^>]*>', re.I)
+
+
+def program_table(html):
+    doc = lxml.html.document_fromstring(html, parser=lxml.html.HTMLParser(encoding='utf-8'))
+    tables = doc.xpath('//table[@id="dersProgramContainer"]') or doc.xpath('//table')
+    return tables[0] if tables else None
+
+
+def instructor_names(html):
+    """Eğitmen kolonundaki adlar (hücredeki <br> ile ayrılmış her ad ayrı), sayfadaki sırayla"""
+    table = program_table(html)
+    if table is None:
+        raise SystemExit("❌ Sayfada ders tablosu yok")
+    header = [bot.cell_text(cell).casefold() for cell in table.xpath('./thead/tr[1]/th | ./thead/tr[1]/td')]
+    column = next((i for i, text in enumerate(header) if text.startswith(INSTRUCTOR_HEADERS)), None)
+    if column is None:
+        raise SystemExit(f"❌ Eğitmen kolonu bulunamadı, başlık: {header}")
+
+    names = []
+    for tr in table.xpath('./tbody/tr | ./tr'):
+        cells = tr.findall('td')
+        if len(cells) <= column:
+            continue
+        for name in (part.strip() for part in cells[column].itertext()):
+            if name and name != '-' and name not in names:
+                names.append(name)
+    return names
+
+
+def anonymize(html):
+    """Adları takma adlarla değiştir, token'ları sil; dönüş: (html, değiştirilen ad sayısı)"""
+    names = instructor_names(html)
+    # Uzun adlar önce: kısa bir ad, uzun adın parçası olarak yarım değiştirilmesin
+    for index, name in sorted(enumerate(names, 1), key=lambda item: -len(item[1])):
+        alias = f"Öğretim Üyesi {index}"
+        for form in {name.encode('utf-8'), name.encode('ascii', 'xmlcharrefreplace')}:
+            html = html.replace(form, alias.encode('utf-8'))
+    html = TOKEN_INPUT_RE.sub(b'', html)
+
+    leftover = set(instructor_names(html)) & set(names)
+    if leftover:
+        raise SystemExit(f"❌ {len(leftover)} ad anonimleştirilemedi (ör. HTML entity biçimi), dosya yazılmadı")
+    return html, len(names)
+
+
+def capture(program_code, name, client, program_codes):
+    program_id = program_codes.get(program_code)
+    if program_id is None:
+        raise SystemExit(f"❌ Bilinmeyen program kodu: {program_code}")
+    response = client.get(bot.BASE_URL, params={'ProgramSeviyeTipiAnahtari': 'LS', 'DersBransKoduId': program_id},
+                          headers={'Referer': bot.MAIN_URL})
+    response.raise_for_status()
+
+    html, renamed = anonymize(response.content)
+    rows = bot.parse_program_table(html)
+    if not rows:
+        raise SystemExit(f"❌ {program_code}: sayfada ders satırı yok, dosya yazılmadı")
+
+    note = f"<!-- capture_obs.py: {program_code} {time.strftime('%Y-%m-%d')}, eğitmen adları anonimleştirildi -->\n"
+    path = os.path.join(FIXTURE_DIR, f'ders_program_{name}.html')
+    with open(path, 'wb') as f:
+        f.write(note.encode('utf-8') + html)
+    print(f"📝 {path}: {program_code}, {len(rows)} satır, {len(html) / 1024:.0f}KB, {renamed} ad değiştirildi")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('captures', nargs='+', metavar='KOD:AD', help='program kodu ve fixture adı, ör. BLG:large')
+    args = parser.parse_args()
+
+    program_codes = bot.get_manual_program_list()
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    with httpx.Client(headers=bot.OBS_HEADERS, timeout=bot.OBS_TIMEOUT, follow_redirects=True) as client:
+        client.get(bot.MAIN_URL)  # oturum çerezi
+        for item in args.captures:
+            program_code, _, name = item.partition(':')
+            capture(program_code.upper(), name or program_code.lower(), client, program_codes)
+
+
+if __name__ == '__main__':
+    main()
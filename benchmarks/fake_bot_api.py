@@ -0,0 +1,129 @@
+"""Yerel sahte Telegram Bot API: sendMessage çağrılarını kaydeder, getUpdates ile sahte kullanıcı mesajı verir
+
+Bot'u bu sunucuya yönlendirmek için: TELEGRAM_API_BASE_URL=http://127.0.0.1:<port>
+Tek başına: python benchmarks/fake_bot_api.py --port 8081  (kayıtlar GET /_stats)
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from aiohttp import web
+
+
+class FakeBotApi:
+    """Bot API'nin bot'un kullandığı kısmı: getMe, getUpdates, sendMessage, deleteMessage, webhook çağrıları"""
+
+    def __init__(self):
+        self.sent = []  # [(time.monotonic(), chat_id, text)]
+        self.first_sent = {}  # {chat_id: ilk mesajın zamanı}
+        self.calls = {}  # {method: adet}
+        self.updates = []  # getUpdates ile verilecek bekleyen güncellemeler
+        self.update_id = 0
+        self.message_id = 0
+        self.new_update = asyncio.Event()
+        self.listeners = []  # callback(chat_id, text, sent_at)
+
+    def push_message(self, chat_id, text, first_name='Yük'):
+        """Sahte kullanıcıdan bot'a mesaj (getUpdates ile teslim edilir)"""
+        self.update_id += 1
+        self.updates.append(make_message_update(self.update_id, chat_id, text, first_name))
+        self.new_update.set()
+        return self.update_id
+
+    async def handle(self, request):
+        method = request.match_info['method']
+        if request.content_type == 'application/json':
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+        self.calls[method] = self.calls.get(method, 0) + 1
+
+        if method == 'getMe':
+            result = {"id": 1, "is_bot": True, "first_name": "Yük Testi", "username": "fake_itu_bot"}
+        elif method == 'getUpdates':
+            result = await self.get_updates(int(params.get('offset') or 0), float(params.get('timeout') or 0))
+        elif method in ('sendMessage', 'editMessageText'):
+            sent_at = time.monotonic()
+            chat_id = int(params['chat_id'])
+            text = params.get('text', '')
+            self.sent.append((sent_at, chat_id, text))
+            self.first_sent.setdefault(chat_id, sent_at)
+            for listener in self.listeners:
+                listener(chat_id, text, sent_at)
+            self.message_id += 1
+            result = {
+                "message_id": self.message_id, "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"}, "text": text,
+            }
+        else:
+            result = True  # deleteMessage, deleteWebhook, setWebhook, ...
+        return web.json_response({"ok": True, "result": result})
+
+    async def get_updates(self, offset, timeout):
+        """Long polling: bekleyen güncelleme yoksa timeout kadar bekle"""
+        self.updates = [update for update in self.updates if update["update_id"] >= offset]
+        if not self.updates and timeout > 0:
+            self.new_update.clear()
+            try:
+                await asyncio.wait_for(self.new_update.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.updates[:100]
+
+    async def handle_stats(self, request):
+        return web.json_response(self.stats())
+
+    def stats(self):
+        return {"calls": dict(self.calls), "messages_sent": len(self.sent), "chats": len(self.first_sent),
+                "pending_updates": len(self.updates)}
+
+    async def start(self, port, host='127.0.0.1'):
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        app.router.add_get('/_stats', self.handle_stats)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+
+def make_message_update(update_id, chat_id, text, first_name='Yük'):
+    message = {
+        "message_id": update_id, "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": first_name},
+        "text": text,
+    }
+    if text.startswith('/'):
+        command = text.split()[0]
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+    return {"update_id": update_id, "message": message}
+
+
+async def serve(args):
+    api = FakeBotApi()
+    await api.start(args.port, args.host)
+    print(f"🤖 Sahte Bot API: http://{args.host}:{args.port} (TELEGRAM_API_BASE_URL)")
+    try:
+        while True:
+            await asyncio.sleep(args.report_interval)
+            print(json.dumps(api.stats(), ensure_ascii=False))
+    except asyncio.CancelledError:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--report-interval', type=float, default=10.0)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""Yerel sahte OBS: DersProgram ve DersProgramSearch sayfalarını sunar, kontenjanları zamanla değiştirir
+
+Gecikme, hata oranı ve değişim hızı ayarlanabilir. Bot'u yönlendirmek için: OBS_BASE_URL=http://127.0.0.1:<port>
+Tek başına: python benchmarks/fake_obs.py --port 8082 --programs 40  (durum GET /_stats)
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TELEGRAM_TOKEN', 'benchmark')  # bot.py import'u için
+
+import bot  # noqa: E402
+from bench_parser import HEADER, DAYS  # noqa: E402
+
+logging.getLogger(bot.__name__).setLevel(logging.WARNING)  # program listesi logları çıktıya karışmasın
+
+
+class FakeProgram:
+    """Bir programın şubeleri: [crn, ders_kodu, gün, kontenjan, yazılan] listeleri"""
+
+    def __init__(self, code, program_id, row_count, rnd, first_crn):
+        self.code = code
+        self.program_id = program_id
+        self.rows = []
+        for i in range(row_count):
+            capacity = rnd.choice([20, 30, 40, 50, 60, 80])
+            # Kayıt döneminde şubelerin çoğu dolu
+            enrolled = capacity if rnd.random() < 0.7 else rnd.randint(capacity // 2, capacity - 1)
+            self.rows.append([str(first_crn + i), f"{code} {100 + i}E", rnd.choice(DAYS), capacity, enrolled])
+        self.page = None  # değişene kadar aynı HTML tekrar kullanılır
+
+    def render(self):
+        if self.page is None:
+            parts = [
+                '<!DOCTYPE html><html lang="tr"><head><meta charset="utf-8"><title>Ders Programı</title></head>',
+                '<body><div class="container"><table id="dersProgramContainer" class="table table-bordered">',
+                '<thead><tr>' + ''.join(f'<th>{h}</th>' for h in HEADER) + '</tr></thead><tbody>',
+            ]
+            for crn, course_code, day, capacity, enrolled in self.rows:
+                parts.append(
+                    f'<tr><td>{crn}</td><td><a href="/public/DersPlan/DersBilgi/{crn}">{course_code}</a></td>'
+                    f'<td>Ders {course_code}</td><td>Yüz yüze</td><td>Dr. Öğr. Üyesi Ad Soyad</td>'
+                    f'<td>EEB</td><td>{day}</td><td>0830/1129</td><td>EEB 1302</td>'
+                    f'<td>{capacity}</td><td>{enrolled}</td><td>Yok</td><td>-</td><td>-</td><td>-</td></tr>'
+                )
+            parts.append('</tbody></table></div></body></html>')
+            self.page = "".join(parts).encode('utf-8')
+        return self.page
+
+
+class FakeObs:
+    """Sahte OBS sunucusu - programlar bot.get_manual_program_list() kodlarından seçilir"""
+
+    def __init__(self, programs=40, rows=(20, 80), latency=0.05, jitter=0.05, error_rate=0.0,
+                 mutate_interval=5.0, mutate_count=20, seed=1):
+        self.rnd = random.Random(seed)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.mutate_interval = mutate_interval
+        self.mutate_count = mutate_count
+        self.codes = codes = bot.get_manual_program_list()
+        self.programs = {}  # {program_id: FakeProgram}
+        for index, code in enumerate(sorted(codes)[:programs]):
+            program = FakeProgram(code, codes[code], self.rnd.randint(*rows), self.rnd, 10000 + index * 1000)
+            self.programs[program.program_id] = program
+        self.openings = {}  # {(program_code, crn): yer açıldığı an (time.monotonic)}
+        self.requests = 0
+        self.errors = 0
+        self.started_at = time.monotonic()
+        self.mutations = 0
+
+    def full_rows(self):
+        return [(program.code, row[0]) for program in self.programs.values()
+                for row in program.rows if row[4] >= row[3]]
+
+    def mutate(self):
+        """Rastgele şubelerde yer aç (yazılan azalır) ya da doldur"""
+        programs = list(self.programs.values())
+        for _ in range(self.mutate_count):
+            program = self.rnd.choice(programs)
+            row = self.rnd.choice(program.rows)
+            if row[4] >= row[3]:
+                row[4] = row[3] - self.rnd.randint(1, 2)
+                self.openings[(program.code, row[0])] = time.monotonic()
+            else:
+                row[4] = row[3]
+            program.page = None
+            self.mutations += 1
+
+    async def mutate_forever(self):
+        while True:
+            await asyncio.sleep(self.mutate_interval)
+            self.mutate()
+
+    async def delay(self):
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self.latency + self.rnd.uniform(-self.jitter, self.jitter)))
+
+    async def handle_main(self, request):
+        self.requests += 1
+        await self.delay()
+        options = ''.join(f'<option value="{program_id}">{code}</option>' for code, program_id in self.codes.items())
+        return web.Response(
+            text=f'<html><body><select id="dersBransKoduId"><option value="">Ders Kodu Seçiniz</option>'
+                 f'{options}</select></body></html>',
+            content_type='text/html')
+
+    async def handle_search(self, request):
+        self.requests += 1
+        await self.delay()
+        if self.rnd.random() < self.error_rate:
+            self.errors += 1
+            return web.Response(status=503, text="Service Unavailable")
+        program = self.programs.get(request.query.get('DersBransKoduId'))
+        if program is None:
+            body = b'<html><body><table id="dersProgramContainer"><thead><tr><th>CRN</th></tr></thead>' \
+                   b'<tbody></tbody></table></body></html>'
+        else:
+            body = program.render()
+        return web.Response(body=body, content_type='text/html', charset='utf-8')
+
+    async def handle_stats(self, request):
+        return web.json_response(self.stats())
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started_at
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "requests_per_second": round(self.requests / elapsed, 2) if elapsed else 0.0,
+            "mutations": self.mutations,
+            "openings": len(self.openings),
+            "programs": len(self.programs),
+        }
+
+    async def start(self, port, host='127.0.0.1'):
+        app = web.Application()
+        app.router.add_get('/public/DersProgram', self.handle_main)
+        app.router.add_get('/public/DersProgram/DersProgramSearch', self.handle_search)
+        app.router.add_get('/_stats', self.handle_stats)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        self.started_at = time.monotonic()
+        return runner
+
+
+async def serve(args):
+    obs = FakeObs(args.programs, (args.min_rows, args.max_rows), args.latency, args.jitter, args.error_rate,
+                  args.mutate_interval, args.mutate_count, args.seed)
+    await obs.start(args.port, args.host)
+    print(f"🏫 Sahte OBS: http://{args.host}:{args.port} (OBS_BASE_URL), {len(obs.programs)} program")
+    mutator = asyncio.ensure_future(obs.mutate_forever())
+    try:
+        while True:
+            await asyncio.sleep(args.report_interval)
+            print(json.dumps(obs.stats(), ensure_ascii=False))
+    finally:
+        mutator.cancel()
+
+
+def add_obs_arguments(parser):
+    parser.add_argument('--programs', type=int, default=40, help='sayfası olan program sayısı')
+    parser.add_argument('--min-rows', type=int, default=20)
+    parser.add_argument('--max-rows', type=int, default=80)
+    parser.add_argument('--latency', type=float, default=0.05, help='ortalama yanıt gecikmesi (sn)')
+    parser.add_argument('--jitter', type=float, default=0.05, help='gecikme ± sapması (sn)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='503 dönen istek oranı (0-1)')
+    parser.add_argument('--mutate-interval', type=float, default=5.0, help='kontenjan değişim aralığı (sn)')
+    parser.add_argument('--mutate-count', type=int, default=20, help='her değişimde etkilenen şube sayısı')
+    parser.add_argument('--seed', type=int, default=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8082)
+    parser.add_argument('--report-interval', type=float, default=10.0)
+    add_obs_arguments(parser)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""Uçtan uca yük testi: gerçek bot süreci + sahte OBS + sahte Telegram Bot API (ağ gerekmez)
+
+Sahte kullanıcılar dolu şubeler için `KOD_CRN` mesajı gönderir ve takibe alınır. Ardından sahte OBS
+kontenjanları değiştirmeye başlar. Ölçülenler: sorgu yanıt gecikmesi, yer açılması → bildirim
+gecikmesi, bot'un OBS istek hızı ve mesaj throughput'u. Sonuç JSON olarak yazılır.
+
+Kullanım: python benchmarks/loadtest.py [--users 1000] [--duration 60] [--programs 40] [--output sonuc.json]
+          python benchmarks/loadtest.py --workers 3   # frontend + 3 worker, programlar lease ile paylaşılır
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_bot_api import FakeBotApi  # noqa: E402
+from fake_obs import FakeObs, add_obs_arguments  # noqa: E402
+
+OPENED_RE = re.compile(r"Program:\* `(\w+)`\n🆔 \*CRN:\* `(\d+)`")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * q))], 4)
+
+
+def summarize(values):
+    return {"count": len(values), "p50": percentile(values, 0.5), "p99": percentile(values, 0.99),
+            "max": round(max(values), 4) if values else None}
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.obs = FakeObs(args.programs, (args.min_rows, args.max_rows), args.latency, args.jitter,
+                           args.error_rate, args.mutate_interval, args.mutate_count, args.seed)
+        self.api = FakeBotApi()
+        self.api.listeners.append(self.on_message)
+        self.asked_at = {}  # {chat_id: mesajın gönderildiği an} - yanıt bekleyenler
+        self.reply_latencies = []
+        self.notify_latencies = []
+        self.notified = set()  # {(chat_id, program_code, crn)}
+
+    def on_message(self, chat_id, text, sent_at):
+        if chat_id in self.asked_at and 'Sorgulanıyor' not in text:
+            self.reply_latencies.append(sent_at - self.asked_at.pop(chat_id))
+        if 'KONTENJAN AÇILDI' not in text:
+            return
+        for program_code, crn in OPENED_RE.findall(text):
+            opened_at = self.obs.openings.get((program_code, crn))
+            key = (chat_id, program_code, crn)
+            if opened_at is not None and key not in self.notified:
+                self.notified.add(key)
+                self.notify_latencies.append(sent_at - opened_at)
+
+    def start_bot(self, api_port, obs_port, tmp_dir, role='all', name='bot'):
+        env = dict(
+            os.environ,
+            TELEGRAM_TOKEN='123456:loadtest',
+            TELEGRAM_API_BASE_URL=f"http://127.0.0.1:{api_port}",
+            OBS_BASE_URL=f"http://127.0.0.1:{obs_port}",
+            WATCH_DB_PATH=os.path.join(tmp_dir, 'watches.db'),
+            PROGRAM_CODES_CACHE_PATH=os.path.join(tmp_dir, 'program_codes.json'),
+            PORT=str(free_port()),
+            UPDATE_MODE='polling',
+            POLL_INTERVAL=str(self.args.poll_interval),
+            PYTHONUNBUFFERED='1',
+            BOT_ROLE=role,
+            WORKER_ID=name,
+        )
+        if role == 'worker':
+            env['WORKER_HEALTH_PORT'] = str(free_port())
+        for pair in self.args.bot_env:
+            key, _, value = pair.partition('=')
+            env[key] = value
+        log = open(os.path.join(tmp_dir, f'{name}.log'), 'w')
+        process = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, 'bot.py')], cwd=tmp_dir, env=env,
+                                   stdout=log, stderr=subprocess.STDOUT)
+        return process, log
+
+    def start_bots(self, api_port, obs_port, tmp_dir):
+        """Tek süreç ya da --workers verilirse bir frontend + N worker (paylaşılan SQLite)"""
+        if not self.args.workers:
+            return [self.start_bot(api_port, obs_port, tmp_dir)]
+        bots = [self.start_bot(api_port, obs_port, tmp_dir, 'frontend', 'frontend')]
+        for i in range(self.args.workers):
+            bots.append(self.start_bot(api_port, obs_port, tmp_dir, 'worker', f'worker{i}'))
+        return bots
+
+    async def wait_for_polling(self, processes, timeout=30.0):
+        deadline = time.monotonic() + timeout
+        while self.api.calls.get('getUpdates', 0) == 0:
+            if any(process.poll() is not None for process in processes) or time.monotonic() > deadline:
+                raise RuntimeError("bot başlamadı (*.log dosyalarına bakın)")
+            await asyncio.sleep(0.05)
+
+    async def inject_users(self):
+        """Her kullanıcı dolu bir şube için sorgu gönderir (popüler şubelere birden çok kullanıcı)"""
+        rnd = random.Random(self.args.seed)
+        full_rows = self.obs.full_rows()
+        interval = 1.0 / self.args.inject_rate
+        for i in range(self.args.users):
+            program_code, crn = rnd.choice(full_rows)
+            chat_id = 500000 + i
+            self.asked_at[chat_id] = time.monotonic()
+            self.api.push_message(chat_id, f"{program_code}_{crn}")
+            await asyncio.sleep(interval)
+
+    async def run(self):
+        tmp_dir = tempfile.mkdtemp(prefix='loadtest_')
+        api_port, obs_port = free_port(), free_port()
+        api_runner = await self.api.start(api_port)
+        obs_runner = await self.obs.start(obs_port)
+        bots = self.start_bots(api_port, obs_port, tmp_dir)
+        processes = [process for process, _ in bots]
+        mutator = None
+        try:
+            await self.wait_for_polling(processes)
+            inject_start = time.monotonic()
+            await self.inject_users()
+            settle_deadline = time.monotonic() + self.args.settle
+            while self.asked_at and time.monotonic() < settle_deadline:
+                await asyncio.sleep(0.1)
+            inject_s = time.monotonic() - inject_start
+
+            # Takipler kuruldu: kontenjan değişimleri başlar, bot'un OBS istekleri bu aralıkta sayılır
+            requests_before = self.obs.requests
+            measure_start = time.monotonic()
+            mutator = asyncio.ensure_future(self.obs.mutate_forever())
+            await asyncio.sleep(self.args.duration)
+            measure_s = time.monotonic() - measure_start
+            obs_requests = self.obs.requests - requests_before
+        finally:
+            if mutator is not None:
+                mutator.cancel()
+            for process, log in bots:
+                if process.poll() is None:
+                    process.send_signal(signal.SIGINT)
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                log.close()
+            await api_runner.cleanup()
+            await obs_runner.cleanup()
+
+        return {
+            "users": self.args.users,
+            "workers": self.args.workers,
+            "programs": len(self.obs.programs),
+            "inject_s": round(inject_s, 2),
+            "unanswered_queries": len(self.asked_at),
+            "query_reply_latency_s": summarize(self.reply_latencies),
+            "measure_s": round(measure_s, 2),
+            "obs_requests_per_second": round(obs_requests / measure_s, 2),
+            "openings": len(self.obs.openings),
+            "open_to_notify_latency_s": summarize(self.notify_latencies),
+            "messages_sent": len(self.api.sent),
+            "messages_per_second": round(len(self.api.sent) / (inject_s + measure_s), 2),
+            "fake_obs": self.obs.stats(),
+            "fake_bot_api": self.api.stats(),
+            "bot_logs": tmp_dir,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--inject-rate', type=float, default=100.0, help='saniyede yeni kullanıcı mesajı')
+    parser.add_argument('--settle', type=float, default=30.0, help='sorgu yanıtları için en uzun bekleme (sn)')
+    parser.add_argument('--duration', type=float, default=60.0, help='kontenjan değişimli ölçüm süresi (sn)')
+    parser.add_argument('--poll-interval', type=float, default=10.0,
+                        help="bot'un başlangıç kontrol aralığı (POLL_INTERVAL, sn) - test süresine göre kısaltılır")
+    parser.add_argument('--workers', type=int, default=0,
+                        help='0: tek süreç; N: bir frontend + N worker süreci (BOT_ROLE, program lease\'leri)')
+    parser.add_argument('--bot-env', action='append', default=[], metavar='KEY=VALUE',
+                        help="bot sürecine ek ortam değişkeni (ör. POLL_MIN_INTERVAL=2)")
+    parser.add_argument('--output', help='JSON sonucun yazılacağı dosya (varsayılan: stdout)')
+    add_obs_arguments(parser)
+    args = parser.parse_args()
+
+    results = asyncio.run(LoadTest(args).run())
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+        print(f"📊 Sonuçlar yazıldı: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
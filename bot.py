@@ -1,68 +1,1091 @@
 from telegram.ext import ApplicationBuilder, MessageHandler, ContextTypes, filters, CommandHandler, JobQueue
-import requests
-from bs4 import BeautifulSoup
+import httpx
+import lxml.html
+import lxml.etree
 import logging
+import logging.handlers
 
-from telegram import ReplyKeyboardMarkup
+from telegram import ReplyKeyboardMarkup, Update
+from telegram.error import RetryAfter, TimedOut, NetworkError, TelegramError
+from telegram.request import HTTPXRequest
 
 import asyncio
 import time
-import traceback
 from datetime import datetime
-from flask import Flask, jsonify, request
 import threading
 import os
-
-
-# === Global Session ===
-SESSION = requests.Session()
-SESSION.headers.update({
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-    'Accept-Language': 'tr-TR,tr;q=0.9,en;q=0.8'
-})
-
-
-# Token'ı Railway Variables'tan al
+import random
+import re
+import sqlite3
+import hashlib
+import json
+import queue
+import atexit
+import socket
+import sys
+import importlib.util
+import contextlib
+import contextvars
+import hmac
+import tempfile
+import bisect
+import functools
+import multiprocessing
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict, deque
+from html import unescape
+
+
+# Token'ı Railway Variables'tan al (kontrol main() içinde)
 API_KEY = os.getenv('TELEGRAM_TOKEN')
-if not API_KEY:
-    print("❌ TELEGRAM_TOKEN bulunamadı! Railway Variables'e ekleyin.")
-    exit(1)
 
 # === Loglama Ayarları ===
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # 'text' ya da 'json' (Railway/Azure log hattı için tek satır JSON)
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '0.01'))  # DEBUG'da sıcak yol olaylarının loglanan oranı
+LOG_TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# LogRecord'un kendi alanları; geri kalanı `extra=` ile verilen yapılandırılmış alanlardır
+LOG_RECORD_FIELDS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def log_record_fields(record):
+    return {key: value for key, value in record.__dict__.items() if key not in LOG_RECORD_FIELDS}
+
+
+class JsonLogFormatter(logging.Formatter):
+    """Tek satır JSON: ts, level, logger, msg + extra alanları (program, crn, latency, outcome, ...)"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **log_record_fields(record),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextLogFormatter(logging.Formatter):
+    """Klasik satır formatı; extra alanları sona `anahtar=değer` olarak eklenir"""
+
+    def formatMessage(self, record):
+        line = super().formatMessage(record)
+        fields = log_record_fields(record)
+        if not fields:
+            return line
+        return line + " | " + " ".join(f"{key}={value}" for key, value in fields.items())
+
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    """Kaydı olduğu gibi kuyruğa koyar: mesaj birleştirme ve JSON üretimi de yazıcı thread'inde yapılır"""
+
+    def prepare(self, record):
+        if record.exc_info:
+            # Traceback, yazıcı thread'ine sıra gelene kadar frame'leri (ve yereldeki sayfaları) canlı tutmasın
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging():
+    """Loglar kuyruğa yazılır, stderr'e ayrı bir thread basar: event loop log I/O'sunu beklemez"""
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonLogFormatter() if LOG_FORMAT == 'json' else TextLogFormatter(LOG_TEXT_FORMAT))
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    root = logging.getLogger()
+    for old_handler in root.handlers[:]:
+        root.removeHandler(old_handler)
+    root.addHandler(LogQueueHandler(log_queue))
+    root.setLevel(LOG_LEVEL)
+    listener.start()
+    atexit.register(listener.stop)  # kapanışta kuyrukta kalanlar da yazılır
+    return listener
+
+
+# Parse havuzunun spawn edilen işçileri bu modülü yeniden import eder. Log thread'i ve atexit kaydı
+# sadece ana süreçte kurulur; işçilerin az sayıdaki uyarısı logging'in varsayılan stderr çıktısına gider
+IS_PARSE_WORKER = multiprocessing.parent_process() is not None
+LOG_LISTENER = None if IS_PARSE_WORKER else setup_logging()
 logger = logging.getLogger(__name__)
+# httpx her isteği, apscheduler her job çalışmasını INFO seviyesinde loglar; log hattını boğmasınlar
+logging.getLogger('httpx').setLevel(logging.WARNING)
+logging.getLogger('apscheduler').setLevel(logging.WARNING)
+
+
+def debug_sampled(message, *args, **fields):
+    """Sıcak yol (satır/CRN başına) DEBUG olayı: LOG_SAMPLE_RATE oranında örneklenir
+
+    INFO'da çalışırken maliyeti tek bir seviye kontrolüdür; mesaj hiç oluşturulmaz.
+    """
+    if logger.isEnabledFor(logging.DEBUG) and random.random() < LOG_SAMPLE_RATE:
+        logger.debug(message, *args, extra={**fields, 'sampled': LOG_SAMPLE_RATE})
 
 # === OBS URL'leri ===
-BASE_URL = "https://obs.itu.edu.tr/public/DersProgram/DersProgramSearch"
-MAIN_URL = "https://obs.itu.edu.tr/public/DersProgram"
-DERS_KAYIT_URL = "https://obs.itu.edu.tr/ogrenci/DersKayitIslemleri/DersKayit"
+# Yük testinde sahte OBS sunucusuna yönlendirilebilir (benchmarks/fake_obs.py)
+OBS_BASE_URL = os.getenv('OBS_BASE_URL', 'https://obs.itu.edu.tr').rstrip('/')
+BASE_URL = f"{OBS_BASE_URL}/public/DersProgram/DersProgramSearch"
+MAIN_URL = f"{OBS_BASE_URL}/public/DersProgram"
+DERS_KAYIT_URL = f"{OBS_BASE_URL}/ogrenci/DersKayitIslemleri/DersKayit"
+
+# Telegram Bot API adresi - boşsa api.telegram.org (yük testinde benchmarks/fake_bot_api.py)
+TELEGRAM_API_BASE_URL = os.getenv('TELEGRAM_API_BASE_URL')
+
+# Güncelleme alma modu: 'polling' (varsayılan) ya da 'webhook' (tek asyncio sunucusu)
+UPDATE_MODE = os.getenv('UPDATE_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')  # dışarıdan erişilen adres, ör. https://bot.up.railway.app
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')  # Telegram'ın her istekte gönderdiği gizli token
+
+# Program kodu önbelleği: açılışta diskten anında yüklenir, arka planda OBS'ten yenilenir
+PROGRAM_CODES_CACHE_PATH = os.getenv('PROGRAM_CODES_CACHE_PATH', 'program_codes.json')
+PROGRAM_CODES_TTL = float(os.getenv('PROGRAM_CODES_TTL', str(24 * 3600)))  # saniye
+
+# === Async OBS HTTP İstemcisi (Global Session) ===
+# Tüm OBS istekleri tek bir keep-alive bağlantı havuzunu paylaşır
+OBS_MAX_CONCURRENCY = int(os.getenv('OBS_MAX_CONCURRENCY', '8'))  # aynı anda en fazla istek
+OBS_TIMEOUT = httpx.Timeout(15.0, connect=5.0)
+OBS_HTTP2 = importlib.util.find_spec('h2') is not None  # httpx[http2] kuruluysa HTTP/2
+# httpx br içeriği sadece brotli paketi kuruluysa açabilir
+OBS_BROTLI = any(importlib.util.find_spec(m) is not None for m in ('brotli', 'brotlicffi'))
+OBS_KEEPALIVE_EXPIRY = 90  # saniye - boşta bağlantılar bu süre açık tutulur
+OBS_WARM_INTERVAL = 25  # saniye - boşta kalan havuz bu aralıkla ısıtılır
+OBS_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'tr-TR,tr;q=0.9,en;q=0.8',
+    'Accept-Encoding': 'gzip, deflate, br' if OBS_BROTLI else 'gzip, deflate',
+}
+OBS_CLIENT = None
+OBS_SEMAPHORE = None
+OBS_LAST_REQUEST_AT = 0.0  # son OBS isteğinin zamanı (time.monotonic)
+
+# Süreç genelinde OBS istek hızı sınırı (token bucket) - OBS'in throttling eşiğinin altında kal
+OBS_RATE_LIMIT = float(os.getenv('OBS_RATE_LIMIT', '5'))  # saniyede istek
+OBS_RATE_BURST = int(os.getenv('OBS_RATE_BURST', '10'))  # anlık en fazla istek
+PRIORITY_INTERACTIVE = 0  # kullanıcı "Sorgulanıyor..." mesajında bekliyor
+PRIORITY_BACKGROUND = 1  # zamanlanmış kontroller kalan bütçeyi kullanır
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BACKGROUND: "background"}
+
+# Uç nokta başına devre kesici: ardışık hata ya da yavaş yanıtlarda OBS'e istek kesilir, önbellek kullanılır
+OBS_BREAKER_FAILURES = int(os.getenv('OBS_BREAKER_FAILURES', '5'))  # devreyi açan ardışık hata/yavaş yanıt
+OBS_BREAKER_SLOW_SECONDS = float(os.getenv('OBS_BREAKER_SLOW_SECONDS', '8'))  # bundan yavaş yanıt hata sayılır
+OBS_BREAKER_OPEN_SECONDS = 30  # saniye - ilk açılışta deneme isteğine kadar bekleme
+OBS_BREAKER_MAX_OPEN_SECONDS = 300  # deneme başarısız oldukça bekleme ikiye katlanır, en fazla bu kadar
+
+# Kullanıcı sorgularında hedged istek: ilk yanıt p95 gecikmesinde gelmezse ikinci istek gönderilir
+OBS_HEDGE = os.getenv('OBS_HEDGE', '0') == '1'
+OBS_HEDGE_DEFAULT_DELAY = 2.0  # saniye - yeterli ölçüm yokken
+OBS_HEDGE_MIN_DELAY = 0.3  # saniye - p95 çok düşükse bile bundan önce ikinci istek gitmez
+OBS_HEDGE_MIN_SAMPLES = 20
+
+# === Program Sayfası Önbelleği ===
+SNAPSHOT_TTL = float(os.getenv('SNAPSHOT_TTL', '15'))  # saniye - bu süre içinde OBS'e tekrar gidilmez
+SNAPSHOT_CACHE_MAX_BYTES = int(os.getenv('SNAPSHOT_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+
+# Katalog modu: tüm programlar arka planda taranır, kontenjanlar sütunlu indekste tutulur (/open)
+CATALOG_MODE = os.getenv('CATALOG_MODE', '0') == '1'
+CATALOG_REFRESH_INTERVAL = float(os.getenv('CATALOG_REFRESH_INTERVAL', '900'))  # saniye - program başına yenileme
+CATALOG_CONCURRENCY = int(os.getenv('CATALOG_CONCURRENCY', '2'))  # aynı anda taranan program
+CATALOG_TICK = 30  # saniye - vadesi gelen programlara bakılan aralık
+CATALOG_BATCH = CATALOG_CONCURRENCY * 4  # tur başına en fazla program (kalanlar sonraki turda)
+# numpy isteğe bağlı (requirements-optional.txt); yoksa array modülü ile taranır
+CATALOG_NUMPY = importlib.util.find_spec('numpy') is not None
+
+# HTML parse havuzu: büyük sayfalar ayrı süreçlerde parse edilir, event loop komutlara yanıt verir
+PARSE_WORKERS = int(os.getenv('PARSE_WORKERS', str(min(4, max(1, (os.cpu_count() or 1) - 1)))))  # 0: hep inline
+PARSE_INLINE_MAX_BYTES = int(os.getenv('PARSE_INLINE_MAX_BYTES', str(64 * 1024)))  # altı inline parse edilir
+PARSE_MAX_PENDING = int(os.getenv('PARSE_MAX_PENDING', str(max(1, PARSE_WORKERS) * 2)))  # havuzda bekleyen en fazla iş
+
+# Tek CRN takip edilen programlarda sayfa akış halinde okunur, satır bulununca bağlantı kapanır
+OBS_STREAM_SCAN = os.getenv('OBS_STREAM_SCAN', '1') == '1'
 
 # === Takip Edilen Dersler ===
-WATCHED_COURSES = {}  # {chat_id: [(program_code, crn), ...]}
-
-# Rate-limiting için global değişken
-LAST_REQUEST_TIME = {}  # {chat_id: son_istek_zamanı}
+# Takipler WATCHES (WatchRegistry) içinde; sohbet başına hız sınırı durumu bu süre boşta kalınca silinir
+CHAT_IDLE_TTL = 600  # saniye
 
+# Toplu sorgu: tek mesajda birden çok `KOD_CRN` (ya da bir program altında CRN listesi)
+BULK_QUERY_MAX = 20  # mesaj başına en fazla ders
+
+# Takipler ve son görülen kontenjanlar deploy'lar arasında SQLite'ta saklanır
+WATCH_DB_PATH = os.getenv('WATCH_DB_PATH', 'watches.db')
+WATCH_FLUSH_INTERVAL = 2  # saniye - bekleyen yazmalar bu aralıkla toplu yazılır
+WATCH_CHANGES_TTL = 3600  # saniye - süreçler arası takip değişiklik kaydı bu kadar tutulur
+WATCH_CHANGES_PRUNE_INTERVAL = 300  # saniye
+
+# Yatay ölçekleme: 'all' (tek süreç), 'frontend' (sadece Telegram güncellemeleri) ya da
+# 'worker' (sadece OBS takibi). Süreçler WATCH_DB_PATH'teki SQLite'ı paylaşır; her program
+# lease ile tek bir worker'a aittir, lease yenilenmezse (worker öldüyse) diğerleri devralır.
+BOT_ROLE = os.getenv('BOT_ROLE', 'all')
+WORKER_ID = os.getenv('WORKER_ID') or f"{socket.gethostname()}:{os.getpid()}"
+LEASE_TTL = float(os.getenv('LEASE_TTL', '30'))  # saniye
+LEASE_RENEW_INTERVAL = LEASE_TTL / 3
+WATCH_SYNC_INTERVAL = float(os.getenv('WATCH_SYNC_INTERVAL', '5'))  # saniye - diğer süreçlerin takipleri
+# Worker'lar PORT'u frontend'le paylaşmaz: her worker'a ayrı sağlık/metrik portu verilir, boşsa sunucu açılmaz
+WORKER_HEALTH_PORT = os.getenv('WORKER_HEALTH_PORT', '')
+
+# Ortak kontrol döngüsü: her program sayfası tur başına bir kez çekilir
+POLL_INTERVAL = float(os.getenv('POLL_INTERVAL', '60'))  # saniye - yeni bir programın başlangıç kontrol aralığı
+POLLER_JOB_NAME = "program_poller"
+
+# Uyarlamalı aralık: kontenjanı sık değişen programlar hızlanır, sakin olanlar yavaşlar
+POLL_TICK = 2  # saniye - zamanlayıcının vadesi gelen programlara baktığı aralık
+POLL_MIN_INTERVAL = float(os.getenv('POLL_MIN_INTERVAL', '5'))
+POLL_MAX_INTERVAL = float(os.getenv('POLL_MAX_INTERVAL', '300'))
+POLL_SLOWDOWN_FACTOR = 1.25  # değişiklik yoksa aralık bu oranla uzar
+POLL_SPEEDUP_FACTOR = 0.5  # değişiklik varsa aralık bu oranla kısalır
+POLL_ERROR_BACKOFF_MAX = 900  # saniye - OBS hatalarında en uzun bekleme
+CHURN_EWMA_ALPHA = 0.3  # değişim oranı için üstel ortalama ağırlığı
+
+# Giden bildirim kuyruğu: Telegram flood limitlerinin altında kal
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '25'))  # saniyede mesaj (limit ~30)
+TELEGRAM_CHAT_INTERVAL = 1.0  # saniye - aynı sohbete iki mesaj arası en az süre
+TELEGRAM_SEND_WORKERS = int(os.getenv('TELEGRAM_SEND_WORKERS', '8'))
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+TELEGRAM_SEND_ATTEMPTS = 3  # ağ hatalarında en fazla deneme
+
+
+# === Prometheus Metrikleri (/metrics) ===
+METRICS_PREFIX = 'itu_bot'
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+PROCESS_STARTED_AT = time.monotonic()
+METRICS = []  # kayıt sırasıyla tüm metrikler
+
+
+def format_metric_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_metric_labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+class Counter:
+    """Etiketli sayaç - değerler sadece event loop'tan artırılır, /metrics thread'i okur"""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = f"{METRICS_PREFIX}_{name}"
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.values = {}  # {label değerleri tuple'ı: sayı}
+        METRICS.append(self)
+
+    def inc(self, *label_values, amount=1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        for label_values, value in list(self.values.items()):
+            yield self.name, self.label_names, label_values, value
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value, *label_values):
+        self.values[label_values] = value
+
+
+class CallbackMetric(Counter):
+    """Değeri /metrics okunurken mevcut istatistiklerden hesaplanan metrik
+
+    callback tek bir sayı ya da {label değerleri tuple'ı: sayı} döndürür.
+    """
+
+    def __init__(self, name, kind, documentation, callback, labels=()):
+        super().__init__(name, documentation, labels)
+        self.kind = kind
+        self.callback = callback
+
+    def samples(self):
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for label_values, value in values.items():
+            yield self.name, self.label_names, label_values, value
+
+
+class Histogram(Counter):
+    """Sabit kovalı histogram (Prometheus _bucket/_sum/_count serileri)"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets, labels=()):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
 
-def load_program_codes():
-    """OBS sayfasından program kodlarını ve value ID'lerini yükle"""
-    print("🔄 Program kodları yükleniyor...")
+    def observe(self, value, *label_values):
+        series = self.values.get(label_values)
+        if series is None:
+            series = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-        'Accept-Language': 'tr-TR,tr;q=0.9,en;q=0.8',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
+    @contextlib.contextmanager
+    def time(self, *label_values):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def timed(self, func):
+        """Fonksiyonun her çağrısının süresini ölç (dekoratör)"""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.time():
+                return func(*args, **kwargs)
+        return wrapper
+
+    def samples(self):
+        bucket_labels = self.label_names + ('le',)
+        for label_values, (counts, total) in list(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", bucket_labels, label_values + (format_metric_value(bound),), cumulative
+            yield f"{self.name}_sum", self.label_names, label_values, total
+            yield f"{self.name}_count", self.label_names, label_values, cumulative
+
+
+def render_metrics():
+    """Tüm metrikleri Prometheus metin formatında döndür"""
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, label_names, label_values, value in metric.samples():
+            lines.append(f"{name}{format_metric_labels(label_names, label_values)} {format_metric_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# Gecikme histogramları (saniye)
+OBS_FETCH_SECONDS = Histogram(
+    'obs_fetch_seconds', "OBS isteği süresi (slot alındıktan sonra, yanıt gövdesi dahil)",
+    (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30), labels=('priority',))
+PARSE_SECONDS = Histogram(
+    'parse_seconds', "Ders tablosu HTML parse süresi (havuzda kuyruk beklemesi dahil)",
+    (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1), labels=('mode',))
+RENDER_SECONDS = Histogram(
+    'render_seconds', "Bildirim mesajı oluşturma süresi",
+    (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01))
+TELEGRAM_SEND_SECONDS = Histogram(
+    'telegram_send_seconds', "Telegram sendMessage çağrısı süresi",
+    (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10))
+CHANGE_TO_NOTIFY_SECONDS = Histogram(
+    'change_to_notify_seconds', "OBS'te değişikliğin görülmesinden kullanıcıya teslimine kadar geçen süre",
+    (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300))
+
+# Sayaçlar
+PROGRAM_CHECKS_TOTAL = Counter(
+    'program_checks_total', "Poller'ın program kontrolleri (sonuca göre)", labels=('result',))
+COURSE_CHECKS_TOTAL = Counter(
+    'course_checks_total', "CRN kontrolleri (duruma göre)", labels=('status',))
+OBS_ERRORS_TOTAL = Counter(
+    'obs_errors_total', "OBS hataları (türe göre)", labels=('type',))
+TELEGRAM_ERRORS_TOTAL = Counter(
+    'telegram_errors_total', "Telegram gönderim hataları (türe göre)", labels=('type',))
+CallbackMetric(
+    'obs_breaker_rejected_total', 'counter', "Devre açıkken OBS'e gönderilmeyen istekler (uç noktaya göre)",
+    lambda: {(breaker.name,): breaker.rejected for breaker in list(OBS_BREAKERS.values())}, labels=('endpoint',))
+CallbackMetric(
+    'obs_hedged_requests_total', 'counter', "Gönderilen hedge istekleri (won: ikinci istek önce yanıt verdi)",
+    lambda: {('sent',): OBS_HEDGE_STATS["hedged"], ('won',): OBS_HEDGE_STATS["hedge_won"]}, labels=('result',))
+CallbackMetric(
+    'snapshot_cache_requests_total', 'counter', "Snapshot önbelleği istekleri (sonuca göre)",
+    lambda: {(key,): SNAPSHOT_CACHE.stats()[key] for key in ('hits', 'misses', 'coalesced', 'stale_served')},
+    labels=('result',))
+CallbackMetric(
+    'seat_events_total', 'counter', "Snapshot farklarından çıkan kontenjan olayları (seats_opened dahil)",
+    lambda: {(kind,): count for kind, count in list(SEAT_EVENTS.counts.items())}, labels=('kind',))
+CallbackMetric(
+    'notifications_delivered_total', 'counter', "Teslim edilen bildirimler",
+    lambda: NOTIFIER.delivered)
+
+# Anlık değerler
+JOB_QUEUE_JOBS = Gauge('job_queue_jobs', "JobQueue'daki iş sayısı")
+CallbackMetric(
+    'active_watches', 'gauge', "Aktif takip sayısı",
+    lambda: len(WATCHES))
+CallbackMetric(
+    'watching_chats', 'gauge', "En az bir takibi olan sohbet sayısı",
+    lambda: WATCHES.chat_count())
+CallbackMetric(
+    'polled_programs', 'gauge', "Kontrol edilen farklı program sayısı",
+    lambda: len(PROGRAM_SCHEDULES))
+CallbackMetric(
+    'notification_queue_depth', 'gauge', "Gönderilmeyi bekleyen bildirimler",
+    lambda: NOTIFIER.stats()["queued_notifications"])
+CallbackMetric(
+    'obs_queue_depth', 'gauge', "OBS hız limitinde bekleyen istekler (önceliğe göre)",
+    lambda: {(name,): len(OBS_RATE_LIMITER.waiters[priority]) for priority, name in PRIORITY_NAMES.items()},
+    labels=('priority',))
+CallbackMetric(
+    'obs_breaker_open', 'gauge', "OBS devre kesici durumu (0: kapalı, 1: açık, 0.5: deneme)",
+    lambda: {(breaker.name,): {BREAKER_CLOSED: 0, BREAKER_OPEN: 1, BREAKER_HALF_OPEN: 0.5}[breaker.state]
+             for breaker in list(OBS_BREAKERS.values())}, labels=('endpoint',))
+CallbackMetric(
+    'catalog_sections', 'gauge', "Katalog indeksindeki şube sayısı",
+    lambda: CATALOG.section_count())
+CallbackMetric(
+    'parse_pool_pending', 'gauge', "Parse havuzunda bekleyen/çalışan sayfalar",
+    lambda: PARSE_POOL.pending)
+CallbackMetric(
+    'snapshot_cache_bytes', 'gauge', "Snapshot önbelleğinin yaklaşık boyutu",
+    lambda: SNAPSHOT_CACHE.total_bytes)
+CallbackMetric(
+    'leased_programs', 'gauge', "Bu worker'ın lease'ine sahip olduğu programlar",
+    lambda: len(PROGRAM_LEASES.owned))
+CallbackMetric(
+    'uptime_seconds', 'gauge', "Sürecin çalışma süresi",
+    lambda: round(time.monotonic() - PROCESS_STARTED_AT, 1))
+
+
+# === İzleme: Aşama Span'leri (OTLP JSON) ve Örnekleyici Profiler ===
+TRACE_EXPORT_PATH = os.getenv('TRACE_EXPORT_PATH', '')  # boşsa tracing kapalı; doluysa OTLP JSON satırları yazılır
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '1.0'))  # izlenen kök işlemlerin (mesaj, poll) oranı
+TRACE_FLUSH_INTERVAL = 5  # saniye
+TRACE_BUFFER_MAX = 20000  # yazılmayı bekleyen en fazla span (dolarsa en eskiler atılır)
+TRACE_SERVICE_NAME = 'itu-kontenjan-bot'
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')  # /profile endpoint'i için; yoksa endpoint kapalı
+PROFILE_MAX_SECONDS = 60
+PROFILE_DEFAULT_SECONDS = 10
+PROFILE_SAMPLE_INTERVAL = 0.005  # saniye - örnekleme aralığı (~200 Hz)
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+SPAN_STATUS_ERROR = 2
+
+CURRENT_SPAN = contextvars.ContextVar('current_span', default=None)
+FINISHED_SPANS = deque()
+TRACE_STATS = {"finished": 0, "exported": 0, "dropped": 0}
+NO_SPAN = contextlib.nullcontext()
+
+
+class Span:
+    """Tek bir aşamanın süresi (OpenTelemetry span'i); `with` ile aktif span olur, çıkışta kaydedilir"""
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'kind', 'start_ns', 'end_ns', 'attributes',
+                 'error', 'token')
+
+    def __init__(self, name, parent=None, kind=SPAN_KIND_INTERNAL, attributes=None, start_ns=None):
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.name = name
+        self.kind = kind
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.error = None
+        self.token = None
+
+    def __enter__(self):
+        self.token = CURRENT_SPAN.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        CURRENT_SPAN.reset(self.token)
+        if exc is not None and not isinstance(exc, asyncio.CancelledError):
+            self.error = f"{exc_type.__name__}: {exc}"
+        self.finish()
+        return False
+
+    def finish(self, error=None):
+        self.end_ns = time.time_ns()
+        self.error = error or self.error
+        if len(FINISHED_SPANS) >= TRACE_BUFFER_MAX:
+            FINISHED_SPANS.popleft()
+            TRACE_STATS["dropped"] += 1
+        FINISHED_SPANS.append(self)
+        TRACE_STATS["finished"] += 1
+
+    def to_otlp(self):
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": otlp_attributes(self.attributes),
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.error:
+            span["status"] = {"code": SPAN_STATUS_ERROR, "message": self.error}
+        return span
+
+
+def otlp_attributes(attributes):
+    result = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": str(value)}
+        result.append({"key": key, "value": typed})
+    return result
+
+
+def trace_span(name, root=False, kind=SPAN_KIND_INTERNAL, **attributes):
+    """Aşama span'i: aktif bir iz varsa onun altında açılır
+
+    Kök işlemler (mesaj işleme, program kontrolü, bildirim gönderimi) root=True ile yeni iz başlatır;
+    tracing kapalıysa ya da iz örneklenmediyse maliyeti tek bir ContextVar okumasıdır.
+    """
+    parent = CURRENT_SPAN.get()
+    if parent is None and not (root and TRACE_EXPORT_PATH and random.random() < TRACE_SAMPLE_RATE):
+        return NO_SPAN
+    return Span(name, parent, kind, attributes)
+
+
+def traced(name, root=False):
+    """Fonksiyonun her çağrısını span olarak kaydet (dekoratör, sync ve async fonksiyonlar)"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with trace_span(name, root):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with trace_span(name, root):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_span(name, start_ns, **attributes):
+    """Başlangıcı önceden alınmış, şimdi biten alt span (ör. hız sınırı/slot bekleme süresi)"""
+    parent = CURRENT_SPAN.get()
+    if parent is not None:
+        Span(name, parent, attributes=attributes, start_ns=start_ns).finish()
+
+
+def annotate_span(**attributes):
+    """Aktif span'e alan ekle (iz yoksa bir şey yapmaz)"""
+    span = CURRENT_SPAN.get()
+    if span is not None:
+        span.attributes.update(attributes)
+
+
+class HttpTraceSpans:
+    """httpcore `trace` olaylarından alt span'ler: bağlantı (DNS+TCP), TLS, istek gönderimi, yanıt başlıkları
+    (OBS'in işlem süresi) ve gövde indirme ayrı görünür"""
+
+    def __init__(self, parent):
+        self.parent = parent
+        self.open = {}
+
+    async def __call__(self, event_name, info):
+        stage, _, phase = event_name.rpartition('.')
+        if phase == 'started':
+            self.open[stage] = Span(f"http.{stage}", self.parent, SPAN_KIND_CLIENT)
+        elif phase in ('complete', 'failed'):
+            span = self.open.pop(stage, None)
+            if span is not None:
+                span.finish(error=repr(info.get('exception')) if phase == 'failed' else None)
+
+
+def http_trace_extensions():
+    """httpx isteğine verilecek extensions: aktif iz varsa HTTP aşama span'leri"""
+    parent = CURRENT_SPAN.get()
+    return {'trace': HttpTraceSpans(parent)} if parent is not None else None
+
+
+class TracedHTTPXRequest(HTTPXRequest):
+    """Bot API çağrılarını (sendMessage, deleteMessage, ...) span olarak kaydeden PTB istek sınıfı"""
+
+    async def do_request(self, url, method, *args, **kwargs):
+        with trace_span(f"telegram.{url.rsplit('/', 1)[-1]}", kind=SPAN_KIND_CLIENT):
+            return await super().do_request(url, method, *args, **kwargs)
+
+
+def export_spans(spans):
+    """Span'leri OTLP/JSON ExportTraceServiceRequest gövdesine çevir (collector'ın file receiver'ı okur)"""
+    resource = {"service.name": TRACE_SERVICE_NAME, "service.instance.id": WORKER_ID, "bot.role": BOT_ROLE}
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": otlp_attributes(resource)},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": [span.to_otlp() for span in spans]}],
+        }]
     }
 
+
+def write_trace_batch(spans):
+    with open(TRACE_EXPORT_PATH, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(export_spans(spans), ensure_ascii=False) + "\n")
+    TRACE_STATS["exported"] += len(spans)
+
+
+async def flush_traces(context=None):
+    """Biten span'leri dosyaya yaz (tek satır = tek OTLP isteği); dosya I/O'su thread'de yapılır"""
+    if not FINISHED_SPANS:
+        return
+    spans = list(FINISHED_SPANS)
+    FINISHED_SPANS.clear()
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, write_trace_batch, spans)
+    except OSError as e:
+        logger.error("❌ Span'ler yazılamadı (%s): %s", TRACE_EXPORT_PATH, e)
+
+
+class SamplingProfiler:
+    """sys._current_frames() ile örnekleyen profiler: süreci durdurmadan tüm thread'lerin yığınlarını toplar
+
+    Çıktı folded formatındadır (`thread;fonksiyon (dosya:satır);... adet`): flamegraph.pl, inferno
+    ya da speedscope doğrudan açar.
+    """
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.lock = threading.Lock()
+
+    def run(self, seconds):
+        """seconds boyunca örnekle, folded yığınları döndür (başka profil çalışıyorsa None)"""
+        if not self.lock.acquire(blocking=False):
+            return None
+        try:
+            own = threading.get_ident()
+            counts = {}
+            samples = 0
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                        frame = frame.f_back
+                    stack.append(names.get(thread_id, str(thread_id)))
+                    key = ";".join(reversed(stack))
+                    counts[key] = counts.get(key, 0) + 1
+                samples += 1
+                time.sleep(self.interval)
+            logger.info("🔥 Profil alındı: %.0f sn, %s örnek, %s farklı yığın", seconds, samples, len(counts))
+            return "".join(f"{stack} {count}\n" for stack, count in sorted(counts.items()))
+        finally:
+            self.lock.release()
+
+
+PROFILER = SamplingProfiler()
+
+
+def profile_request(token, seconds):
+    """/profile isteği: (HTTP durum kodu, gövde) - ADMIN_TOKEN ile korunur, süre PROFILE_MAX_SECONDS ile sınırlı
+
+    Token sadece X-Admin-Token başlığından gelir (URL'deki token erişim loglarına düşer). Karşılaştırma
+    byte'lar üzerinde yapılır; compare_digest ASCII dışı str'lerde TypeError fırlatır.
+    """
+    if not ADMIN_TOKEN or not token or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        return 403, "forbidden\n"
+    try:
+        seconds = min(max(float(seconds or PROFILE_DEFAULT_SECONDS), 0.1), PROFILE_MAX_SECONDS)
+    except ValueError:
+        return 400, "seconds sayı olmalı\n"
+    folded = PROFILER.run(seconds)
+    if folded is None:
+        return 409, "başka bir profil çalışıyor\n"
+    return 200, folded
+
+
+class PriorityTokenBucket:
+    """Öncelik sınıflı token bucket: yüksek öncelikli bekleyenler (ör. kullanıcı sorguları) önce geçer"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.waiters = {priority: deque() for priority in PRIORITY_NAMES}  # {priority: deque[Future]}
+        self.dispatcher = None
+        self.granted = {priority: 0 for priority in PRIORITY_NAMES}
+        self.wait_total = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self.wait_max = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self.recent_waits = {priority: deque(maxlen=500) for priority in PRIORITY_NAMES}
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _record(self, priority, waited):
+        self.granted[priority] += 1
+        self.wait_total[priority] += waited
+        self.wait_max[priority] = max(self.wait_max[priority], waited)
+        self.recent_waits[priority].append(waited)
+
+    async def acquire(self, priority=PRIORITY_BACKGROUND):
+        """Bir token al (gerekirse öncelik sırasına göre bekle)"""
+        self._refill()
+        # Aynı ya da daha öncelikli bekleyen yoksa ve token varsa hemen geç. Kuyruk başındaki
+        # iptal edilmiş bekleyenler atılır; ortadakiler önlerinde canlı bekleyen olduğu için sayılmaz
+        ahead = False
+        for p in PRIORITY_NAMES:
+            if p > priority:
+                continue
+            queue = self.waiters[p]
+            while queue and queue[0].done():
+                queue.popleft()
+            if queue:
+                ahead = True
+                break
+        if not ahead and self.tokens >= 1:
+            self.tokens -= 1
+            self._record(priority, 0.0)
+            return
+
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[priority].append(future)
+        if self.dispatcher is None or self.dispatcher.done():
+            self.dispatcher = asyncio.ensure_future(self._dispatch())
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Token verildi ama bekleyen aynı anda iptal edildi: token boşa gitmesin
+                self._refill()
+                self.tokens = min(self.burst, self.tokens + 1)
+            raise
+        self._record(priority, time.monotonic() - started)
+
+    async def _dispatch(self):
+        """Token biriktikçe bekleyenleri öncelik sırasıyla uyandır"""
+        while any(self.waiters.values()):
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                continue
+            for priority in sorted(self.waiters):
+                queue = self.waiters[priority]
+                while queue and queue[0].done():  # iptal edilen bekleyenler
+                    queue.popleft()
+                if queue:
+                    self.tokens -= 1
+                    queue.popleft().set_result(None)
+                    break
+
+    def stats(self):
+        result = {
+            "rate": self.rate,
+            "burst": self.burst,
+            "tokens": round(min(self.burst, self.tokens + (time.monotonic() - self.updated) * self.rate), 2),
+        }
+        for priority, name in PRIORITY_NAMES.items():
+            recent = sorted(self.recent_waits[priority])
+            granted = self.granted[priority]
+            result[name] = {
+                "queue_depth": len(self.waiters[priority]),
+                "granted": granted,
+                "wait_avg": round(self.wait_total[priority] / granted, 4) if granted else 0.0,
+                "wait_max": round(self.wait_max[priority], 4),
+                "wait_p99": round(recent[min(len(recent) - 1, int(len(recent) * 0.99))], 4) if recent else 0.0,
+            }
+        return result
+
+
+OBS_RATE_LIMITER = PriorityTokenBucket(OBS_RATE_LIMIT, OBS_RATE_BURST)
+
+
+def get_obs_client():
+    """Ortak OBS istemcisini döndür (ilk çağrıda çalışan event loop içinde oluşturulur)"""
+    global OBS_CLIENT, OBS_SEMAPHORE
+    if OBS_CLIENT is None:
+        OBS_CLIENT = httpx.AsyncClient(
+            headers=OBS_HEADERS,
+            timeout=OBS_TIMEOUT,
+            http2=OBS_HTTP2,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=OBS_MAX_CONCURRENCY,
+                max_keepalive_connections=OBS_MAX_CONCURRENCY,
+                keepalive_expiry=OBS_KEEPALIVE_EXPIRY
+            )
+        )
+        OBS_SEMAPHORE = asyncio.Semaphore(OBS_MAX_CONCURRENCY)
+        logger.info("🌐 OBS istemcisi hazır (HTTP/2: %s, brotli: %s, eşzamanlılık: %s)",
+                    OBS_HTTP2, OBS_BROTLI, OBS_MAX_CONCURRENCY)
+    return OBS_CLIENT
+
+
+async def close_obs_client():
+    """Ortak OBS istemcisini kapat"""
+    global OBS_CLIENT, OBS_SEMAPHORE
+    if OBS_CLIENT is not None:
+        await OBS_CLIENT.aclose()
+        OBS_CLIENT = None
+        OBS_SEMAPHORE = None
+
+
+@contextlib.asynccontextmanager
+async def obs_request_slot(priority=PRIORITY_BACKGROUND):
+    """Hız sınırı token'ı ve eşzamanlılık yuvası al; tüm OBS istekleri buradan geçer"""
+    global OBS_LAST_REQUEST_AT
+    client = get_obs_client()
+    await OBS_RATE_LIMITER.acquire(priority)
+    async with OBS_SEMAPHORE:
+        OBS_LAST_REQUEST_AT = time.monotonic()
+        yield client
+
+
+async def obs_get(url, params=None, headers=None, priority=PRIORITY_BACKGROUND):
+    """OBS'e hız sınırı ve sınırlı eşzamanlılıkla, event loop'u bloklamadan GET isteği at
+
+    Uç noktanın devresi açıksa istek gönderilmez (ObsCircuitOpen). OBS_HEDGE açıksa kullanıcı
+    sorgularında yanıt p95 gecikmesinde gelmezse ikinci istek gönderilir, ilk gelen kullanılır.
+    """
+    if not OBS_HEDGE or priority != PRIORITY_INTERACTIVE:
+        return await obs_get_once(url, params, headers, priority)
+
+    first = asyncio.ensure_future(obs_get_once(url, params, headers, priority))
+    done, _ = await asyncio.wait({first}, timeout=hedge_delay())
+    if done or obs_breaker(url).state != BREAKER_CLOSED:
+        # Zamanında geldi ya da OBS zaten zorlanıyor: ikinci istekle yük bindirilmez
+        return await first
+
+    OBS_HEDGE_STATS["hedged"] += 1
+    second = asyncio.ensure_future(obs_get_once(url, params, headers, priority))
+    pending = {first, second}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                # İptal edilmiş task'ta exception() CancelledError fırlatır; önce kontrol edilir
+                if not task.cancelled() and task.exception() is None:
+                    if task is second:
+                        OBS_HEDGE_STATS["hedge_won"] += 1
+                    return task.result()
+        # İkisi de başarısız: iptal edilmemiş ilk isteğin hatası
+        return (second if first.cancelled() else first).result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+@traced('obs.request')
+async def obs_get_once(url, params=None, headers=None, priority=PRIORITY_BACKGROUND):
+    """Tek OBS GET isteği - sonuç uç noktanın devre kesicisine işlenir"""
+    breaker = obs_breaker(url)
+    annotate_span(endpoint=breaker.name, priority=PRIORITY_NAMES[priority])
+    breaker.before_request()
+    try:
+        slot_wait_start = time.time_ns()
+        async with obs_request_slot(priority) as client:
+            record_span('obs.slot_wait', slot_wait_start)
+            start = time.perf_counter()
+            with OBS_FETCH_SECONDS.time(PRIORITY_NAMES[priority]):
+                try:
+                    response = await client.get(url, params=params, headers=headers,
+                                                extensions=http_trace_extensions())
+                except httpx.HTTPError as e:
+                    OBS_ERRORS_TOTAL.inc(obs_error_type(e))
+                    breaker.record_failure()
+                    raise
+            elapsed = time.perf_counter() - start
+    except asyncio.CancelledError:
+        breaker.record_cancelled()
+        raise
+
+    annotate_span(status_code=response.status_code, bytes=len(response.content))
+    if response.status_code >= 400:
+        OBS_ERRORS_TOTAL.inc('http_status')
+    # 5xx ve 429 OBS'in zorlandığını gösterir; diğer 4xx'ler isteğin kendisiyle ilgilidir
+    if response.status_code >= 500 or response.status_code == 429:
+        breaker.record_failure()
+    else:
+        breaker.record_success(elapsed)
+        if priority == PRIORITY_INTERACTIVE:
+            OBS_INTERACTIVE_LATENCY.add(elapsed)
+    return response
+
+
+class ObsCircuitOpen(httpx.TransportError):
+    """Devre açık: OBS'e istek gönderilmedi (çağıran önbelleğe düşer)"""
+
+
+BREAKER_CLOSED = 'closed'
+BREAKER_OPEN = 'open'
+BREAKER_HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Tek bir OBS uç noktası için devre kesici
+
+    - closed: istekler serbest; ardışık OBS_BREAKER_FAILURES hata ya da yavaş yanıt devreyi açar
+    - open: istekler OBS'e gitmeden ObsCircuitOpen ile reddedilir
+    - half_open: bekleme dolunca tek bir deneme isteğine izin verilir; başarılıysa devre kapanır,
+      değilse bekleme ikiye katlanarak tekrar açılır
+    """
+
+    def __init__(self, name, failure_threshold, slow_seconds, open_seconds, max_open_seconds):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_seconds = slow_seconds
+        self.base_open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.open_seconds = open_seconds
+        self.state = BREAKER_CLOSED
+        self.failures = 0  # ardışık
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.trips = 0
+        self.rejected = 0
+
+    def before_request(self):
+        """İstek gönderilebilir mi? Değilse ObsCircuitOpen; half_open'da tek deneme isteği geçer"""
+        if self.state == BREAKER_CLOSED:
+            return
+        if self.state == BREAKER_OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+            self.state = BREAKER_HALF_OPEN
+            logger.warning("🔌 [DEVRE] %s: deneme isteği gönderiliyor (half-open)", self.name,
+                           extra={'endpoint': self.name})
+        if self.state == BREAKER_HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return
+        self.rejected += 1
+        raise ObsCircuitOpen(f"OBS devresi açık ({self.name}), {self.retry_in():.0f} sn sonra denenecek")
+
+    def retry_in(self):
+        return max(0.0, self.opened_at + self.open_seconds - time.monotonic())
+
+    def record_success(self, elapsed):
+        if elapsed >= self.slow_seconds:
+            # Yanıt geldi ama gecikme sıçraması da hata sayılır
+            self.record_failure()
+            return
+        if self.state != BREAKER_CLOSED:
+            logger.info("✅ [DEVRE] %s: OBS düzeldi, devre kapandı", self.name, extra={'endpoint': self.name})
+        self.state = BREAKER_CLOSED
+        self.failures = 0
+        self.open_seconds = self.base_open_seconds
+        self.probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == BREAKER_HALF_OPEN:
+            self.open_seconds = min(self.open_seconds * 2, self.max_open_seconds)
+            self.trip()
+        elif self.state == BREAKER_CLOSED and self.failures >= self.failure_threshold:
+            self.trip()
+
+    def record_cancelled(self):
+        # Sonuçlanmayan (iptal edilen) deneme isteği yerine bir sonraki istek deneme olur
+        self.probe_in_flight = False
+
+    def trip(self):
+        self.state = BREAKER_OPEN
+        self.opened_at = time.monotonic()
+        self.probe_in_flight = False
+        self.trips += 1
+        logger.warning("🔌 [DEVRE] %s: %s ardışık hata/yavaş yanıt - devre %.0f sn açık",
+                       self.name, self.failures, self.open_seconds, extra={'endpoint': self.name})
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "retry_in": round(self.retry_in(), 1) if self.state != BREAKER_CLOSED else 0.0,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+
+OBS_BREAKERS = {}  # {uç nokta URL'si: CircuitBreaker}
+
+
+def obs_breaker(url):
+    breaker = OBS_BREAKERS.get(url)
+    if breaker is None:
+        name = url[len(OBS_BASE_URL):] or '/'
+        breaker = OBS_BREAKERS[url] = CircuitBreaker(
+            name, OBS_BREAKER_FAILURES, OBS_BREAKER_SLOW_SECONDS,
+            OBS_BREAKER_OPEN_SECONDS, OBS_BREAKER_MAX_OPEN_SECONDS)
+    return breaker
+
+
+class LatencyWindow:
+    """Son N başarılı isteğin gecikmesi - hedge gecikmesi için p95"""
+
+    def __init__(self, size=200):
+        self.samples = deque(maxlen=size)
+
+    def add(self, elapsed):
+        self.samples.append(elapsed)
+
+    def percentile(self, q):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+OBS_INTERACTIVE_LATENCY = LatencyWindow()
+OBS_HEDGE_STATS = {"hedged": 0, "hedge_won": 0}
+
+
+def hedge_delay():
+    """İkinci isteğin gönderileceği an: kullanıcı sorgularının p95 gecikmesi"""
+    if len(OBS_INTERACTIVE_LATENCY.samples) < OBS_HEDGE_MIN_SAMPLES:
+        return OBS_HEDGE_DEFAULT_DELAY
+    return max(OBS_HEDGE_MIN_DELAY, OBS_INTERACTIVE_LATENCY.percentile(0.95))
+
+
+def obs_error_type(error):
+    """Metrik etiketi için httpx hatasının türü"""
+    if isinstance(error, httpx.TimeoutException):
+        return 'timeout'
+    if isinstance(error, httpx.TransportError):
+        return 'transport'
+    return 'other'
+
+
+async def warm_obs_connections(context: ContextTypes.DEFAULT_TYPE = None):
+    """Havuz boştaysa OBS'e hafif bir HEAD isteği at; ilk sorgu TLS el sıkışması beklemesin"""
+    if time.monotonic() - OBS_LAST_REQUEST_AT < OBS_WARM_INTERVAL:
+        return
+    if obs_breaker(BASE_URL).state != BREAKER_CLOSED:
+        return  # zorlanan sunucuya ısıtma isteği gönderilmez
+
     try:
-        response = requests.get(MAIN_URL, headers=headers, timeout=15)
-        print(f"🌐 MAIN_URL status: {response.status_code}")
+        async with obs_request_slot(PRIORITY_BACKGROUND) as client:
+            await client.head(MAIN_URL)
+    except httpx.HTTPError as e:
+        logger.warning("⚠️  OBS ısıtma isteği başarısız: %s", e)
+
+
+async def load_program_codes():
+    """OBS sayfasından program kodlarını ve value ID'lerini yükle
+
+    Dönüş: {kod: id} - OBS'ten alınamazsa None (çağıran manuel listeye döner)
+    """
+    from bs4 import BeautifulSoup  # sadece bu yenilemede gerekli; açılışı yavaşlatmasın
+
+    logger.info("🔄 Program kodları yükleniyor...")
+
+    try:
+        response = await obs_get(MAIN_URL)
+        logger.debug("🌐 MAIN_URL status: %s", response.status_code)
         response.raise_for_status()
 
         soup = BeautifulSoup(response.text, 'html.parser')
@@ -70,13 +1093,12 @@ def load_program_codes():
         select_element = soup.find('select', {'id': 'dersBransKoduId'})
 
         if not select_element:
-            print("❌ #dersBransKoduId select elementi bulunamadı!")
-            print("📋 Fallback manuel listesi kullanılıyor...")
-            return get_manual_program_list()
+            logger.error("❌ #dersBransKoduId select elementi bulunamadı!")
+            return None
 
         program_codes = {}
         options = select_element.find_all('option')
-        print(f"📋 Toplam {len(options)} option bulundu")
+        logger.debug("📋 Toplam %s option bulundu", len(options))
 
         valid_count = 0
         for option in options:
@@ -87,35 +1109,106 @@ def load_program_codes():
                 program_codes[text] = value
                 valid_count += 1
                 if valid_count <= 10:
-                    print(f"   📂 {text:<6} -> {value} (value='{value}', text='{text}')")
+                    logger.debug("📂 %-6s -> %s (value='%s', text='%s')", text, value, value, text)
 
-        print(f"✅ {len(program_codes)} geçerli program kodu yüklendi")
+        logger.info("✅ %s geçerli program kodu yüklendi", len(program_codes))
 
         test_codes = ['END', 'TUR', 'KIM', 'MAT', 'FIZ', 'BIL', 'ELE', 'MAK']
-        print(f"\n🔍 Popüler kodlar kontrolü:")
+        logger.debug("🔍 Popüler kodlar kontrolü:")
         for kod in test_codes:
             if kod in program_codes:
-                print(f"   ✅ {kod:<6} -> {program_codes[kod]}")
+                logger.debug("✅ %-6s -> %s", kod, program_codes[kod])
             else:
-                print(f"   ❌ {kod:<6} YÜKLENEMEDİ!")
+                logger.warning("❌ %-6s YÜKLENEMEDİ!", kod)
 
         if len(program_codes) < 10:
-            print("⚠️  Az program kodu yüklendi, manuel listeye dönülüyor...")
-            return get_manual_program_list()
+            logger.warning("⚠️  Az program kodu yüklendi, mevcut liste korunuyor...")
+            return None
 
         return program_codes
 
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Network hatası: {e}")
-        return get_manual_program_list()
+    except httpx.HTTPError as e:
+        logger.error("❌ Network hatası: %s", e)
+        return None
     except Exception as e:
-        print(f"❌ Beklenmeyen hata: {e}")
-        return get_manual_program_list()
+        logger.exception("❌ Beklenmeyen hata: %s", e)
+        return None
+
+
+def load_cached_program_codes(path=None):
+    """Diskteki program kodu önbelleğini oku
+
+    Dönüş: (codes, age_seconds) - dosya yoksa ya da bozuksa (None, None)
+    """
+    path = path or PROGRAM_CODES_CACHE_PATH
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        codes = data['codes']
+        age = time.time() - float(data['fetched_at'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None, None
+    if not isinstance(codes, dict) or len(codes) < 10:
+        return None, None
+    return codes, age
+
+
+def save_program_codes(codes, path=None):
+    """Program kodlarını diske yaz (yarım kalan yazma eski dosyayı bozmasın)
+
+    Geçici dosya adı süreç başına benzersizdir; aynı anda yazan iki süreç birbirinin dosyasını ezmez.
+    """
+    path = path or PROGRAM_CODES_CACHE_PATH
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=os.path.dirname(os.path.abspath(path)),
+                                         prefix=f"{os.path.basename(path)}.", suffix='.tmp', delete=False) as f:
+            tmp_path = f.name
+            json.dump({"fetched_at": time.time(), "codes": codes}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning("⚠️  Program kodu önbelleği yazılamadı (%s): %s", path, e)
+        if tmp_path is not None:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+
+
+async def refresh_program_codes(context: ContextTypes.DEFAULT_TYPE = None):
+    """Program kodlarını arka planda OBS'ten yenile; başarılıysa diske de yaz
+
+    Yeni eşleme eskisinin üstüne eklenmez, bütün olarak yerine geçer: OBS'ten kalkan
+    kodlar listede kalmaz. Çekme başarısızsa mevcut eşleme olduğu gibi kalır.
+    """
+    global PROGRAM_KODLARI
+    codes = await load_program_codes()
+    if codes is None:
+        logger.warning("📋 Program kodları yenilenemedi, mevcut %s kod kullanılmaya devam ediyor",
+                       len(PROGRAM_KODLARI))
+        return
+    PROGRAM_KODLARI = dict(codes)
+    save_program_codes(codes)
+    logger.info("📂 %s program kodu OBS'ten yenilendi ve önbelleğe yazıldı", len(codes))
+
+
+def load_startup_program_codes():
+    """Açılışta program kodlarını beklemeden yükle: disk önbelleği, yoksa manuel liste
+
+    Dönüş: OBS'ten yenilemeye kadar kalan süre (sn) - 0 ise hemen yenilenmeli
+    """
+    global PROGRAM_KODLARI
+    codes, age = load_cached_program_codes()
+    if codes is None:
+        PROGRAM_KODLARI = get_manual_program_list()
+        return 0
+    PROGRAM_KODLARI = dict(codes)
+    logger.info("💾 %s program kodu önbellekten yüklendi (%.1f saat önce, %s)",
+                len(codes), age / 3600, PROGRAM_CODES_CACHE_PATH)
+    return max(0.0, PROGRAM_CODES_TTL - age)
 
 
 def get_manual_program_list():
     """Manuel program listesi - HTML'den doğrulanmış"""
-    print("📋 Manuel program listesi yükleniyor...")
+    logger.info("📋 Manuel program listesi yükleniyor...")
 
     manual_list = {
         'AKM': '42', 'ALM': '227', 'ARB': '305', 'ARC': '302', 'ATA': '43',
@@ -155,64 +1248,1655 @@ def get_manual_program_list():
         'YZV': '221'
     }
 
-    print(f"✅ Manuel listeden {len(manual_list)} program yüklendi")
-    print("   📂 END -> 15")
-    print("   📂 TUR -> 34")
-    print("   📂 KIM -> 27")
-    print("   📂 MAT -> 26")
-    print("   📂 BHB -> 321")
+    logger.info("✅ Manuel listeden %s program yüklendi", len(manual_list))
 
     return manual_list
 
 
-# Program kodlarını yükle (global)
-PROGRAM_KODLARI = load_program_codes()
+# Program kodları (global) - bot başlarken önbellekten yüklenir, arka planda yenilenir
+PROGRAM_KODLARI = {}
 
 
-async def check_course(context: ContextTypes.DEFAULT_TYPE):
-    """Arka planda dersleri kontrol et ve kontenjan açılınca bildir"""
-    job = context.job
-    chat_id, program_code, crn = job.data
+# === OBS Ders Tablosu Parser'ı (lxml) ===
+# Parser'ın döndürdüğü satır tuple'ı: (crn, ders_kodu, ders_adi, gun, saat, kontenjan, yazilan)
+ROW_CRN, ROW_CODE, ROW_NAME, ROW_DAY, ROW_TIME, ROW_CAPACITY, ROW_ENROLLED = range(7)
 
-    print(f"⏲️ [DAKİKALIK KONTROL] {chat_id} için {program_code}_{crn} kontrol ediliyor...")
+# Başlık bulunamazsa kullanılan sabit kolon sırası: [0]CRN [1]Kod [2]Ad [6]Gün [7]Saat [9]KONTENJAN [10]YAZILAN
+DEFAULT_COLUMN_LAYOUT = (0, 1, 2, 6, 7, 9, 10)
 
-    # Rate-limiting: Son istekten bu yana 2 saniye geçti mi?
-    current_time = time.time()
-    if chat_id in LAST_REQUEST_TIME:
-        elapsed = current_time - LAST_REQUEST_TIME[chat_id]
-        if elapsed < 2:
-            await asyncio.sleep(2 - elapsed)
+# Başlık metni → alan eşleşmesi (sıra önemli: "Ders Kodu" önce kod olarak yakalanır)
+HEADER_KEYWORDS = (
+    (ROW_CRN, ('crn',)),
+    (ROW_CODE, ('ders kodu', 'course code')),
+    (ROW_CAPACITY, ('kontenjan', 'capacity')),
+    (ROW_ENROLLED, ('yazılan', 'yazilan', 'enrolled')),
+    (ROW_DAY, ('gün', 'gun', 'day')),
+    (ROW_TIME, ('saat', 'time')),
+    (ROW_NAME, ('ders adı', 'ders adi', 'course title', 'ders', 'course name')),
+)
+
+COLUMN_LAYOUT_CACHE = {}  # {başlık tuple'ı: kolon indeksleri}
+
+
+def detect_column_layout(header_texts):
+    """Tablo başlığından alanların kolon indekslerini bul (aynı başlık için bir kez hesaplanır)"""
+    key = tuple(header_texts)
+    layout = COLUMN_LAYOUT_CACHE.get(key)
+    if layout is not None:
+        return layout
+
+    found = {}
+    for index, text in enumerate(header_texts):
+        text = text.casefold()
+        for field, keywords in HEADER_KEYWORDS:
+            if field in found:
+                continue
+            if any(text == kw or text.startswith(kw + ' ') or (' ' in kw and kw in text) for kw in keywords):
+                found[field] = index
+                break
+
+    layout = tuple(found.get(field, default) for field, default in enumerate(DEFAULT_COLUMN_LAYOUT))
+    if len(found) < len(DEFAULT_COLUMN_LAYOUT):
+        logger.warning("⚠️  Başlıkta bazı kolonlar bulunamadı, varsayılan sıra kullanıldı: %s", layout)
+    COLUMN_LAYOUT_CACHE[key] = layout
+    return layout
+
+
+def cell_text(element):
+    """Hücre metni - BeautifulSoup get_text(strip=True) ile aynı sonucu verir"""
+    return "".join(text.strip() for text in element.itertext())
+
+
+def parse_program_table(html, encoding=None):
+    """dersProgramContainer tablosunu lxml ile parse et
+
+    Dönüş: satır tuple listesi (bkz. ROW_*), tablo yoksa None.
+    """
+    if isinstance(html, bytes):
+        parser = lxml.html.HTMLParser(encoding=encoding or 'utf-8')
+    else:
+        parser = lxml.html.HTMLParser()
+    try:
+        doc = lxml.html.document_fromstring(html, parser=parser)
+    except (lxml.etree.ParserError, ValueError):
+        return None
+
+    tables = doc.xpath('//table[@id="dersProgramContainer"]') or doc.xpath('//table')
+    if not tables:
+        return None
+    table = tables[0]
+
+    header = table.xpath('./thead/tr[1]/th | ./thead/tr[1]/td') or table.xpath('(.//tr[th])[1]/th')
+    layout = detect_column_layout([cell_text(cell) for cell in header]) if header else DEFAULT_COLUMN_LAYOUT
+    i_crn, i_code, i_name, i_day, i_time, i_capacity, i_enrolled = layout
+    min_cells = max(layout) + 1
+
+    rows = []
+    for tr in table.xpath('./tbody/tr | ./tr'):
+        cells = tr.findall('td')
+        if len(cells) < min_cells:
+            continue
+        capacity = cell_text(cells[i_capacity])
+        enrolled = cell_text(cells[i_enrolled])
+        rows.append((
+            cell_text(cells[i_crn]),
+            cell_text(cells[i_code]),
+            cell_text(cells[i_name]),
+            cell_text(cells[i_day]),
+            cell_text(cells[i_time]),
+            int(capacity) if capacity.isdigit() else 0,
+            int(enrolled) if enrolled.isdigit() else 0,
+        ))
+    return rows
+
+
+# === HTML Parse Havuzu ===
+class ParsePool:
+    """Büyük program sayfalarını ProcessPoolExecutor'da parse eder
+
+    - Girdi ham HTML byte'ları, çıktı parse_program_table'ın satır tuple'ları (pickle'ı küçük)
+    - inline_max_bytes altındaki sayfalar ve havuz başlatılmadıysa parse inline yapılır
+    - Havuzda en fazla max_pending iş bulunur; doluysa arka plan parse'ları sıra bekler
+      (backpressure), interaktif sorgular beklemez ve sayfa inline parse edilir
+    - Havuz çökerse (BrokenProcessPool) o sayfa inline parse edilir, havuz yeniden kurulur
+    """
+
+    def __init__(self, workers, inline_max_bytes, max_pending):
+        self.workers = workers
+        self.inline_max_bytes = inline_max_bytes
+        self.max_pending = max_pending
+        self.executor = None
+        self.slots = None
+        self.pending = 0
+        self.inline = 0
+        self.offloaded = 0
+        self.waited = 0  # havuz dolu olduğu için bekleyen arka plan parse'ları
+        self.saturated = 0  # havuz dolu olduğu için inline parse edilen interaktif sorgular
+        self.broken = 0
+
+    def start(self):
+        """Havuzu kur (event loop içinden çağrılır); PARSE_WORKERS=0 ise parse inline kalır"""
+        if self.workers <= 0 or self.executor is not None:
+            return
+        # spawn: event loop/Flask thread'leri olan süreç fork edilmez
+        self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        self.slots = asyncio.Semaphore(self.max_pending)
+        # İşçi süreçlerin açılışı (bot modülünün import'u) ilk sayfayı bekletmesin
+        for _ in range(self.workers):
+            self.executor.submit(parse_program_table, b'')
+
+    def stop(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+            self.slots = None
+
+    @traced('parse')
+    async def parse(self, html, encoding=None, priority=PRIORITY_BACKGROUND):
+        """Sayfayı parse et: satır tuple listesi, tablo yoksa None"""
+        if self.executor is None or len(html) < self.inline_max_bytes:
+            return self._parse_inline(html, encoding)
+
+        slots = self.slots
+        if slots.locked():
+            if priority == PRIORITY_INTERACTIVE:
+                # Kullanıcı arka plan işlerinin arkasında beklemesin; havuz sınırı da aşılmasın
+                self.saturated += 1
+                return self._parse_inline(html, encoding)
+            self.waited += 1
+        await slots.acquire()
+        annotate_span(mode='pool', bytes=len(html))
+        self.pending += 1
+        try:
+            with PARSE_SECONDS.time('pool'):
+                rows = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, parse_program_table, html, encoding)
+            self.offloaded += 1
+            return rows
+        except BrokenProcessPool:
+            self.broken += 1
+            logger.warning("⚠️  Parse havuzu çöktü, yeniden kuruluyor (sayfa inline parse ediliyor)")
+            self.stop()
+            self.start()
+            return self._parse_inline(html, encoding)
+        finally:
+            self.pending -= 1
+            slots.release()
+
+    def _parse_inline(self, html, encoding):
+        annotate_span(mode='inline', bytes=len(html))
+        self.inline += 1
+        with PARSE_SECONDS.time('inline'):
+            return parse_program_table(html, encoding)
+
+    def stats(self):
+        return {
+            "workers": self.workers if self.executor is not None else 0,
+            "inline_max_bytes": self.inline_max_bytes,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "inline": self.inline,
+            "offloaded": self.offloaded,
+            "waited": self.waited,
+            "saturated": self.saturated,
+            "broken": self.broken,
+        }
+
+
+PARSE_POOL = ParsePool(PARSE_WORKERS, PARSE_INLINE_MAX_BYTES, PARSE_MAX_PENDING)
+
+
+# === Ders Modeli ===
+class CourseRow:
+    """Ders tablosundaki tek bir şube (parser tuple'ından oluşturulur)"""
+    __slots__ = ('crn', 'course_code', 'course_name', 'day', 'time_slot', 'capacity', 'enrolled')
+
+    def __init__(self, crn, course_code, course_name, day, time_slot, capacity, enrolled):
+        self.crn = crn
+        self.course_code = course_code
+        self.course_name = course_name
+        self.day = day
+        self.time_slot = time_slot
+        self.capacity = capacity
+        self.enrolled = enrolled
+
+    @property
+    def free_seats(self):
+        return max(0, self.capacity - self.enrolled)
+
+    def __repr__(self):
+        return f"CourseRow({self.crn!r}, {self.course_code!r}, {self.capacity}/{self.enrolled})"
+
+
+# Kontrol sonucu durumları
+CHECK_OPEN = 'open'            # ders bulundu, boş yer var
+CHECK_FULL = 'full'            # ders bulundu, kontenjan dolu
+CHECK_NOT_FOUND = 'not_found'  # CRN programda yok
+CHECK_ERROR = 'error'          # OBS/program kodu hatası
+
+
+class CheckResult:
+    """Bir CRN kontrolünün yapılandırılmış sonucu - Markdown'a render_check_result çevirir"""
+    __slots__ = ('status', 'program_code', 'crn', 'row', 'samples', 'error_message', 'stale_age')
+
+    def __init__(self, status, program_code, crn, row=None, samples=(), error_message=None, stale_age=None):
+        self.status = status
+        self.program_code = program_code
+        self.crn = crn
+        self.row = row
+        self.samples = samples  # CRN bulunamazsa programdaki ilk dersler
+        self.error_message = error_message  # CHECK_ERROR için hazır mesaj
+        self.stale_age = stale_age  # OBS yanıt vermiyorsa verinin yaşı (sn)
+
+    @property
+    def free_seats(self):
+        return self.row.free_seats if self.row is not None else 0
+
+
+def estimate_rows_size(rows):
+    """Parse edilmiş satırların bellekte kapladığı yaklaşık byte miktarı"""
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(getattr(row, field)) for field in CourseRow.__slots__)
+    return size
+
+
+class ProgramSnapshot:
+    """Bir program sayfasının parse edilmiş hali (CRN ile indekslenmiş CourseRow listesi)"""
+    __slots__ = ('rows', 'rows_by_crn', 'fetched_at', 'size_bytes', 'etag', 'last_modified', 'stale',
+                 'body_hash', 'partial')
+
+    @classmethod
+    def from_parsed(cls, parsed_rows, etag=None, last_modified=None, body_hash=None, partial=False):
+        """parse_program_table tuple'larından snapshot oluştur"""
+        return cls([CourseRow(*row) for row in parsed_rows], etag, last_modified, body_hash, partial)
+
+    def __init__(self, rows, etag=None, last_modified=None, body_hash=None, partial=False):
+        self.rows = rows
+        self.rows_by_crn = {row.crn: row for row in rows}
+        self.fetched_at = time.monotonic()
+        self.size_bytes = estimate_rows_size(rows) + sys.getsizeof(self.rows_by_crn)
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stale = False  # OBS'ten yenilenemediyse True
+        self.body_hash = body_hash  # ham sayfanın özeti - aynıysa parse atlanır
+        self.partial = partial  # sadece bazı satırlar var (akış taraması)
+
+    def refreshed(self, etag=None, last_modified=None, body_hash=None):
+        """Sayfa değişmediğinde aynı satırları paylaşan yeni snapshot (parse edilmez)"""
+        snapshot = ProgramSnapshot.__new__(ProgramSnapshot)
+        snapshot.rows = self.rows
+        snapshot.rows_by_crn = self.rows_by_crn
+        snapshot.fetched_at = time.monotonic()
+        snapshot.size_bytes = self.size_bytes
+        snapshot.etag = etag or self.etag
+        snapshot.last_modified = last_modified or self.last_modified
+        snapshot.stale = False
+        snapshot.body_hash = body_hash or self.body_hash
+        snapshot.partial = self.partial
+        return snapshot
+
+    def age(self):
+        return time.monotonic() - self.fetched_at
+
+
+class ProgramSnapshotCache:
+    """Program ID'ye göre TTL'li, byte sınırlı LRU önbellek
+
+    - Aynı program için eşzamanlı istekler tek bir OBS sorgusunda birleşir.
+    - OBS hata verirse son başarılı snapshot `stale` işaretlenerek döndürülür.
+    """
+
+    def __init__(self, ttl, max_bytes):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # {program_id: ProgramSnapshot}
+        self.inflight = {}  # {program_id: asyncio.Task}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stale_served = 0
+        self.evictions = 0
+
+    def has_fresh(self, program_id, max_age=None):
+        snapshot = self.entries.get(program_id)
+        max_age = self.ttl if max_age is None else min(max_age, self.ttl)
+        return snapshot is not None and not snapshot.stale and snapshot.age() < max_age
+
+    async def get(self, program_id, loader, allow_stale=False, max_age=None):
+        """Snapshot'ı önbellekten ya da `loader(previous)` ile OBS'ten al
+
+        max_age verilirse TTL'den daha taze veri istenebilir (hızlı takip edilen programlar).
+        Dönüş: (snapshot, error_message)
+        """
+        snapshot = self.entries.get(program_id)
+        if snapshot is not None:
+            if self.has_fresh(program_id, max_age):
+                self.entries.move_to_end(program_id)
+                self.hits += 1
+                return snapshot, None
+            if snapshot.stale and allow_stale:
+                # OBS zaten hata veriyor: bekletmeden eski veriyi ver, arka planda yenile
+                self._start_refresh(program_id, loader, snapshot)
+                self.stale_served += 1
+                return snapshot, None
+
+        task = self.inflight.get(program_id)
+        if task is None:
+            self.misses += 1
+            task = self._start_refresh(program_id, loader, snapshot)
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _start_refresh(self, program_id, loader, previous):
+        task = self.inflight.get(program_id)
+        if task is None:
+            task = asyncio.ensure_future(self._load(program_id, loader, previous))
+            self.inflight[program_id] = task
+            task.add_done_callback(lambda _task: self.inflight.pop(program_id, None))
+        return task
+
+    async def _load(self, program_id, loader, previous):
+        snapshot, error_message = await loader(previous)
+        if snapshot is not None:
+            self.put(program_id, snapshot)
+            return snapshot, None
+
+        last_good = self.entries.get(program_id)
+        if last_good is not None:
+            last_good.stale = True
+            self.stale_served += 1
+            logger.warning("♻️  OBS hatası, son başarılı veri kullanılıyor (%.0f sn önce)", last_good.age(),
+                           extra={'program_id': program_id})
+            return last_good, None
+        return None, error_message
+
+    def put(self, program_id, snapshot):
+        old = self.entries.pop(program_id, None)
+        if old is not None:
+            self.total_bytes -= old.size_bytes
+        self.entries[program_id] = snapshot
+        self.total_bytes += snapshot.size_bytes
+
+        # Byte sınırı aşıldıysa en az kullanılanları at (en yeni kayıt her zaman kalır)
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.total_bytes -= evicted.size_bytes
+            self.evictions += 1
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "stale_served": self.stale_served,
+            "evictions": self.evictions,
+        }
+
+
+SNAPSHOT_CACHE = ProgramSnapshotCache(SNAPSHOT_TTL, SNAPSHOT_CACHE_MAX_BYTES)
+
+
+# === Snapshot Farkları (kontenjan olayları) ===
+EVENT_SEATS_CHANGED = 'seats_changed'        # kontenjan ya da yazılan sayısı değişti
+EVENT_SEATS_OPENED = 'seats_opened'          # dolu şubede yer açıldı (ya da boş yerli şube eklendi)
+EVENT_CAPACITY_RAISED = 'capacity_raised'    # kontenjan artırıldı
+EVENT_SECTION_ADDED = 'section_added'        # programa yeni şube eklendi
+EVENT_SECTION_REMOVED = 'section_removed'    # şube programdan kalktı
+
+
+class SeatEvent:
+    """İki snapshot arasındaki tek bir şube değişikliği"""
+    __slots__ = ('kind', 'program_code', 'crn', 'old', 'new', 'observed_at')
+
+    def __init__(self, kind, program_code, crn, old=None, new=None, observed_at=None):
+        self.kind = kind
+        self.program_code = program_code
+        self.crn = crn
+        self.old = old  # önceki CourseRow (eklenen şubede None)
+        self.new = new  # yeni CourseRow (kalkan şubede None)
+        self.observed_at = observed_at  # değişikliği getiren snapshot'ın zamanı (time.monotonic)
+
+    def __repr__(self):
+        return f"SeatEvent({self.kind!r}, {self.program_code!r}, {self.crn!r})"
+
+
+def diff_snapshots(program_code, old, new):
+    """İki snapshot arasındaki şube değişikliklerini SeatEvent listesi olarak döndür
+
+    Kısmi snapshot'larda (akış taraması) eklenen/kalkan şube tespit edilemez,
+    sadece iki tarafta da olan satırlar karşılaştırılır.
+    """
+    if old is None or old.rows is new.rows:
+        return []
+
+    events = []
+    complete = not (old.partial or new.partial)
+    old_by_crn = old.rows_by_crn
+    for crn, row in new.rows_by_crn.items():
+        previous = old_by_crn.get(crn)
+        if previous is None:
+            if complete:
+                events.append(SeatEvent(EVENT_SECTION_ADDED, program_code, crn, new=row))
+                if row.free_seats > 0:
+                    events.append(SeatEvent(EVENT_SEATS_OPENED, program_code, crn, new=row))
+            continue
+        if previous.capacity == row.capacity and previous.enrolled == row.enrolled:
+            continue
+        events.append(SeatEvent(EVENT_SEATS_CHANGED, program_code, crn, previous, row))
+        if row.capacity > previous.capacity:
+            events.append(SeatEvent(EVENT_CAPACITY_RAISED, program_code, crn, previous, row))
+        if previous.free_seats == 0 and row.free_seats > 0:
+            events.append(SeatEvent(EVENT_SEATS_OPENED, program_code, crn, previous, row))
+
+    if complete:
+        new_by_crn = new.rows_by_crn
+        for crn, row in old_by_crn.items():
+            if crn not in new_by_crn:
+                events.append(SeatEvent(EVENT_SECTION_REMOVED, program_code, crn, old=row))
+
+    for event in events:
+        event.observed_at = new.fetched_at
+    return events
+
+
+class SeatEventBus:
+    """Her programın son snapshot'ını tutar, yenisiyle farkını alıp abonelere yayınlar
+
+    Aboneler `callback(program_code, events)` şeklinde çağrılır; tek bir sayfa
+    çekimi o programı takip eden herkese cevap verir.
+    """
+
+    def __init__(self):
+        self.snapshots = {}  # {program_code: son görülen ProgramSnapshot}
+        self.subscribers = []
+        self.observed = 0
+        self.counts = {}  # {event kind: adet}
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+        return callback
+
+    def observe(self, program_code, snapshot):
+        """Yeni snapshot'ı önceki ile karşılaştır ve olayları yayınla (ilk snapshot'ta olay yok)"""
+        previous = self.snapshots.get(program_code)
+        self.snapshots[program_code] = snapshot
+        self.observed += 1
+        events = diff_snapshots(program_code, previous, snapshot)
+        if events:
+            for event in events:
+                self.counts[event.kind] = self.counts.get(event.kind, 0) + 1
+            for callback in self.subscribers:
+                try:
+                    callback(program_code, events)
+                except Exception as e:
+                    logger.exception("💥 Olay abonesi hatası (%s): %s", program_code, e,
+                                     extra={'program': program_code})
+        return events
+
+    def forget(self, program_code):
+        self.snapshots.pop(program_code, None)
 
-    result = search_course(program_code, crn, is_background=True)
+    def stats(self):
+        return {
+            "programs": len(self.snapshots),
+            "observed": self.observed,
+            "events": dict(self.counts),
+        }
 
-    # Son istek zamanını güncelle
-    LAST_REQUEST_TIME[chat_id] = time.time()
 
-    if result:
-        await context.application.bot.send_message(
-            chat_id=chat_id,
-            text=result,
-            parse_mode='Markdown'
+SEAT_EVENTS = SeatEventBus()
+
+
+# === Katalog: Tüm Programların Sütunlu Kontenjan İndeksi ===
+class StringTable:
+    """Tekrarlanan metinleri (ders kodu, ad, gün, saat) tam sayı ID ile saklar"""
+
+    def __init__(self):
+        self.values = []
+        self.ids = {}
+
+    def intern(self, value):
+        index = self.ids.get(value)
+        if index is None:
+            index = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+    def __len__(self):
+        return len(self.values)
+
+
+CATALOG_COLUMNS = ('crn', 'capacity', 'enrolled', 'day', 'time_slot', 'course_code', 'course_name')
+
+
+class CatalogSegment:
+    """Tek programın şubeleri - her alan bir array('q') sütunu"""
+    __slots__ = CATALOG_COLUMNS + ('rows', 'updated_at')
+
+    def __init__(self, rows, strings):
+        self.rows = rows  # kaynak snapshot satırları (değişmediyse yeniden kurulmaz)
+        self.updated_at = time.time()
+        self.crn = array('q')
+        self.capacity = array('q')
+        self.enrolled = array('q')
+        self.day = array('q')
+        self.time_slot = array('q')
+        self.course_code = array('q')
+        self.course_name = array('q')
+        for row in rows:
+            if not row.crn.isdigit():
+                continue
+            self.crn.append(int(row.crn))
+            self.capacity.append(row.capacity)
+            self.enrolled.append(row.enrolled)
+            self.day.append(strings.intern(row.day))
+            self.time_slot.append(strings.intern(row.time_slot))
+            self.course_code.append(strings.intern(row.course_code))
+            self.course_name.append(strings.intern(row.course_name))
+
+
+class SeatIndex:
+    """Tüm üniversitenin şubeleri için sütunlu indeks
+
+    Program başına bir segment tutulur ve tarayıcı programları tek tek günceller. Sorgularda
+    segmentler tek sütunlarda birleştirilir (değişiklik olana kadar tekrar kullanılır). Böylece
+    "boş yeri olan şubeler" sorusu tek bir vektörel karşılaştırma olur: numpy varsa numpy,
+    yoksa array sütunları üzerinde tek geçiş.
+    """
+
+    def __init__(self):
+        self.segments = {}  # {program_code: CatalogSegment}
+        self.strings = StringTable()
+        self.merged = None  # (program kodları listesi, {kolon: sütun}) - segment değişince None
+        self.attempted_at = {}  # {program_code: son tarama denemesi (time.time)} - hatalı olanlar da beklenir
+        self.crawled = 0
+        self.unchanged = 0
+        self.failed = 0
+        self.crawling = False
+
+    def update_program(self, program_code, snapshot):
+        """Programın segmentini snapshot'tan yenile (satırlar aynı nesneyse yeniden kurulmaz)"""
+        self.crawled += 1
+        segment = self.segments.get(program_code)
+        if segment is not None and segment.rows is snapshot.rows:
+            segment.updated_at = time.time()
+            self.unchanged += 1
+            return
+        self.segments[program_code] = CatalogSegment(snapshot.rows, self.strings)
+        self.merged = None
+
+    def due_programs(self, program_codes, interval, limit):
+        """Hiç taranmamış ya da interval'den eski programlar (en eskiler önce)"""
+        now = time.time()
+        due = []
+        for program_code in program_codes:
+            attempted_at = self.attempted_at.get(program_code, 0.0)
+            if now - attempted_at >= interval:
+                due.append((attempted_at, program_code))
+        due.sort()
+        return [program_code for _, program_code in due[:limit]]
+
+    def columns(self):
+        """Segmentleri tek sütunlarda birleştir: (program kodları, {kolon: sütun, 'program': sütun})"""
+        if self.merged is None:
+            programs = sorted(self.segments)
+            merged = {name: array('q') for name in CATALOG_COLUMNS + ('program',)}
+            for program_index, program_code in enumerate(programs):
+                segment = self.segments[program_code]
+                for name in CATALOG_COLUMNS:
+                    merged[name].extend(getattr(segment, name))
+                merged['program'].extend(array('q', [program_index]) * len(segment.crn))
+            if CATALOG_NUMPY:
+                import numpy
+                merged = {name: numpy.frombuffer(column, dtype=numpy.int64) for name, column in merged.items()}
+            self.merged = (programs, merged)
+        return self.merged
+
+    def open_sections(self, program_code=None):
+        """Boş yeri olan şubelerin satır indeksleri (isteğe bağlı tek program)"""
+        programs, columns = self.columns()
+        program_index = None
+        if program_code is not None:
+            if program_code not in self.segments:
+                return []
+            program_index = programs.index(program_code)
+
+        capacity, enrolled, program = columns['capacity'], columns['enrolled'], columns['program']
+        if CATALOG_NUMPY:
+            import numpy
+            mask = capacity > enrolled
+            if program_index is not None:
+                mask &= program == program_index
+            return numpy.flatnonzero(mask).tolist()
+        if program_index is None:
+            return [i for i, (c, e) in enumerate(zip(capacity, enrolled)) if c > e]
+        return [i for i, (c, e, p) in enumerate(zip(capacity, enrolled, program)) if c > e and p == program_index]
+
+    def section(self, index):
+        """Satır indeksinden okunabilir şube bilgisi"""
+        programs, columns = self.columns()
+        values = self.strings.values
+        capacity, enrolled = int(columns['capacity'][index]), int(columns['enrolled'][index])
+        return {
+            "program_code": programs[int(columns['program'][index])],
+            "crn": str(int(columns['crn'][index])),
+            "course_code": values[int(columns['course_code'][index])],
+            "course_name": values[int(columns['course_name'][index])],
+            "day": values[int(columns['day'][index])],
+            "time_slot": values[int(columns['time_slot'][index])],
+            "capacity": capacity,
+            "enrolled": enrolled,
+            "free_seats": capacity - enrolled,
+        }
+
+    def section_count(self):
+        return sum(len(segment.crn) for segment in list(self.segments.values()))
+
+    def stats(self):
+        return {
+            "enabled": CATALOG_MODE,
+            "backend": "numpy" if CATALOG_NUMPY else "array",
+            "programs": len(self.segments),
+            "sections": self.section_count(),
+            "strings": len(self.strings),
+            "crawled": self.crawled,
+            "unchanged": self.unchanged,
+            "failed": self.failed,
+        }
+
+
+CATALOG = SeatIndex()
+
+
+async def crawl_catalog(context: ContextTypes.DEFAULT_TYPE = None):
+    """Vadesi gelen programları sınırlı eşzamanlılıkla tara ve indekste güncelle
+
+    Her turda en fazla CATALOG_BATCH program taranır; istekler arka plan önceliğiyle
+    OBS hız limitinden geçer, kullanıcı sorgularını bekletmez.
+    """
+    if CATALOG.crawling:
+        return
+    due = CATALOG.due_programs(list(PROGRAM_KODLARI), CATALOG_REFRESH_INTERVAL, CATALOG_BATCH)
+    if not due:
+        return
+
+    CATALOG.crawling = True
+    semaphore = asyncio.Semaphore(CATALOG_CONCURRENCY)
+
+    async def crawl(program_code):
+        CATALOG.attempted_at[program_code] = time.time()
+        async with semaphore:
+            snapshot, error_message = await fetch_program_snapshot(program_code, is_background=True)
+        if snapshot is None or snapshot.partial:
+            CATALOG.failed += 1
+            return
+        CATALOG.update_program(program_code, snapshot)
+
+    try:
+        start = time.monotonic()
+        await asyncio.gather(*(crawl(program_code) for program_code in due))
+        logger.info("🗂️ [KATALOG] %s program tarandı (%.1f sn), toplam %s/%s program",
+                    len(due), time.monotonic() - start, len(CATALOG.segments), len(PROGRAM_KODLARI))
+    finally:
+        CATALOG.crawling = False
+
+
+# === Takip Kaydı (iki yönlü indeks) ===
+class WatchRegistry:
+    """Takiplerin iki yönlü indeksi: sohbet → takipler ve program → CRN → sohbetler
+
+    Program kodları bir kez saklanıp küçük ID'lerle temsil edilir; bir takip tek bir int anahtardır
+    (program_id * CRN_LIMIT + crn) ve iki indeks aynı anahtar nesnesini paylaşır. CRN'i tek sohbetin
+    takip ettiği (en yaygın) durumda set yerine doğrudan chat_id tutulur. Ekleme, silme ve üyelik
+    kontrolü iki yönde de O(1); dışarıya CRN'ler yine 5 haneli metin olarak (baştaki sıfırlarla) verilir.
+    """
+    CRN_LIMIT = 10 ** 5  # CRN'ler tam 5 hane
+
+    def __init__(self):
+        self.program_codes = []  # program_id → program_code
+        self.program_ids = {}  # program_code → program_id (silinmez; program sayısı küçük)
+        self.by_chat = {}  # {chat_id: {key: None}} - ekleme sırası korunur
+        self.by_program = {}  # {program_id: {key: chat_id | {chat_id, ...}}}
+        self.program_counts = {}  # {program_id: takip sayısı}
+        self.count = 0
+
+    def key(self, program_code, crn):
+        """Takip anahtarı; program hiç görülmediyse ya da CRN 5 haneli değilse None"""
+        program_id = self.program_ids.get(program_code)
+        if program_id is None or len(crn) != 5 or not crn.isascii() or not crn.isdigit():
+            return None
+        return program_id * self.CRN_LIMIT + int(crn)
+
+    def split(self, key):
+        """Anahtardan (program_code, crn metni)"""
+        program_id, crn = divmod(key, self.CRN_LIMIT)
+        return self.program_codes[program_id], f"{crn:05d}"
+
+    def add(self, chat_id, program_code, crn):
+        """Takibi ekle; zaten varsa False. CRN 5 haneli değilse ValueError"""
+        if len(crn) != 5 or not crn.isascii() or not crn.isdigit():
+            raise ValueError(f"geçersiz CRN: {crn!r}")
+        program_id = self.program_ids.get(program_code)
+        if program_id is None:
+            program_id = self.program_ids[sys.intern(program_code)] = len(self.program_codes)
+            self.program_codes.append(program_code)
+        key = program_id * self.CRN_LIMIT + int(crn)
+        courses = self.by_chat.get(chat_id)
+        if courses is None:
+            courses = self.by_chat[chat_id] = {}
+        elif key in courses:
+            return False
+        courses[key] = None
+
+        crns = self.by_program.get(program_id)
+        if crns is None:
+            crns = self.by_program[program_id] = {}
+        watchers = crns.get(key)
+        if watchers is None:
+            crns[key] = chat_id
+        elif isinstance(watchers, set):
+            watchers.add(chat_id)
+        else:
+            crns[key] = {watchers, chat_id}
+        self.program_counts[program_id] = self.program_counts.get(program_id, 0) + 1
+        self.count += 1
+        return True
+
+    def remove(self, chat_id, program_code, crn):
+        """Takibi kaldır; yoksa False"""
+        key = self.key(program_code, crn)
+        courses = self.by_chat.get(chat_id)
+        if key is None or courses is None or key not in courses:
+            return False
+        del courses[key]
+        if not courses:
+            del self.by_chat[chat_id]
+        self.unlink(chat_id, key)
+        return True
+
+    def unlink(self, chat_id, key):
+        # Program tarafındaki kaydı sil; boşalan CRN/program girdileri de atılır
+        program_id = key // self.CRN_LIMIT
+        crns = self.by_program[program_id]
+        watchers = crns[key]
+        if isinstance(watchers, set):
+            watchers.discard(chat_id)
+            if len(watchers) == 1:
+                crns[key] = next(iter(watchers))
+        else:
+            del crns[key]
+            if not crns:
+                del self.by_program[program_id]
+        remaining = self.program_counts[program_id] - 1
+        if remaining:
+            self.program_counts[program_id] = remaining
+        else:
+            del self.program_counts[program_id]
+        self.count -= 1
+
+    def remove_chat(self, chat_id):
+        """Sohbetin tüm takiplerini kaldır: [(program_code, crn), ...]"""
+        courses = self.by_chat.pop(chat_id, None)
+        if not courses:
+            return []
+        for key in courses:
+            self.unlink(chat_id, key)
+        return [self.split(key) for key in courses]
+
+    def contains(self, chat_id, program_code, crn):
+        # Sık çağrılır (her bildirimde): key() burada satır içi
+        courses = self.by_chat.get(chat_id)
+        if courses is None:
+            return False
+        program_id = self.program_ids.get(program_code)
+        if program_id is None or len(crn) != 5 or not crn.isascii() or not crn.isdigit():
+            return False
+        return program_id * self.CRN_LIMIT + int(crn) in courses
+
+    def watches(self, chat_id):
+        """Sohbetin takipleri (ekleme sırasıyla): [(program_code, crn), ...]"""
+        return [self.split(key) for key in self.by_chat.get(chat_id, ())]
+
+    def watchers(self, program_code):
+        """Programı takip eden sohbetler: {crn: [chat_id, ...]}"""
+        program_id = self.program_ids.get(program_code)
+        crns = self.by_program.get(program_id, {})
+        return {f"{key % self.CRN_LIMIT:05d}": list(watchers) if isinstance(watchers, set) else [watchers]
+                for key, watchers in crns.items()}
+
+    def watch_count(self, program_code):
+        return self.program_counts.get(self.program_ids.get(program_code), 0)
+
+    def programs(self):
+        return [self.program_codes[program_id] for program_id in self.by_program]
+
+    def chat_count(self):
+        return len(self.by_chat)
+
+    def replace(self, watched):
+        """Tüm takipleri {chat_id: [(program_code, crn), ...]} ile değiştir (depodan yükleme)"""
+        self.by_chat = {}
+        self.by_program = {}
+        self.program_counts = {}
+        self.count = 0
+        for chat_id, courses in watched.items():
+            for program_code, crn in courses:
+                try:
+                    self.add(chat_id, program_code, crn)
+                except ValueError:
+                    # Eski sürümlerin kaydettiği 5 haneli olmayan CRN'ler yüklenmez
+                    logger.warning("⚠️ Geçersiz takip atlandı: %s_%s (Chat: %s)", program_code, crn, chat_id)
+
+    def __len__(self):
+        return self.count
+
+
+WATCHES = WatchRegistry()
+
+
+class ChatActivity:
+    """Sohbet başına son istek zamanı (hız sınırı); ttl boyunca istek gelmeyen sohbetler silinir
+
+    Girdiler son isteğe göre sıralı tutulur, bu yüzden her touch() sadece süresi dolanları atar.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.last_seen = OrderedDict()  # {chat_id: time.time()} - en eski önce
+
+    def get(self, chat_id):
+        return self.last_seen.get(chat_id)
+
+    def touch(self, chat_id):
+        now = time.time()
+        self.last_seen[chat_id] = now
+        self.last_seen.move_to_end(chat_id)
+        while self.last_seen:
+            oldest_chat, seen_at = next(iter(self.last_seen.items()))
+            if now - seen_at < self.ttl:
+                break
+            del self.last_seen[oldest_chat]
+
+    def __len__(self):
+        return len(self.last_seen)
+
+
+LAST_REQUEST_TIME = ChatActivity(CHAT_IDLE_TTL)
+
+
+# === Kalıcı Takip Deposu (SQLite) ===
+# SQLite çağrıları (flush, lease sync, BEGIN IMMEDIATE'in kilit beklemesi) event loop'u bloklamasın diye
+# tek bir thread'de sırayla çalışır; bağlantılar da bu thread'de açılır ve hep aynı thread'den kullanılır
+DB_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite')
+
+
+async def run_db(func, *args):
+    """SQLite işini DB thread'inde çalıştır, event loop beklerken diğer işlere devam eder"""
+    return await asyncio.get_running_loop().run_in_executor(DB_EXECUTOR, func, *args)
+
+
+class WatchStore:
+    """Takipleri ve son görülen kontenjan/yazılan sayılarını SQLite'ta (WAL) saklar
+
+    Yazmalar bellekte biriktirilir ve flush() ile tek transaction'da yazılır;
+    handler'lar diske her takip için ayrı ayrı gitmez.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = None
+        self.pending = []  # [(sql, params), ...] - sıra korunur
+        self.pending_seats = {}  # {(program_code, crn): (capacity, enrolled)} - sadece son değer yazılır
+        self.last_seats = {}  # {(program_code, crn): (capacity, enrolled)}
+        self.change_seq = 0  # watch_changes'ta okunan son kayıt
+        self.pruned_at = 0.0
+
+    def open(self):
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS watches ("
+            " chat_id INTEGER NOT NULL,"
+            " program_code TEXT NOT NULL,"
+            " crn TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (chat_id, program_code, crn)"
+            ") WITHOUT ROWID"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS seats ("
+            " program_code TEXT NOT NULL,"
+            " crn TEXT NOT NULL,"
+            " capacity INTEGER NOT NULL,"
+            " enrolled INTEGER NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (program_code, crn)"
+            ") WITHOUT ROWID"
+        )
+        # Süreçler arası paylaşım: her ekleme/silme trigger ile değişiklik kaydına düşer,
+        # diğer süreçler tüm takipleri yeniden okumak yerine sadece yeni kayıtları uygular
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS watch_changes ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " added INTEGER NOT NULL,"
+            " chat_id INTEGER NOT NULL,"
+            " program_code TEXT NOT NULL,"
+            " crn TEXT NOT NULL,"
+            " changed_at REAL NOT NULL"
+            ")"
         )
-        # Kontenjan açıldıysa, takibi durdur
-        if "KONTENJAN AÇILDI" in result:
-            print(f"🛑 {program_code}_{crn} için takip durduruldu (kontenjan açıldı)")
-            WATCHED_COURSES[chat_id].remove((program_code, crn))
-            if not WATCHED_COURSES[chat_id]:
-                del WATCHED_COURSES[chat_id]
-            job.schedule_removal()   # ✅ Job’u güvenli şekilde iptal et
+        self.conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS watches_added AFTER INSERT ON watches BEGIN"
+            " INSERT INTO watch_changes (added, chat_id, program_code, crn, changed_at)"
+            " VALUES (1, NEW.chat_id, NEW.program_code, NEW.crn, NEW.created_at); END"
+        )
+        self.conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS watches_removed AFTER DELETE ON watches BEGIN"
+            " INSERT INTO watch_changes (added, chat_id, program_code, crn, changed_at)"
+            " VALUES (0, OLD.chat_id, OLD.program_code, OLD.crn, (julianday('now') - 2440587.5) * 86400.0); END"
+        )
+        self.conn.commit()
+
+    def load_all(self):
+        """Tüm takipleri tek sorguda yükle: {chat_id: [(program_code, crn), ...]}"""
+        # Sıra önemli: filigran takiplerden önce okunur; arada gelen değişiklikler sonra
+        # tekrar uygulanır (ekleme/silme tekrarı zararsız), hiçbiri kaçmaz
+        self.change_seq = self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM watch_changes").fetchone()[0]
+        watched = {}
+        for chat_id, program_code, crn in self.conn.execute(
+                "SELECT chat_id, program_code, crn FROM watches ORDER BY created_at"):
+            watched.setdefault(chat_id, []).append((program_code, crn))
+        self.last_seats = {
+            (program_code, crn): (capacity, enrolled)
+            for program_code, crn, capacity, enrolled in self.conn.execute(
+                "SELECT program_code, crn, capacity, enrolled FROM seats")
+        }
+        return watched
+
+    def load_changes(self):
+        """Son okumadan beri tüm süreçlerin takip değişiklikleri: [(added, chat_id, program_code, crn), ...]
+
+        Aradaki kayıtlar silinmişse (uzun süre senkronize olunmadıysa) None - çağıran load_all() kullanır.
+        """
+        rows = self.conn.execute(
+            "SELECT seq, added, chat_id, program_code, crn FROM watch_changes WHERE seq > ? ORDER BY seq",
+            (self.change_seq,)).fetchall()
+        if not rows:
+            return []
+        if rows[0][0] != self.change_seq + 1:
+            return None
+        self.change_seq = rows[-1][0]
+        return [(bool(added), chat_id, program_code, crn) for _, added, chat_id, program_code, crn in rows]
+
+    def add(self, chat_id, program_code, crn):
+        self.pending.append((
+            "INSERT OR IGNORE INTO watches (chat_id, program_code, crn, created_at) VALUES (?, ?, ?, ?)",
+            (chat_id, program_code, crn, time.time())
+        ))
+
+    def remove(self, chat_id, program_code, crn):
+        self.pending.append((
+            "DELETE FROM watches WHERE chat_id = ? AND program_code = ? AND crn = ?",
+            (chat_id, program_code, crn)
+        ))
+
+    def remove_chat(self, chat_id):
+        self.pending.append(("DELETE FROM watches WHERE chat_id = ?", (chat_id,)))
+
+    def record_seats(self, program_code, crn, capacity, enrolled):
+        """Son görülen kontenjanı kaydet (değişmediyse yazma kuyruğa eklenmez)"""
+        key = (program_code, crn)
+        if self.last_seats.get(key) != (capacity, enrolled):
+            self.last_seats[key] = (capacity, enrolled)
+            self.pending_seats[key] = (capacity, enrolled)
+
+    def flush(self):
+        """Bekleyen tüm yazmaları tek transaction'da diske yaz"""
+        if self.conn is not None and time.monotonic() - self.pruned_at > WATCH_CHANGES_PRUNE_INTERVAL:
+            self.pruned_at = time.monotonic()
+            with self.conn:
+                self.conn.execute("DELETE FROM watch_changes WHERE changed_at < ?", (time.time() - WATCH_CHANGES_TTL,))
+        if self.conn is None or (not self.pending and not self.pending_seats):
+            return 0
+
+        pending, self.pending = self.pending, []
+        seats, self.pending_seats = self.pending_seats, {}
+        now = time.time()
+        with self.conn:
+            # Aynı SQL'e sahip ardışık yazmalar tek executemany ile gider
+            index = 0
+            while index < len(pending):
+                sql = pending[index][0]
+                end = index
+                while end < len(pending) and pending[end][0] == sql:
+                    end += 1
+                self.conn.executemany(sql, [params for _, params in pending[index:end]])
+                index = end
+            if seats:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO seats (program_code, crn, capacity, enrolled, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(program_code, crn, capacity, enrolled, now)
+                     for (program_code, crn), (capacity, enrolled) in seats.items()]
+                )
+        return len(pending) + len(seats)
+
+    def close(self):
+        if self.conn is not None:
+            self.flush()
+            self.conn.close()
+            self.conn = None
+
+
+WATCH_STORE = WatchStore(WATCH_DB_PATH)
+
+
+async def flush_watch_store(context: ContextTypes.DEFAULT_TYPE):
+    """Bekleyen takip yazmalarını diske aktar"""
+    try:
+        await run_db(WATCH_STORE.flush)
+    except sqlite3.Error as e:
+        logger.error("❌ Takip deposu yazılamadı: %s", e)
+
+
+def read_shared_watch_changes():
+    """Kendi yazmalarını diske aktar, yeni değişiklikleri oku (DB thread'inde çalışır)
+
+    Dönüş: (changes, watched) - değişiklik kaydı budanmışsa changes None, watched tüm takipler
+    """
+    WATCH_STORE.flush()
+    changes = WATCH_STORE.load_changes()
+    return changes, (WATCH_STORE.load_all() if changes is None else None)
 
 
-def search_course(program_code, crn, is_background=False):
-    """Belirtilen program kodunda CRN ile dersi ara - KONTENJAN TAKİP"""
-    print(f"\n🔍 {program_code} programında CRN {crn} aranıyor... {'[ARKA PLAN]' if is_background else ''}")
+async def sync_shared_watches(context: ContextTypes.DEFAULT_TYPE):
+    """Diğer süreçlerin takip değişikliklerini al (frontend/worker rolleri)
 
+    Önce kendi bekleyen yazmalarımız diske gider, sonra watch_changes'taki yeni kayıtlar sırayla
+    uygulanır; böylece frontend'in eklediği takipler worker'a, worker'ın kapattıkları frontend'e
+    ulaşır. Maliyet takip sayısıyla değil değişiklik sayısıyla orantılıdır.
+    Disk işleri DB thread'inde yapılır; WATCHES sadece event loop'ta güncellenir.
+    """
+    try:
+        changes, watched = await run_db(read_shared_watch_changes)
+        if changes is None:
+            # Değişiklik kaydı budanmış: tek seferlik tam yükleme
+            WATCHES.replace(watched)
+            return
+    except sqlite3.Error as e:
+        logger.error("❌ Paylaşılan takipler okunamadı: %s", e)
+        return
+    for added, chat_id, program_code, crn in changes:
+        if added:
+            WATCHES.add(chat_id, program_code, crn)
+        else:
+            WATCHES.remove(chat_id, program_code, crn)
+
+
+# === Program Lease'leri (Worker'lar Arası Paylaşım) ===
+class ProgramLeases:
+    """Takip edilen programları canlı worker'lar arasında SQLite lease'leriyle paylaştırır
+
+    Her worker sync() ile kalp atışını yazar, lease'lerini yeniler ve canlı worker sayısına
+    göre adil payına kadar sahipsiz ya da süresi dolmuş programları alır; payından fazlasını
+    bırakır. Tüm karar tek bir BEGIN IMMEDIATE transaction'ında verilir, bu yüzden bir program
+    aynı anda tek bir worker'a ait olur.
+    """
+
+    def __init__(self, path, owner, ttl):
+        self.path = path
+        self.owner = owner
+        self.ttl = ttl
+        self.conn = None
+        self.owned = frozenset()
+        self.live_workers = 0
+        self.acquired = 0
+        self.released = 0
+
+    def open(self):
+        # isolation_level=None: transaction'lar elle (BEGIN IMMEDIATE) açılır
+        self.conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS program_leases ("
+            " program_code TEXT PRIMARY KEY,"
+            " owner TEXT NOT NULL,"
+            " expires_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS workers ("
+            " owner TEXT PRIMARY KEY,"
+            " heartbeat_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+
+    def sync(self):
+        """Lease'leri yenile/dengele; dönüş: bu worker'ın sahip olduğu programlar"""
+        now = time.time()
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO workers (owner, heartbeat_at) VALUES (?, ?) "
+                "ON CONFLICT(owner) DO UPDATE SET heartbeat_at = excluded.heartbeat_at",
+                (self.owner, now)
+            )
+            conn.execute("DELETE FROM workers WHERE heartbeat_at < ?", (now - self.ttl,))
+            live_workers = conn.execute("SELECT COUNT(*) FROM workers").fetchone()[0]
+            wanted = {code for code, in conn.execute("SELECT DISTINCT program_code FROM watches")}
+            leases = {code: (owner, expires_at) for code, owner, expires_at in conn.execute(
+                "SELECT program_code, owner, expires_at FROM program_leases")}
+
+            mine = {code for code, (owner, _) in leases.items() if owner == self.owner and code in wanted}
+            release = {code for code, (owner, _) in leases.items() if owner == self.owner and code not in wanted}
+            fair_share = -(-len(wanted) // live_workers)  # yukarı yuvarlanmış pay
+            if len(mine) > fair_share:
+                # Yeni katılan worker'a yer aç: fazlalık bırakılır, diğerleri sonraki turda alır
+                extra = set(sorted(mine)[fair_share:])
+                release |= extra
+                mine -= extra
+
+            free = sorted(code for code in wanted
+                          if code not in mine and code not in release
+                          and (code not in leases or leases[code][1] < now))
+            acquired = free[:max(0, fair_share - len(mine))]
+            mine.update(acquired)
+
+            conn.executemany("DELETE FROM program_leases WHERE program_code = ? AND owner = ?",
+                             [(code, self.owner) for code in release])
+            conn.executemany(
+                "INSERT INTO program_leases (program_code, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(program_code) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at",
+                [(code, self.owner, now + self.ttl) for code in mine]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        self.live_workers = live_workers
+        self.acquired += len(acquired)
+        self.released += len(release)
+        self.owned = frozenset(mine)
+        return self.owned
+
+    def close(self):
+        """Lease'leri hemen bırak; diğer worker'lar TTL'i beklemeden devralır"""
+        if self.conn is None:
+            return
+        with contextlib.suppress(sqlite3.Error):
+            self.conn.execute("DELETE FROM program_leases WHERE owner = ?", (self.owner,))
+            self.conn.execute("DELETE FROM workers WHERE owner = ?", (self.owner,))
+        self.conn.close()
+        self.conn = None
+        self.owned = frozenset()
+
+    def stats(self):
+        return {
+            "worker_id": self.owner,
+            "owned_programs": len(self.owned),
+            "live_workers": self.live_workers,
+            "acquired": self.acquired,
+            "released": self.released,
+            "ttl": self.ttl,
+        }
+
+
+PROGRAM_LEASES = ProgramLeases(WATCH_DB_PATH, WORKER_ID, LEASE_TTL)
+
+
+def owns_program(program_code):
+    """Bu süreç programı kontrol etmeli mi? (tek süreç modunda her program bizimdir)"""
+    # Lease deposu sadece worker rolünde açılır (run_application)
+    return PROGRAM_LEASES.conn is None or program_code in PROGRAM_LEASES.owned
+
+
+async def sync_program_leases(context: ContextTypes.DEFAULT_TYPE):
+    """Worker lease'lerini yenile; sahip olunan programlar değiştiyse logla"""
+    before = PROGRAM_LEASES.owned
+    try:
+        owned = await run_db(PROGRAM_LEASES.sync)
+    except sqlite3.Error as e:
+        # Lease yenilenemezse TTL dolunca programlar başka worker'a geçer
+        logger.error("❌ Program lease'leri yenilenemedi: %s", e)
+        return
+    if owned != before:
+        logger.info("🧩 [LEASE] %s program bu worker'da (+%s / -%s, %s canlı worker)",
+                    len(owned), len(owned - before), len(before - owned), PROGRAM_LEASES.live_workers)
+
+
+# === Giden Bildirim Kuyruğu ===
+class NotificationQueue:
+    """Telegram'a giden bildirimleri hız limitlerine uyarak eşzamanlı gönderir
+
+    - Global hız TELEGRAM_GLOBAL_RATE, sohbet başına en fazla 1 mesaj/sn
+    - Aynı sohbete biriken bildirimler tek mesajda birleştirilir
+    - RetryAfter gelirse gönderim o süre kadar durur ve mesaj tekrar denenir
+    """
+
+    SEPARATOR = f"\n\n{'═' * 20}\n\n"
+
+    def __init__(self, global_rate, chat_interval, workers):
+        self.bucket = PriorityTokenBucket(global_rate, max(1, int(global_rate)))
+        self.chat_interval = chat_interval
+        self.worker_count = workers
+        self.bot = None
+        self.ready = None  # asyncio.Queue[chat_id]
+        self.workers = []
+        self.pending = {}  # {chat_id: deque[(text, enqueued_at, attempts, observed_at)]}
+        self.scheduled = set()  # kuyrukta ya da zamanlanmış sohbetler
+        self.last_sent = {}  # {chat_id: son gönderim zamanı}
+        self.paused_until = 0.0  # RetryAfter sonrası tüm gönderimler bekler
+        self.delivered = 0
+        self.messages_sent = 0
+        self.merged = 0
+        self.retries = 0
+        self.failed = 0
+        self.latencies = deque(maxlen=1000)  # kuyruğa giriş → teslim (sn)
+
+    def start(self, bot):
+        self.bot = bot
+        self.ready = asyncio.Queue()
+        self.workers = [asyncio.ensure_future(self._worker()) for _ in range(self.worker_count)]
+        # Kapanmadan önce kuyruğa girmiş sohbetler
+        for chat_id in self.scheduled:
+            self.ready.put_nowait(chat_id)
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def enqueue(self, chat_id, text, observed_at=None):
+        """Bildirimi kuyruğa ekle (beklemeden döner)
+
+        observed_at: bildirimi doğuran OBS değişikliğinin görüldüğü an (uçtan uca gecikme için)
+        """
+        self.pending.setdefault(chat_id, deque()).append((text, time.monotonic(), 0, observed_at))
+        if chat_id not in self.scheduled:
+            self.scheduled.add(chat_id)
+            if self.ready is not None:
+                self.ready.put_nowait(chat_id)
+
+    def _schedule(self, chat_id, delay):
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self.ready.put_nowait, chat_id)
+        else:
+            self.ready.put_nowait(chat_id)
+
+    async def _worker(self):
+        while True:
+            chat_id = await self.ready.get()
+            try:
+                await self._deliver(chat_id)
+            except Exception as e:
+                logger.exception("💥 Bildirim kuyruğu hatası (Chat: %s): %s", chat_id, e, extra={'chat_id': chat_id})
+                self.pending.pop(chat_id, None)
+                self.scheduled.discard(chat_id)
+
+    async def _deliver(self, chat_id):
+        now = time.monotonic()
+        # Sohbet başına limit: erken geldiyse worker'ı bekletmeden sonraya zamanla
+        wait = max(self.last_sent.get(chat_id, 0.0) + self.chat_interval, self.paused_until) - now
+        if wait > 0:
+            self._schedule(chat_id, wait)
+            return
+
+        items = self.pending.get(chat_id)
+        if not items:
+            self.pending.pop(chat_id, None)
+            self.scheduled.discard(chat_id)
+            return
+
+        # Biriken bildirimleri Telegram mesaj sınırına sığacak kadar birleştir
+        batch = [items.popleft()]
+        length = len(batch[0][0])
+        while items and length + len(self.SEPARATOR) + len(items[0][0]) <= TELEGRAM_MAX_MESSAGE_LENGTH:
+            batch.append(items.popleft())
+            length += len(self.SEPARATOR) + len(batch[-1][0])
+        text = self.SEPARATOR.join(item[0] for item in batch)
+
+        await self.bucket.acquire()
+        try:
+            with TELEGRAM_SEND_SECONDS.time(), trace_span('notify.send', root=True, chat_id=chat_id, batch=len(batch)):
+                await self.bot.send_message(chat_id=chat_id, text=text, parse_mode='Markdown')
+        except RetryAfter as e:
+            TELEGRAM_ERRORS_TOTAL.inc('retry_after')
+            retry_after = getattr(e.retry_after, 'total_seconds', lambda: e.retry_after)()
+            logger.warning("⏳ Telegram flood limiti: %s sn bekleniyor (Chat: %s)", retry_after, chat_id,
+                           extra={'chat_id': chat_id})
+            self.paused_until = time.monotonic() + float(retry_after)
+            self.retries += 1
+            items.extendleft(reversed(batch))
+        except (TimedOut, NetworkError) as e:
+            # Ağ hatası: TELEGRAM_SEND_ATTEMPTS'e kadar tekrar dene
+            TELEGRAM_ERRORS_TOTAL.inc('network')
+            self.retries += 1
+            retry = [(t, enqueued_at, attempts + 1, observed_at) for t, enqueued_at, attempts, observed_at in batch
+                     if attempts + 1 < TELEGRAM_SEND_ATTEMPTS]
+            self.failed += len(batch) - len(retry)
+            items.extendleft(reversed(retry))
+            logger.warning("⚠️  Bildirim gönderilemedi, tekrar denenecek (Chat: %s): %s", chat_id, e,
+                           extra={'chat_id': chat_id})
+        except TelegramError as e:
+            # Bot engellendi, sohbet yok vb. - tekrar denemenin anlamı yok
+            TELEGRAM_ERRORS_TOTAL.inc('rejected')
+            self.failed += len(batch)
+            logger.error("❌ Bildirim gönderilemedi (Chat: %s): %s", chat_id, e, extra={'chat_id': chat_id})
+        else:
+            delivered_at = time.monotonic()
+            self.messages_sent += 1
+            self.delivered += len(batch)
+            self.merged += len(batch) - 1
+            for _, enqueued_at, _, observed_at in batch:
+                self.latencies.append(delivered_at - enqueued_at)
+                if observed_at is not None:
+                    CHANGE_TO_NOTIFY_SECONDS.observe(delivered_at - observed_at)
+        finally:
+            self.last_sent[chat_id] = time.monotonic()
+
+        if items:
+            self._schedule(chat_id, max(self.chat_interval, self.paused_until - time.monotonic()))
+        else:
+            self.pending.pop(chat_id, None)
+            self.scheduled.discard(chat_id)
+            # Sohbet başına zaman kaydı sınırsız büyümesin
+            if len(self.last_sent) > 10000:
+                cutoff = time.monotonic() - self.chat_interval
+                self.last_sent = {c: t for c, t in self.last_sent.items() if t > cutoff}
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(q):
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * q))], 3) if latencies else 0.0
+
+        return {
+            "queued_chats": len(self.scheduled),
+            "queued_notifications": sum(len(items) for items in list(self.pending.values())),
+            "delivered": self.delivered,
+            "messages_sent": self.messages_sent,
+            "merged": self.merged,
+            "retries": self.retries,
+            "failed": self.failed,
+            "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 1),
+            "latency_p50": percentile(0.5),
+            "latency_p99": percentile(0.99),
+            "latency_max": round(latencies[-1], 3) if latencies else 0.0,
+        }
+
+
+NOTIFIER = NotificationQueue(TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_INTERVAL, TELEGRAM_SEND_WORKERS)
+
+
+class ProgramSchedule:
+    """Bir programın uyarlamalı kontrol aralığı ve son değişim istatistikleri"""
+    __slots__ = ('interval', 'next_due', 'change_rate', 'errors', 'checks', 'changes',
+                 'known_crns', 'watch_count', 'in_flight', 'last_checked_at')
+
+    def __init__(self):
+        self.interval = POLL_INTERVAL
+        self.next_due = 0.0  # yeni program hemen kontrol edilir
+        self.change_rate = 0.0  # kontrollerin ne kadarında kontenjan değişti (EWMA)
+        self.errors = 0  # ardışık OBS hatası
+        self.checks = 0
+        self.changes = 0
+        self.known_crns = set()  # en az bir kez kontrol edilmiş CRN'ler (yeniler doğrudan kontrol edilir)
+        self.watch_count = 0
+        self.in_flight = False
+        self.last_checked_at = None
+
+    def record_success(self, changed):
+        """Başarılı kontrol: değişim varsa aralığı kısalt, yoksa uzat"""
+        self.checks += 1
+        self.errors = 0
+        self.last_checked_at = time.time()
+        self.change_rate = CHURN_EWMA_ALPHA * changed + (1 - CHURN_EWMA_ALPHA) * self.change_rate
+        if changed:
+            self.changes += 1
+            self.interval = max(POLL_MIN_INTERVAL, self.interval * POLL_SPEEDUP_FACTOR)
+        else:
+            self.interval = min(POLL_MAX_INTERVAL, self.interval * POLL_SLOWDOWN_FACTOR)
+        self.next_due = time.monotonic() + self.interval
+
+    def record_error(self):
+        """OBS hatası: jitter'lı üstel geri çekilme (aralık değişmez)"""
+        self.checks += 1
+        self.errors += 1
+        self.last_checked_at = time.time()
+        backoff = min(POLL_ERROR_BACKOFF_MAX, self.interval * 2 ** self.errors)
+        self.next_due = time.monotonic() + random.uniform(self.interval, max(self.interval, backoff))
+
+    def to_dict(self):
+        return {
+            "interval": round(self.interval, 1),
+            "next_check_in": round(max(0.0, self.next_due - time.monotonic()), 1),
+            "change_rate": round(self.change_rate, 3),
+            "checks": self.checks,
+            "changes": self.changes,
+            "errors": self.errors,
+            "watches": self.watch_count,
+            "last_checked_at": self.last_checked_at,
+        }
+
+
+PROGRAM_SCHEDULES = {}  # {program_code: ProgramSchedule}
+POLL_TASKS = set()  # süren poll_program görevleri (kapanışta iptal edilir)
+
+
+def stop_watching(chat_id, program_code, crn):
+    """Takibi bellekten ve kalıcı depodan kaldır"""
+    if WATCHES.remove(chat_id, program_code, crn):
+        WATCH_STORE.remove(chat_id, program_code, crn)
+
+
+def deliver_check_result(result, chat_ids, observed_at=None):
+    """Sonucu hâlâ takip eden sohbetlere kuyrukla gönder; kontenjan açıldıysa takibi bitir"""
+    text = render_check_result(result, is_background=True)
+    if text is None:
+        return
+    for chat_id in chat_ids:
+        if not WATCHES.contains(chat_id, result.program_code, result.crn):
+            continue
+        NOTIFIER.enqueue(chat_id, text, observed_at)
+        if result.status == CHECK_OPEN:
+            logger.info("🛑 %s_%s için takip durduruldu (kontenjan açıldı) (Chat: %s)",
+                        result.program_code, result.crn, chat_id,
+                        extra={'program': result.program_code, 'crn': result.crn, 'chat_id': chat_id,
+                               'outcome': 'stopped'})
+            stop_watching(chat_id, result.program_code, result.crn)
+
+
+@SEAT_EVENTS.subscribe
+def notify_seat_events(program_code, events):
+    """Kontenjan olaylarını takip eden kullanıcılara bildir"""
+    watchers = WATCHES.watchers(program_code)
+    if not watchers:
+        return
+
+    opened = {event.crn for event in events if event.kind == EVENT_SEATS_OPENED}
+    for event in events:
+        chat_ids = watchers.get(event.crn)
+        if not chat_ids:
+            continue
+
+        if event.kind == EVENT_SEATS_OPENED:
+            deliver_check_result(CheckResult(CHECK_OPEN, program_code, event.crn, row=event.new), chat_ids,
+                                 event.observed_at)
+        elif event.kind == EVENT_SECTION_REMOVED or (event.kind == EVENT_CAPACITY_RAISED and event.crn not in opened):
+            # Kontenjan arttı ama hâlâ dolu (takip sürer) ya da şube kaldırıldı: kullanıcı bilgilendirilir.
+            # watchers bu turun başında alındı; arada takibi biten sohbetler atlanır
+            text = render_seat_event(event)
+            for chat_id in chat_ids:
+                if WATCHES.contains(chat_id, program_code, event.crn):
+                    NOTIFIER.enqueue(chat_id, text, event.observed_at)
+
+
+async def poll_watched_programs(context: ContextTypes.DEFAULT_TYPE):
+    """Vadesi gelen programları tek sorguyla kontrol et (her programın kendi aralığı var)"""
+    # Sadece bu sürecin sorumlu olduğu programlar; CRN → sohbet eşlemesi vadesi gelenler için kurulur
+    programs = [program_code for program_code in WATCHES.programs() if owns_program(program_code)]
+    owned = set(programs)
+
+    # Artık takip edilmeyen (ya da başka worker'a geçen) programların zamanlamasını unut
+    for program_code in list(PROGRAM_SCHEDULES):
+        if program_code not in owned:
+            del PROGRAM_SCHEDULES[program_code]
+            SEAT_EVENTS.forget(program_code)
+
+    JOB_QUEUE_JOBS.set(len(context.job_queue.jobs()))
+
+    now = time.monotonic()
+    due = []
+    for program_code in programs:
+        schedule = PROGRAM_SCHEDULES.get(program_code)
+        if schedule is None:
+            schedule = PROGRAM_SCHEDULES[program_code] = ProgramSchedule()
+
+        # Yeni takip eklendiyse yavaşlamış program varsayılan aralığa çekilir
+        watch_count = WATCHES.watch_count(program_code)
+        if watch_count > schedule.watch_count:
+            schedule.next_due = min(schedule.next_due, now + POLL_INTERVAL)
+        schedule.watch_count = watch_count
+
+        if schedule.in_flight or schedule.next_due > now:
+            continue
+        schedule.in_flight = True
+        due.append((program_code, WATCHES.watchers(program_code), schedule))
+
+    if not due:
+        return
+
+    logger.debug("⏲️ [KONTROL] %s/%s program kontrol ediliyor...", len(due), len(programs))
+
+    # Her program bağımsız görev olarak çalışır; yavaş bir program diğerlerini bekletmez
+    for program_code, crns, schedule in due:
+        task = context.application.create_task(poll_program(context.application, program_code, crns, schedule))
+        POLL_TASKS.add(task)
+        task.add_done_callback(POLL_TASKS.discard)
+
+
+async def cancel_program_polls(application):
+    """Kapanışta yeni tur başlatmayı durdur ve süren program kontrollerini iptal et
+
+    Önbelleğin arka planda süren sayfa yüklemeleri de iptal edilir; yoksa OBS zaman aşımına
+    kadar açık kalıp istemcinin kapanmasını bekletirler.
+    """
+    if application.job_queue is not None:
+        for job in application.job_queue.get_jobs_by_name(POLLER_JOB_NAME):
+            job.schedule_removal()
+    polls = list(POLL_TASKS)
+    tasks = polls + list(SNAPSHOT_CACHE.inflight.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if polls:
+        logger.info("🛑 %s süren program kontrolü iptal edildi", len(polls))
+
+
+@traced('poll_program', root=True)
+async def poll_program(application, program_code, crns, schedule):
+    """Tek bir programın sayfasını çek, takip edilen CRN'leri kontrol et ve bildir"""
+    annotate_span(program=program_code, crns=len(crns))
+    try:
+        # Hızlı takip edilen programlarda önbellek aralığın yarısından eski veri vermez
+        snapshot, error_message = await fetch_for_poll(program_code, crns, max_age=schedule.interval / 2)
+
+        if snapshot is not None and snapshot.stale:
+            # Eski veri zaten kontrol edildi; OBS düzelene kadar sessiz kal
+            schedule.record_error()
+            PROGRAM_CHECKS_TOTAL.inc('stale')
+            logger.warning("⚠️  [ARKA PLAN] %s için OBS yanıt vermiyor, %s. hata - geri çekiliyor",
+                           program_code, schedule.errors, extra={'program': program_code, 'outcome': 'stale'})
+            return
+
+        if error_message:
+            # Arka plan hataları kullanıcıya gönderilmez (her başarısız turda tüm takipçilere mesaj
+            # gitmesin); program geri çekilir, OBS düzelince takip kaldığı yerden devam eder
+            schedule.record_error()
+            PROGRAM_CHECKS_TOTAL.inc('error')
+            logger.warning("⚠️  [ARKA PLAN] %s kontrol edilemedi (%s. hata, %.0f sn sonra tekrar): %s",
+                           program_code, schedule.errors, schedule.next_due - time.monotonic(),
+                           error_message.splitlines()[0],
+                           extra={'program': program_code, 'outcome': 'error'})
+            return
+
+        # Önceki snapshot ile fark: bildirimler SEAT_EVENTS abonelerinde yapılır
+        with trace_span('seat_events.diff'):
+            events = SEAT_EVENTS.observe(program_code, snapshot)
+        schedule.record_success(bool(events))
+        PROGRAM_CHECKS_TOTAL.inc('changed' if events else 'unchanged')
+        if events:
+            logger.info("📈 %s: %s değişiklik, yeni aralık %.0f sn", program_code, len(events), schedule.interval,
+                        extra={'program': program_code})
+
+        for crn, chat_ids in crns.items():
+            row = snapshot.rows_by_crn.get(crn)
+            if row is not None:
+                WATCH_STORE.record_seats(program_code, crn, row.capacity, row.enrolled)
+
+            # Yeni takip edilen CRN'ler için olay beklenmez, durum doğrudan kontrol edilir
+            if crn in schedule.known_crns:
+                continue
+            result = check_course(program_code, crn, snapshot)
+            if result.status != CHECK_FULL:
+                deliver_check_result(result, chat_ids, snapshot.fetched_at)
+        schedule.known_crns = set(crns)
+    finally:
+        schedule.in_flight = False
+
+
+async def fetch_for_poll(program_code, crns, max_age=None):
+    """Poller için program verisini al: tek CRN takip ediliyorsa sayfayı akış halinde tara"""
+    program_id = PROGRAM_KODLARI.get(program_code)
+    if OBS_STREAM_SCAN and len(crns) == 1 and program_id and not SNAPSHOT_CACHE.has_fresh(program_id, max_age):
+        crn = next(iter(crns))
+        row = await scan_course_stream(program_id, crn)
+        if row is not None:
+            # Sadece bu satırı içeren geçici snapshot - önbelleğe yazılmaz
+            return ProgramSnapshot.from_parsed([row], partial=True), None
+        # Bulunamadı ya da hata: tam sayfa yolu doğru mesajı üretir
+
+    return await fetch_program_snapshot(program_code, is_background=True, max_age=max_age)
+
+
+@traced('search_course')
+async def search_course(program_code, crn, is_background=False):
+    """Belirtilen program kodunda CRN ile dersi ara - KONTENJAN TAKİP
+
+    Dönüş: CheckResult (mesaj için render_check_result kullanılır)
+    """
+    debug_sampled("🔍 %s programında CRN %s aranıyor...", program_code, crn,
+                  program=program_code, crn=crn, background=is_background)
+
+    snapshot, error_message = await fetch_program_snapshot(program_code, is_background=is_background)
+    if error_message:
+        return CheckResult(CHECK_ERROR, program_code, crn, error_message=error_message)
+
+    with trace_span('check_course'):
+        return check_course(program_code, crn, snapshot)
+
+
+@traced('fetch_program_snapshot')
+async def fetch_program_snapshot(program_code, is_background=False, max_age=None):
+    """Program sayfasının snapshot'ını önbellekten ya da OBS'ten al
+
+    Dönüş: (snapshot, error_message) - hata varsa snapshot None olur.
+    """
     if program_code not in PROGRAM_KODLARI:
         mevcut_kodlar = sorted([k for k in PROGRAM_KODLARI.keys() if len(k) == 3])[:10]
         mevcut_liste = ", ".join(mevcut_kodlar)
 
-        print(f"❌ '{program_code}' program kodu bulunamadı!")
-        print(f"   📋 Mevcut kodlar: {mevcut_kodlar[:5]}...")
+        logger.info("❌ '%s' program kodu bulunamadı!", program_code,
+                    extra={'program': program_code, 'outcome': 'unknown_program'})
 
         error_message = (
             f"❌ *'{program_code}' program kodu bulunamadı*\n\n"
@@ -230,217 +2914,418 @@ def search_course(program_code, crn, is_background=False):
             f"💡 *Doğru format: `END_12345`*\n"
             f"❓ *Yardım için: /help*"
         )
-        return error_message
+        return None, error_message
 
     program_id = PROGRAM_KODLARI[program_code]
-    print(f"✅ '{program_code}' bulundu! OBS ID: {program_id}")
+    debug_sampled("✅ '%s' bulundu! OBS ID: %s", program_code, program_id, program=program_code)
+
+    async def loader(previous):
+        return await download_program_snapshot(program_code, program_id, previous, is_background)
+
+    # Kullanıcı sorgularında OBS hata veriyorsa son bilinen veri beklemeden döner
+    return await SNAPSHOT_CACHE.get(program_id, loader, allow_stale=not is_background, max_age=max_age)
 
+
+@traced('obs.download')
+async def download_program_snapshot(program_code, program_id, previous=None, is_background=False):
+    """Program sayfasını OBS'ten indir ve parse et
+
+    Dönüş: (snapshot, error_message) - hata varsa snapshot None olur.
+    """
     params = {
         'ProgramSeviyeTipiAnahtari': 'LS',
         'DersBransKoduId': program_id
     }
 
     headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
         'Referer': MAIN_URL,
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-        'Accept-Language': 'tr-TR,tr;q=0.9,en;q=0.8',
-        'Connection': 'keep-alive',
     }
 
-    try:
-        print(f"🌐 OBS sorgusu yapılıyor...")
-        print(f"   📋 Parametreler: LS={params['ProgramSeviyeTipiAnahtari']}, ID={params['DersBransKoduId']}")
-
-        response = requests.get(BASE_URL, params=params, headers=headers, timeout=15)
-        print(f"   📊 HTTP Status: {response.status_code}")
-        print(f"   📏 Response uzunluk: {len(response.text)} karakter")
+    # Koşullu istek: sayfa değişmediyse OBS 304 döner, önceki satırlar kullanılır
+    if previous is not None:
+        if previous.etag:
+            headers['If-None-Match'] = previous.etag
+        if previous.last_modified:
+            headers['If-Modified-Since'] = previous.last_modified
 
-        if response.status_code != 200:
-            print(f"❌ HTTP {response.status_code} hatası")
-            return f"❌ *OBS bağlantı hatası* (HTTP {response.status_code})\n\n🔄 *Biraz sonra tekrar deneyin*"
+    try:
+        debug_sampled("🌐 OBS sorgusu yapılıyor... (LS=%s, ID=%s)", params['ProgramSeviyeTipiAnahtari'],
+                      params['DersBransKoduId'], program=program_code, background=is_background)
 
-        soup = BeautifulSoup(response.text, 'html.parser')
+        priority = PRIORITY_BACKGROUND if is_background else PRIORITY_INTERACTIVE
+        fetch_start = time.perf_counter()
+        response = await obs_get(BASE_URL, params=params, headers=headers, priority=priority)
+        debug_sampled("📊 HTTP Status: %s", response.status_code, program=program_code, status=response.status_code,
+                      latency=round(time.perf_counter() - fetch_start, 3))
 
-        table = soup.find('table', {'id': 'dersProgramContainer'})
-        if not table:
-            table = soup.find('table')
-            if not table:
-                print("❌ Hiçbir tablo bulunamadı")
-                return f"❌ *Ders listesi yüklenemedi*\n\n🔄 *Lütfen tekrar deneyin*"
-            print("⚠️  ID'siz tablo kullanıldı")
+        if response.status_code == 304 and previous is not None:
+            logger.debug("♻️  Sayfa değişmedi (304), önceki %s satır kullanılıyor", len(previous.rows),
+                         extra={'program': program_code, 'outcome': 'not_modified'})
+            return previous.refreshed(), None
 
-        tbody = table.find('tbody')
-        if not tbody:
-            print("❌ Tablo body bulunamadı")
-            return f"❌ *Ders verisi yüklenemedi*\n\n🔄 *Lütfen tekrar deneyin*"
+        debug_sampled("📏 Response uzunluk: %s byte", len(response.content), program=program_code)
 
-        rows = tbody.find_all('tr')
-        print(f"📋 {len(rows)} ders satırı bulundu")
+        if response.status_code != 200:
+            logger.warning("❌ HTTP %s hatası", response.status_code,
+                           extra={'program': program_code, 'status': response.status_code})
+            return None, f"❌ *OBS bağlantı hatası* (HTTP {response.status_code})\n\n🔄 *Biraz sonra tekrar deneyin*"
+
+        # ETag/Last-Modified olmasa da içerik aynıysa parse etmeye gerek yok
+        body_hash = hashlib.blake2b(response.content, digest_size=16).digest()
+        etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+        if previous is not None and previous.body_hash == body_hash:
+            logger.debug("♻️  Sayfa içeriği aynı, parse atlandı (%s satır)", len(previous.rows),
+                         extra={'program': program_code, 'outcome': 'unchanged'})
+            return previous.refreshed(etag, last_modified, body_hash), None
+
+        rows = await PARSE_POOL.parse(response.content, response.encoding, priority)
+        if rows is None:
+            OBS_ERRORS_TOTAL.inc('no_table')
+            logger.warning("❌ Hiçbir tablo bulunamadı", extra={'program': program_code, 'outcome': 'no_table'})
+            return None, f"❌ *Ders listesi yüklenemedi*\n\n🔄 *Lütfen tekrar deneyin*"
+        debug_sampled("📋 %s ders satırı bulundu", len(rows), program=program_code)
 
         if not rows:
-            return (
+            return None, (
                 f"❌ *'{program_code}' programında ders bulunamadı*\n\n"
                 f"💡 *Bu dönemde ders kaydı yok olabilir*\n"
                 f"🔄 *Farklı program veya dönem deneyin*"
             )
 
-        course_found = False
-        for row_index, row in enumerate(rows):
-            cells = row.find_all('td')
-            if len(cells) < 11:
-                continue
+        debug_sampled("📊 İLK SATIR: %s", rows[0], program=program_code)
 
-            columns = [cell.get_text(strip=True) for cell in cells]
-            if len(columns) < 11:
-                continue
+        return ProgramSnapshot.from_parsed(rows, etag, last_modified, body_hash), None
 
-            if row_index == 0:
-                print(f"📊 İLK SATIR KOLONLARI ({len(columns)} adet):")
-                for i, col in enumerate(columns[:12]):
-                    print(f"   [{i:2d}] '{col}'")
-                if len(columns) > 10:
-                    print(f"   [ 9] KONTENJAN: '{columns[9]}'")
-                    print(f"   [10] YAZILAN:  '{columns[10]}'")
+    except ObsCircuitOpen as e:
+        # OBS'e istek gönderilmedi; önbellekte veri varsa çağırana o döner
+        logger.warning("🔌 %s", e, extra={'program': program_code, 'outcome': 'circuit_open'})
+        return None, f"🔌 *OBS şu anda yanıt vermiyor*\n\n⏳ *Birkaç dakika sonra tekrar deneyin*"
+    except httpx.TimeoutException:
+        logger.warning("⏰ Zaman aşımı hatası", extra={'program': program_code, 'outcome': 'timeout'})
+        return None, f"⏰ *Zaman aşımı*\n\n🔄 *OBS sunucusu yavaş, lütfen tekrar deneyin*"
+    except httpx.TransportError:
+        logger.warning("🌐 Bağlantı hatası", extra={'program': program_code, 'outcome': 'transport_error'})
+        return None, f"🌐 *Bağlantı hatası*\n\n🔌 *İnternet bağlantınızı kontrol edin*"
+    except Exception as e:
+        logger.exception("💥 Beklenmeyen hata: %s", e, extra={'program': program_code})
+        return None, f"💥 *Sistem hatası oluştu*\n\n🔧 *Bot sahibine bildirildi*\n🔄 *Lütfen tekrar deneyin*"
 
-            if columns[0].strip() == crn:
-                course_code = columns[1] if len(columns) > 1 else "Bilinmeyen"
-                course_name = columns[2] if len(columns) > 2 else "Ders adı yok"
-                time_slot = columns[7] if len(columns) > 7 else "Bilinmeyen"
-                day = columns[6] if len(columns) > 6 else "Bilinmeyen"
 
-                try:
-                    kontenjan_text = columns[9] if len(columns) > 9 else "0"
-                    yazilan_text = columns[10] if len(columns) > 10 else "0"
-
-                    kontenjan = int(kontenjan_text) if kontenjan_text.isdigit() else 0
-                    yazilan = int(yazilan_text) if yazilan_text.isdigit() else 0
-                    bos_yer = max(0, kontenjan - yazilan)
-
-                    print(f"✅ DERS BULUNDU!")
-                    print(f"   📘 Kod: {course_code}")
-                    print(f"   📖 Ad: {course_name}")
-                    print(f"   🕒 Zaman: {day} {time_slot}")
-                    print(f"   📊 Kontenjan: {kontenjan} (text='{kontenjan_text}') [KOLON 9]")
-                    print(f"   📝 Yazılan: {yazilan} (text='{yazilan_text}') [KOLON 10]")
-                    print(f"   🟢 Boş: {bos_yer}")
-
-                except (ValueError, IndexError) as e:
-                    print(f"⚠️  Kontenjan parse hatası: {e}")
-                    try:
-                        kontenjan = int(columns[-3]) if len(columns) >= 3 and columns[-3].isdigit() else 0
-                        yazilan = int(columns[-2]) if len(columns) >= 2 and columns[-2].isdigit() else 0
-                        bos_yer = max(0, kontenjan - yazilan)
-                        print(f"   🔄 Fallback: Kontenjan={kontenjan}, Yazılan={yazilan}")
-                    except:
-                        print("   ❌ Fallback bile başarısız")
-                        kontenjan = yazilan = bos_yer = 0
-
-                course_found = True
-
-                # 🚨 KONTENJAN KONTROLÜ 🚨
-                if bos_yer > 0:
-                    # Kontenjan AÇILDI → Detaylı bildirim
-                    print(f"🟢 KONTENJAN AÇILDI! ({bos_yer} yer)")
-                    return (
-                        f"🟢 *KONTENJAN AÇILDI!*\n"
-                        f"{'━' * 35}\n"
-                        f"📘 *Ders Kodu:* `{course_code}`\n"
-                        f"📖 *Ders Adı:* {course_name}\n"
-                        f"🔗 *Program:* `{program_code}`\n"
-                        f"🆔 *CRN:* `{crn}`\n"
-                        f"🕒 *Zaman:* {day} {time_slot}\n"
-                        f"{'━' * 35}\n"
-                        f"👥 *Kontenjan:* {kontenjan}\n"
-                        f"📝 *Yazılan:* {yazilan}\n"
-                        f"🟢 *Boş Yer:* {bos_yer}\n"
-                        f"{'━' * 35}\n"
-                        f"🔗 *Kayıt Linki:*\n{DERS_KAYIT_URL}\n\n"
-                        f"📱 *Hızlıca kayıt olun!*"
-                    )
-                else:
-                    # Kontenjan YOK → Onay mesajı (ilk sorguda)
-                    if not is_background:
-                        print(f"🔴 Kontenjan yok, takip ediliyor")
-                        return (
-                            f"🔴 *Kontenjan yok!*\n"
-                            f"📘 *Ders:* `{course_code}`\n"
-                            f"🆔 *CRN:* `{crn}`\n"
-                            f"⏳ *Kontenjan açılınca bildirim gönderilecek.*"
-                        )
+STREAM_THEAD_RE = re.compile(rb'<thead[^>]*>(.*?)</thead>', re.S | re.I)
+STREAM_TH_RE = re.compile(rb'<th[^>]*>(.*?)</th>', re.S | re.I)
+STREAM_TD_RE = re.compile(rb'<td[^>]*>(.*?)</td>', re.S | re.I)
+STREAM_TAG_RE = re.compile(rb'<[^>]+>')
+STREAM_TAIL_BYTES = 2048  # parçalar arasında bölünen eşleşmeler için tutulan kuyruk
+
+
+def stream_crn_row_re(crn, crn_column):
+    """CRN'i yalnızca satırın CRN hücresinde arayan desen
+
+    Satır başından (<tr>) itibaren CRN kolonundan önceki hücreler atlanır; aynı rakamlar
+    başka bir kolonda (Derslik, Kontenjan...) geçse de eşleşmez. 'crn' grubu CRN hücresidir.
+    """
+    skipped = rb'(?:<td[^>]*>(?:(?!</t[dr]).)*</td>\s*)' * crn_column
+    return re.compile(rb'<tr[^>]*>\s*' + skipped +
+                      rb'(?P<crn><td[^>]*>\s*' + re.escape(crn.encode()) + rb'\s*</td>)', re.S | re.I)
+
+
+def stream_cell_text(raw):
+    """Ham hücre byte'larından etiketsiz metin (cell_text ile aynı sonuç)"""
+    text = STREAM_TAG_RE.sub(b'\x00', raw).decode('utf-8', 'replace')
+    return unescape("".join(part.strip() for part in text.split('\x00')))
+
+
+@traced('obs.stream_scan')
+async def scan_course_stream(program_id, crn):
+    """Program sayfasını akış halinde okuyup tek CRN'in satırını bul
+
+    Kontenjan ve yazılan hücreleri okunduğu anda bağlantı kapatılır, sayfanın
+    geri kalanı indirilmez. Dönüş: satır tuple'ı (bkz. ROW_*) ya da None.
+    """
+    params = {
+        'ProgramSeviyeTipiAnahtari': 'LS',
+        'DersBransKoduId': program_id
+    }
+    crn_row_re = None
+    layout = DEFAULT_COLUMN_LAYOUT
+    header_done = False
+    buffer = b""
+    row_found = False
+    bytes_read = 0
+
+    breaker = obs_breaker(BASE_URL)
+    try:
+        breaker.before_request()
+    except ObsCircuitOpen:
+        return None  # tam sayfa yolu da reddedilir ve önbellekteki veriye düşer
+    outcome_recorded = False
+
+    try:
+        async with obs_request_slot(PRIORITY_BACKGROUND) as client:
+            start = time.perf_counter()
+            with OBS_FETCH_SECONDS.time(PRIORITY_NAMES[PRIORITY_BACKGROUND]):
+                async with client.stream('GET', BASE_URL, params=params, headers={'Referer': MAIN_URL},
+                                         extensions=http_trace_extensions()) as response:
+                    if response.status_code >= 500 or response.status_code == 429:
+                        OBS_ERRORS_TOTAL.inc('http_status')
+                        breaker.record_failure()
+                        outcome_recorded = True
+                        return None
+                    breaker.record_success(time.perf_counter() - start)
+                    outcome_recorded = True
+                    if response.status_code != 200:
+                        OBS_ERRORS_TOTAL.inc('http_status')
+                        return None
+
+                    async for chunk in response.aiter_bytes():
+                        bytes_read += len(chunk)
+                        buffer += chunk
+
+                        if not header_done:
+                            thead = STREAM_THEAD_RE.search(buffer)
+                            if thead:
+                                header = [stream_cell_text(th) for th in STREAM_TH_RE.findall(thead.group(1))]
+                                layout = detect_column_layout(header) if header else DEFAULT_COLUMN_LAYOUT
+                                header_done = True
+                                if min(layout) < layout[ROW_CRN]:
+                                    return None  # CRN ilk kolon değil, tam sayfa parse gerekir
+                            elif b'<tbody' in buffer or len(buffer) > 256 * 1024:
+                                header_done = True  # başlık yok, varsayılan sıra
+                            else:
+                                continue
+
+                        if not row_found:
+                            if crn_row_re is None:
+                                crn_row_re = stream_crn_row_re(crn, layout[ROW_CRN])
+                            match = crn_row_re.search(buffer)
+                            if match is None:
+                                buffer = buffer[-STREAM_TAIL_BYTES:]
+                                continue
+                            buffer = buffer[match.start('crn'):]
+                            row_found = True
+
+                        # CRN hücresinden itibaren gerekli kolon sayısı okunduysa dur
+                        row_end = buffer.find(b'</tr')
+                        cells = STREAM_TD_RE.findall(buffer if row_end < 0 else buffer[:row_end])
+                        if len(cells) > max(layout) - layout[ROW_CRN] or row_end >= 0:
+                            break
                     else:
-                        # Arka planda, sessiz kal
-                        print(f"🔴 [ARKA PLAN] Kontenjan yok, bildirim gönderilmedi")
+                        logger.debug("🔎 Akış taraması: CRN %s bulunamadı (%s byte okundu)", crn, bytes_read,
+                                     extra={'crn': crn})
                         return None
+    except httpx.HTTPError as e:
+        OBS_ERRORS_TOTAL.inc(obs_error_type(e))
+        breaker.record_failure()
+        outcome_recorded = True
+        logger.warning("⚠️  Akış taraması başarısız: %s", e, extra={'crn': crn})
+        return None
+    finally:
+        if not outcome_recorded:
+            # İptal edildi ya da yanıt gelmeden çıkıldı: deneme hakkı bir sonraki isteğe geçer
+            breaker.record_cancelled()
+
+    # Hücre indeksleri CRN kolonuna göre kaydırılır (CRN'den önceki hücreler okunmadı)
+    offset = layout[ROW_CRN]
+    values = [stream_cell_text(cell) for cell in cells]
+    if len(values) <= max(layout) - offset:
+        return None
+
+    def column(field):
+        return values[layout[field] - offset]
+
+    capacity = column(ROW_CAPACITY)
+    enrolled = column(ROW_ENROLLED)
+    logger.debug("🔎 Akış taraması: CRN %s bulundu, %s byte okundu, bağlantı erken kapatıldı", crn, bytes_read,
+                 extra={'crn': crn})
+    return (
+        crn,
+        column(ROW_CODE),
+        column(ROW_NAME),
+        column(ROW_DAY),
+        column(ROW_TIME),
+        int(capacity) if capacity.isdigit() else 0,
+        int(enrolled) if enrolled.isdigit() else 0,
+    )
 
-            if row_index < 3:
-                kont_text = columns[9] if len(columns) > 9 else 'N/A'
-                yaz_text = columns[10] if len(columns) > 10 else 'N/A'
-                bos_temp = max(0, int(kont_text) - int(yaz_text)) if kont_text.isdigit() and yaz_text.isdigit() else 0
-                print(
-                    f"   Debug {row_index + 1}: CRN='{columns[0]}', Kod='{columns[1] if len(columns) > 1 else 'N/A'}', Kont='{kont_text}' [9], Yaz='{yaz_text}' [10], Boş={bos_temp}")
-
-        if not course_found:
-            print(f"❌ CRN '{crn}' '{program_code}' programında bulunamadı")
-            sample_crns = []
-            sample_kontenjan = []
-            bos_listesi = []
-            for row in rows[:5]:
-                cells = row.find_all('td')
-                if len(cells) >= 11:
-                    columns = [cell.get_text(strip=True) for cell in cells]
-                    if len(columns) >= 11:
-                        crn_sample = columns[0]
-                        kont_sample = columns[9] if len(columns) > 9 else '0'
-                        yaz_sample = columns[10] if len(columns) > 10 else '0'
-                        bos_sample = max(0, int(kont_sample) - int(
-                            yaz_sample)) if kont_sample.isdigit() and yaz_sample.isdigit() else 0
-
-                        sample_crns.append(crn_sample)
-                        sample_kontenjan.append(f"{kont_sample}/{yaz_sample}")
-                        bos_listesi.append(bos_sample)
-
-            sample_text = ", ".join(sample_crns[:3]) if sample_crns else "yok"
-            kontenjan_text = ", ".join(sample_kontenjan[:3]) if sample_kontenjan else "yok"
-
-            if any(bos > 0 for bos in bos_listesi):
-                bos_dersler = [f"`{crn}` ({kont}/{yaz})" for crn, kont, yaz in
-                               zip(sample_crns[:3], sample_kontenjan[:3], bos_listesi) if
-                               int(yaz.split('/')[1]) < int(yaz.split('/')[0])]
-                bos_liste = ", ".join(bos_dersler) if bos_dersler else "yok"
-
-                return (
-                    f"❌ *CRN '{crn}' bulunamadı*\n\n"
-                    f"🔍 *'{program_code}' programında bu CRN mevcut değil*\n\n"
-                    f"💡 *Ama bu programda BOŞ YERLER var!*\n"
-                    f"📋 *Mevcut dersler:* `{sample_text}`\n"
-                    f"📊 *Durum:* `{kontenjan_text}`\n"
-                    f"🎯 *Boş dersler:* {bos_liste}\n\n"
-                    f"🔄 *Farklı CRN deneyin*\n"
-                    f"📝 *Örnek: `{program_code}_54321`*"
-                )
-            else:
-                return (
-                    f"❌ *CRN '{crn}' bulunamadı*\n\n"
-                    f"🔍 *'{program_code}' programında bu CRN mevcut değil*\n\n"
-                    f"📋 *Mevcut dersler:* `{sample_text}`\n"
-                    f"📊 *Durum:* `{kontenjan_text}`\n\n"
-                    f"⚠️ *Bu programda hiç boş yer yok!*\n"
-                    f"🔄 *Farklı program deneyin*\n"
-                    f"📝 *Örnek: `END_54321`*"
-                )
 
-    except requests.exceptions.Timeout:
-        print("⏰ Zaman aşımı hatası")
-        return f"⏰ *Zaman aşımı*\n\n🔄 *OBS sunucusu yavaş, lütfen tekrar deneyin*"
-    except requests.exceptions.ConnectionError:
-        print("🌐 Bağlantı hatası")
-        return f"🌐 *Bağlantı hatası*\n\n🔌 *İnternet bağlantınızı kontrol edin*"
-    except Exception as e:
-        print(f"💥 Beklenmeyen hata: {e}")
-        print(f"   Hata tipi: {type(e)}")
-        print(f"   Traceback: {traceback.format_exc()}")
-        return f"💥 *Sistem hatası oluştu*\n\n🔧 *Bot sahibine bildirildi*\n🔄 *Lütfen tekrar deneyin*"
+def check_course(program_code, crn, snapshot):
+    """Program snapshot'ında CRN'i ara ve yapılandırılmış sonucu döndür (Markdown üretmez)"""
+    stale_age = snapshot.age() if snapshot.stale else None
+
+    row = snapshot.rows_by_crn.get(crn)
+    if row is None:
+        COURSE_CHECKS_TOTAL.inc(CHECK_NOT_FOUND)
+        debug_sampled("🔎 CRN kontrolü", program=program_code, crn=crn, outcome=CHECK_NOT_FOUND)
+        return CheckResult(CHECK_NOT_FOUND, program_code, crn, samples=snapshot.rows[:5], stale_age=stale_age)
+
+    status = CHECK_OPEN if row.free_seats > 0 else CHECK_FULL
+    COURSE_CHECKS_TOTAL.inc(status)
+    debug_sampled("🔎 CRN kontrolü", program=program_code, crn=crn, outcome=status)
+    return CheckResult(status, program_code, crn, row=row, stale_age=stale_age)
+
+
+@RENDER_SECONDS.timed
+@traced('render')
+def render_check_result(result, is_background=False):
+    """CheckResult'ı kullanıcıya gönderilecek Markdown mesaja çevir (sessiz kalınacaksa None)"""
+    if result.status == CHECK_ERROR:
+        return result.error_message
+
+    program_code = result.program_code
+    crn = result.crn
+
+    # OBS yanıt vermiyorsa kullanıcıya verinin eski olduğunu belirt
+    stale_note = ""
+    if result.stale_age is not None:
+        stale_note = f"\n\n⚠️ *OBS yanıt vermiyor, {result.stale_age:.0f} sn önceki veri gösteriliyor*"
+
+    row = result.row
+    if result.status == CHECK_OPEN:
+        # Kontenjan AÇILDI → Detaylı bildirim
+        logger.info("🟢 KONTENJAN AÇILDI! %s_%s (%s yer)", program_code, crn, row.free_seats,
+                    extra={'program': program_code, 'crn': crn, 'outcome': 'open'})
+        return (
+            f"🟢 *KONTENJAN AÇILDI!*\n"
+            f"{'━' * 35}\n"
+            f"📘 *Ders Kodu:* `{row.course_code}`\n"
+            f"📖 *Ders Adı:* {row.course_name}\n"
+            f"🔗 *Program:* `{program_code}`\n"
+            f"🆔 *CRN:* `{crn}`\n"
+            f"🕒 *Zaman:* {row.day} {row.time_slot}\n"
+            f"{'━' * 35}\n"
+            f"👥 *Kontenjan:* {row.capacity}\n"
+            f"📝 *Yazılan:* {row.enrolled}\n"
+            f"🟢 *Boş Yer:* {row.free_seats}\n"
+            f"{'━' * 35}\n"
+            f"🔗 *Kayıt Linki:*\n{DERS_KAYIT_URL}\n\n"
+            f"📱 *Hızlıca kayıt olun!*"
+            f"{stale_note}"
+        )
+
+    if result.status == CHECK_FULL:
+        # Kontenjan YOK → Onay mesajı (ilk sorguda), arka planda sessiz kal
+        if is_background:
+            return None
+        debug_sampled("🔴 Kontenjan yok, takip ediliyor: %s_%s", program_code, crn,
+                      program=program_code, crn=crn, outcome='full')
+        return (
+            f"🔴 *Kontenjan yok!*\n"
+            f"📘 *Ders:* `{row.course_code}`\n"
+            f"🆔 *CRN:* `{crn}`\n"
+            f"⏳ *Kontenjan açılınca bildirim gönderilecek.*"
+            f"{stale_note}"
+        )
+
+    logger.info("❌ CRN '%s' '%s' programında bulunamadı", crn, program_code,
+                extra={'program': program_code, 'crn': crn, 'outcome': 'not_found'})
+    samples = result.samples
+    sample_text = ", ".join(sample.crn for sample in samples[:3]) if samples else "yok"
+    kontenjan_text = ", ".join(f"{sample.capacity}/{sample.enrolled}" for sample in samples[:3]) if samples else "yok"
+
+    if any(sample.free_seats > 0 for sample in samples):
+        bos_dersler = [f"`{sample.crn}` ({sample.capacity}/{sample.enrolled})"
+                       for sample in samples[:3] if sample.free_seats > 0]
+        bos_liste = ", ".join(bos_dersler) if bos_dersler else "yok"
+
+        return (
+            f"❌ *CRN '{crn}' bulunamadı*\n\n"
+            f"🔍 *'{program_code}' programında bu CRN mevcut değil*\n\n"
+            f"💡 *Ama bu programda BOŞ YERLER var!*\n"
+            f"📋 *Mevcut dersler:* `{sample_text}`\n"
+            f"📊 *Durum:* `{kontenjan_text}`\n"
+            f"🎯 *Boş dersler:* {bos_liste}\n\n"
+            f"🔄 *Farklı CRN deneyin*\n"
+            f"📝 *Örnek: `{program_code}_54321`*"
+            f"{stale_note}"
+        )
+    else:
+        return (
+            f"❌ *CRN '{crn}' bulunamadı*\n\n"
+            f"🔍 *'{program_code}' programında bu CRN mevcut değil*\n\n"
+            f"📋 *Mevcut dersler:* `{sample_text}`\n"
+            f"📊 *Durum:* `{kontenjan_text}`\n\n"
+            f"⚠️ *Bu programda hiç boş yer yok!*\n"
+            f"🔄 *Farklı program deneyin*\n"
+            f"📝 *Örnek: `END_54321`*"
+            f"{stale_note}"
+        )
+
+
+@RENDER_SECONDS.timed
+def render_seat_event(event):
+    """Açılma dışındaki kontenjan olaylarını Markdown mesaja çevir"""
+    if event.kind == EVENT_CAPACITY_RAISED:
+        row = event.new
+        return (
+            f"📈 *Kontenjan artırıldı!*\n"
+            f"📘 *Ders:* `{row.course_code}`\n"
+            f"🆔 *CRN:* `{event.crn}`\n"
+            f"👥 *Kontenjan:* {event.old.capacity} → {row.capacity}\n"
+            f"📝 *Yazılan:* {row.enrolled}\n"
+            f"⏳ *Hâlâ dolu, takip devam ediyor.*"
+        )
+    if event.kind == EVENT_SECTION_REMOVED:
+        return (
+            f"⚠️ *Şube programda görünmüyor*\n"
+            f"📘 *Ders:* `{event.old.course_code}`\n"
+            f"🆔 *CRN:* `{event.crn}`\n"
+            f"🔗 *Program:* `{event.program_code}`\n"
+            f"⏳ *Tekrar eklenirse bildirim gönderilecek.*"
+        )
+    return None
+
+
+@RENDER_SECONDS.timed
+@traced('render')
+def render_open_sections(sections, program_code=None, total=None):
+    """Katalogdaki boş yerli şubeleri Markdown listeye çevir"""
+    scope = f"`{program_code}` programında" if program_code else "Tüm programlarda"
+    if not sections:
+        return f"🔴 *{scope} boş yeri olan şube yok.*"
+    lines = [f"🟢 *{scope} boş yeri olan {total or len(sections)} şube*", '━' * 35]
+    for section in sections:
+        lines.append(
+            f"`{section['program_code']}_{section['crn']}` {section['course_code']} - "
+            f"*{section['free_seats']} boş yer* ({section['capacity']}/{section['enrolled']}) "
+            f"{section['day']} {section['time_slot']}"
+        )
+    if total and total > len(sections):
+        lines.append(f"… ve {total - len(sections)} şube daha")
+    return "\n".join(lines)
+
+
+@RENDER_SECONDS.timed
+@traced('render')
+def render_bulk_results(results, watched_count):
+    """Toplu sorgu sonuçlarını program bazında gruplanmış tek Markdown mesaja çevir"""
+    lines = [f"📋 *Toplu sorgu: {len(results)} ders*", '━' * 35]
+    program_code = None
+    stale_age = None
+    for result in results:
+        if result.program_code != program_code:
+            program_code = result.program_code
+            lines.append(f"🔗 *Program:* `{program_code}`")
+        row = result.row
+        if result.status == CHECK_OPEN:
+            lines.append(f"🟢 `{result.crn}` {row.course_code} - *{row.free_seats} boş yer* ({row.capacity}/{row.enrolled})")
+        elif result.status == CHECK_FULL:
+            lines.append(f"🔴 `{result.crn}` {row.course_code} - dolu ({row.capacity}/{row.enrolled}) ⏳")
+        elif result.status == CHECK_NOT_FOUND:
+            lines.append(f"❌ `{result.crn}` bu programda bulunamadı")
+        else:
+            # Hata mesajının ilk satırı özet olarak yeterli
+            lines.append(f"⚠️ `{result.crn}` {result.error_message.split(chr(10), 1)[0]}")
+        if result.stale_age is not None:
+            stale_age = max(stale_age or 0.0, result.stale_age)
+
+    lines.append('━' * 35)
+    if any(result.status == CHECK_OPEN for result in results):
+        lines.append(f"🔗 *Kayıt Linki:*\n{DERS_KAYIT_URL}")
+    if watched_count:
+        lines.append(f"⏳ *{watched_count} ders takibe alındı, kontenjan açılınca bildirim gönderilecek.*")
+    if stale_age is not None:
+        lines.append(f"⚠️ *OBS yanıt vermiyor, {stale_age:.0f} sn önceki veri gösteriliyor*")
+    return "\n".join(lines)
 
 
 async def start_command(update, context: ContextTypes.DEFAULT_TYPE):
@@ -448,7 +3333,8 @@ async def start_command(update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     chat_id = update.effective_chat.id
 
-    print(f"🚀 /start - Kullanıcı: {user.first_name} (@{user.username}) - Chat ID: {chat_id}")
+    logger.info("🚀 /start - Kullanıcı: %s (@%s) - Chat ID: %s", user.first_name, user.username, chat_id,
+                extra={'chat_id': chat_id})
 
     populer_kodlar = []
     test_codes = ['END', 'TUR', 'MAT', 'FIZ', 'KIM', 'BIL', 'ELE', 'MAK', 'BHB']
@@ -502,7 +3388,9 @@ async def help_command(update, context: ContextTypes.DEFAULT_TYPE):
         f"• Kontenjan **açılınca**: *Ders detayları (ad, zaman, CRN, kontenjan, boş yer)*\n\n"
         f"📖 *Nasıl Kullanılır?*\n"
         f"• *Format:* `PROGRAM_KODU_CRN`\n"
-        f"• *Örnek:* `END_12345`\n\n"
+        f"• *Örnek:* `END_12345`\n"
+        f"• *Toplu:* `END_12345 BLG_20001` ya da `BLG 20001 20002 20003`\n"
+        f"• *Boş şubeler:* `/open` ya da `/open BLG` (katalog modu)\n\n"
         f"📋 *Popüler Program Kodları:*\n"
         f"• *`END`* - Endüstri Mühendisliği (İngilizce)\n"
         f"• *`TUR`* - Türkçe Programlar\n"
@@ -522,13 +3410,126 @@ async def help_command(update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(help_message, parse_mode='Markdown')
 
 
+BULK_SEPARATOR_RE = re.compile(r'[\s,;]+')
+CRN_RE = re.compile(r'[0-9]{5}')  # \d ASCII dışı rakamları da kabul eder
+
+
+def parse_bulk_query(text):
+    """Mesajdaki ders listesini ayrıştır: [(program_code, crn), ...] (sıra korunur, tekrarlar atılır)
+
+    Kabul edilen biçimler (karışık da olabilir):
+      `END_12345 BLG_20001`   - her CRN kendi programıyla
+      `BLG 20001 20002, 20003` ya da `BLG_20001 20002` - sonraki CRN'ler son programa ait
+    Sadece bilinen program kodları (PROGRAM_KODLARI) ve 5 haneli CRN'ler kabul edilir; tanınmayan
+    bir parça varsa None döner ve mesaj tekli sorgu yolunda değerlendirilir (ör. "SEN 3 kez").
+    """
+    queries = []
+    program_code = None
+    for token in BULK_SEPARATOR_RE.split(text.strip().upper()):
+        token = token.rstrip(':')
+        if not token:
+            continue
+        code, sep, crn = token.partition('_')
+        if sep:
+            if code not in PROGRAM_KODLARI or not CRN_RE.fullmatch(crn):
+                return None
+            program_code = code
+        elif token in PROGRAM_KODLARI:
+            program_code = token
+            continue
+        elif CRN_RE.fullmatch(token) and program_code:
+            crn = token
+        else:
+            return None
+        if (program_code, crn) not in queries:
+            queries.append((program_code, crn))
+    return queries or None
+
+
+@traced('handle_bulk_query')
+async def handle_bulk_query(update, context: ContextTypes.DEFAULT_TYPE, queries):
+    """Birden çok dersi tek yanıtla sorgula: her program sayfası bir kez çekilir, takipler topluca eklenir"""
+    chat_id = update.effective_chat.id
+
+    truncated = len(queries) > BULK_QUERY_MAX
+    queries = queries[:BULK_QUERY_MAX]
+
+    # {program_code: [crn, ...]} - mesajdaki sıra korunur
+    by_program = {}
+    for program_code, crn in queries:
+        by_program.setdefault(program_code, []).append(crn)
+    logger.info("🔍 Toplu sorgu: %s ders, %s program (Chat: %s)", len(queries), len(by_program), chat_id,
+                extra={'chat_id': chat_id})
+
+    # Rate-limiting: tek sorguyla aynı kural (mesaj başına bir kez)
+    current_time = time.time()
+    last_request = LAST_REQUEST_TIME.get(chat_id)
+    if last_request is not None:
+        elapsed = current_time - last_request
+        if elapsed < 2:
+            await asyncio.sleep(2 - elapsed)
+
+    status_message = await update.message.reply_text(
+        f"🔍 *Sorgulanıyor...*\n"
+        f"📂 {len(queries)} ders, {len(by_program)} program"
+        , parse_mode='Markdown'
+    )
+
+    try:
+        # Programlar eşzamanlı çekilir; aynı programın CRN'leri tek snapshot'tan okunur
+        fetched = await asyncio.gather(*(fetch_program_snapshot(program_code) for program_code in by_program))
+        LAST_REQUEST_TIME.touch(chat_id)
+
+        results = []
+        for (program_code, crns), (snapshot, error_message) in zip(by_program.items(), fetched):
+            for crn in crns:
+                if error_message:
+                    results.append(CheckResult(CHECK_ERROR, program_code, crn, error_message=error_message))
+                else:
+                    results.append(check_course(program_code, crn, snapshot))
+
+        # Dolu dersler tek seferde takibe alınır (depo yazmaları bir sonraki flush'ta tek transaction)
+        watched_count = 0
+        for result in results:
+            if result.status != CHECK_FULL or not WATCHES.add(chat_id, result.program_code, result.crn):
+                continue
+            WATCH_STORE.add(chat_id, result.program_code, result.crn)
+            WATCH_STORE.record_seats(result.program_code, result.crn, result.row.capacity, result.row.enrolled)
+            watched_count += 1
+        logger.info("⏳ Toplu sorgu: %s ders takibe alındı (Chat: %s)", watched_count, chat_id,
+                    extra={'chat_id': chat_id})
+
+        await status_message.delete()
+
+        text = render_bulk_results(results, watched_count)
+        if truncated:
+            text += f"\n\n⚠️ *Mesaj başına en fazla {BULK_QUERY_MAX} ders sorgulanır, kalanları ayrıca gönderin.*"
+        await update.message.reply_text(text, parse_mode='Markdown')
+
+    except Exception as e:
+        logger.exception("💥 Toplu sorgu hatası: %s", e, extra={'chat_id': chat_id})
+        try:
+            await status_message.delete()
+        except:
+            pass
+        await update.message.reply_text(
+            f"💥 *Beklenmeyen hata oluştu*\n\n"
+            f"🔧 *Lütfen tekrar deneyin*\n"
+            f"📞 *Hata: {str(e)[:50]}...*"
+            , parse_mode='Markdown'
+        )
+
+
+@traced('handle_message', root=True)
 async def handle_message(update, context: ContextTypes.DEFAULT_TYPE):
     """Kullanıcı mesajlarını işle - DAKİKALIK KONTENJAN TAKİP"""
     user = update.effective_user
     message_text = update.message.text.strip()
     chat_id = update.effective_chat.id
+    annotate_span(chat_id=chat_id)
 
-    print(f"💬 {user.first_name} (@{user.username}): '{message_text}' [Chat: {chat_id}]")
+    logger.info("💬 %s (@%s): '%s' [Chat: %s]", user.first_name, user.username, message_text, chat_id,
+                extra={'chat_id': chat_id})
 
     clean_text = message_text.strip().upper()
 
@@ -536,19 +3537,27 @@ async def handle_message(update, context: ContextTypes.DEFAULT_TYPE):
         await help_command(update, context)
         return
 
+    # Birden çok ders (ya da `BLG 20001` gibi programlı CRN listesi) tek yanıtla sorgulanır
+    queries = parse_bulk_query(clean_text)
+    if queries and (len(queries) > 1 or '_' not in clean_text):
+        await handle_bulk_query(update, context, queries)
+        return
+
     if '_' in clean_text:
         parts = clean_text.split('_')
 
         if len(parts) == 2:
             program_code, crn_input = parts
 
-            if len(program_code) == 3 and crn_input.isdigit():
-                print(f"🔍 İşleniyor: {program_code}_{crn_input}")
+            if len(program_code) == 3 and CRN_RE.fullmatch(crn_input):
+                logger.debug("🔍 İşleniyor: %s_%s", program_code, crn_input,
+                             extra={'program': program_code, 'crn': crn_input})
 
                 # Rate-limiting: Son istekten bu yana 2 saniye geçti mi?
                 current_time = time.time()
-                if chat_id in LAST_REQUEST_TIME:
-                    elapsed = current_time - LAST_REQUEST_TIME[chat_id]
+                last_request = LAST_REQUEST_TIME.get(chat_id)
+                if last_request is not None:
+                    elapsed = current_time - last_request
                     if elapsed < 2:  # 2 saniye bekle
                         await asyncio.sleep(2 - elapsed)
 
@@ -559,35 +3568,33 @@ async def handle_message(update, context: ContextTypes.DEFAULT_TYPE):
                 )
 
                 try:
-                    result = search_course(program_code, crn_input)
+                    result = await search_course(program_code, crn_input)
 
                     # Son istek zamanını güncelle
-                    LAST_REQUEST_TIME[chat_id] = time.time()
+                    LAST_REQUEST_TIME.touch(chat_id)
 
                     await status_message.delete()
 
-                    if result:
-                        await update.message.reply_text(result, parse_mode='Markdown')
+                    text = render_check_result(result)
+                    if text:
+                        await update.message.reply_text(text, parse_mode='Markdown')
 
                     # Kontenjan yoksa takibe al
-                    if result and "Kontenjan yok" in result:
-                        if chat_id not in WATCHED_COURSES:
-                            WATCHED_COURSES[chat_id] = []
-                        if (program_code, crn_input) not in WATCHED_COURSES[chat_id]:
-                            WATCHED_COURSES[chat_id].append((program_code, crn_input))
+                    if result.status == CHECK_FULL:
+                        if not WATCHES.contains(chat_id, program_code, crn_input):
                             if context.application.job_queue is None:
                                 await update.message.reply_text("❌ Takip sistemi aktif değil. Bot yeniden başlatılmalı.")
                                 return
-                            context.application.job_queue.run_repeating(
-                                check_course,
-                                interval=60,  # Her 1 dakikada bir kontrol
-                                data=(chat_id, program_code, crn_input),
-                                name=f"{chat_id}_{program_code}_{crn_input}"
-                            )
-                            print(f"⏳ {program_code}_{crn_input} takibe alındı (Chat: {chat_id}, 1 dk kontrol)")
+                            # Ortak poller tüm takipleri program bazında kontrol eder
+                            WATCHES.add(chat_id, program_code, crn_input)
+                            WATCH_STORE.add(chat_id, program_code, crn_input)
+                            WATCH_STORE.record_seats(program_code, crn_input, result.row.capacity, result.row.enrolled)
+                            logger.info("⏳ %s_%s takibe alındı (Chat: %s, 1 dk kontrol)",
+                                        program_code, crn_input, chat_id,
+                                        extra={'program': program_code, 'crn': crn_input, 'chat_id': chat_id})
 
                 except Exception as e:
-                    print(f"💥 Mesaj işleme hatası: {e}")
+                    logger.exception("💥 Mesaj işleme hatası: %s", e)
                     try:
                         await status_message.delete()
                     except:
@@ -630,15 +3637,42 @@ async def handle_message(update, context: ContextTypes.DEFAULT_TYPE):
         f"• *`BHB_15079`*\n\n"
         f"🔍 *Popüler kodlar:* `END, TUR, MAT, FIZ, KIM, BHB`\n"
         f"❓ *Detaylı yardım: /help*\n\n"
-        f"⏳ *Bot her dakika kontenjan kontrolü yapar!*\n"
+        f"⏳ *Bot kontenjanları düzenli olarak kontrol eder!*\n"
         f"🚨 *Komutlar: /stop, /cancel, /status*"
     )
     await update.message.reply_text(format_error, parse_mode='Markdown')
 
 
+OPEN_LIST_LIMIT = 30  # /open yanıtında en fazla şube
+
+
+@traced('open_command', root=True)
+async def open_command(update, context: ContextTypes.DEFAULT_TYPE):
+    """/open [PROGRAM] - katalogda boş yeri olan şubeler (tek vektörel sorgu, OBS'e gidilmez)"""
+    if not CATALOG_MODE:
+        await update.message.reply_text("ℹ️ Katalog modu kapalı. Ders sorgulamak için: `END_12345`", parse_mode='Markdown')
+        return
+
+    program_code = context.args[0].upper() if context.args else None
+    if not CATALOG.segments:
+        await update.message.reply_text("⏳ *Katalog henüz taranıyor, biraz sonra tekrar deneyin.*", parse_mode='Markdown')
+        return
+    if program_code is not None and program_code not in CATALOG.segments:
+        await update.message.reply_text(f"❌ *'{program_code}' programı katalogda yok (henüz taranmamış olabilir).*",
+                                        parse_mode='Markdown')
+        return
+
+    indexes = CATALOG.open_sections(program_code)
+    sections = sorted((CATALOG.section(index) for index in indexes), key=lambda section: -section['free_seats'])
+    await update.message.reply_text(
+        render_open_sections(sections[:OPEN_LIST_LIMIT], program_code, len(sections)), parse_mode='Markdown')
+    logger.info("🗂️ %s için /open: %s şube (%s)", update.effective_chat.id, len(sections), program_code or 'tümü',
+                extra={'chat_id': update.effective_chat.id})
+
+
 async def error_handler(update, context: ContextTypes.DEFAULT_TYPE):
     """Genel hata yakalama"""
-    print(f"💥 TELEGRAM HATA: {context.error}")
+    logger.error("💥 TELEGRAM HATA: %s", context.error, exc_info=context.error)
 
     if update and update.message:
         try:
@@ -658,16 +3692,12 @@ async def stop_command(update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     user = update.effective_user
 
-    print(f"🛑 /stop - Kullanıcı: {user.first_name} (@{user.username}) - Chat ID: {chat_id}")
+    logger.info("🛑 /stop - Kullanıcı: %s (@%s) - Chat ID: %s", user.first_name, user.username, chat_id,
+                extra={'chat_id': chat_id})
 
-    # Bu chat_id için takip edilen işleri iptal et
-    if chat_id in WATCHED_COURSES:
-        for program_code, crn in WATCHED_COURSES[chat_id]:
-            job_name = f"{chat_id}_{program_code}_{crn}"
-            jobs = context.application.job_queue.get_jobs_by_name(job_name)
-            for j in jobs:
-                j.schedule_removal()
-        del WATCHED_COURSES[chat_id]
+    # Bu chat_id için takip edilen dersleri iptal et (ortak poller bir sonraki turda atlar)
+    if WATCHES.remove_chat(chat_id):
+        WATCH_STORE.remove_chat(chat_id)
 
     stop_message = (
         f"🛑 *Bot Durduruldu!*\n\n"
@@ -678,7 +3708,7 @@ async def stop_command(update, context: ContextTypes.DEFAULT_TYPE):
     )
 
     await update.message.reply_text(stop_message, parse_mode='Markdown')
-    print(f"✅ Bot {chat_id} için durduruldu")
+    logger.info("✅ Bot %s için durduruldu", chat_id, extra={'chat_id': chat_id})
 
 
 async def cancel_command(update, context: ContextTypes.DEFAULT_TYPE):
@@ -686,21 +3716,15 @@ async def cancel_command(update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     user = update.effective_user
 
-    print(f"❌ /cancel - Kullanıcı: {user.first_name} (@{user.username}) - Chat ID: {chat_id}")
+    logger.info("❌ /cancel - Kullanıcı: %s (@%s) - Chat ID: %s", user.first_name, user.username, chat_id,
+                extra={'chat_id': chat_id})
 
-    if chat_id in WATCHED_COURSES and WATCHED_COURSES[chat_id]:
-        ders_listesi = [f"`{program_code}_{crn}`" for program_code, crn in WATCHED_COURSES[chat_id]]
+    # Takip listesini temizle (ortak poller bir sonraki turda atlar)
+    removed = WATCHES.remove_chat(chat_id)
+    if removed:
+        ders_listesi = [f"`{program_code}_{crn}`" for program_code, crn in removed]
         ders_text = ", ".join(ders_listesi)
-
-        # ✅ JobQueue’dan da sil
-        for program_code, crn in WATCHED_COURSES[chat_id]:
-            job_name = f"{chat_id}_{program_code}_{crn}"
-            jobs = context.application.job_queue.get_jobs_by_name(job_name)
-            for j in jobs:
-                j.schedule_removal()
-
-        # Takip listesini temizle
-        del WATCHED_COURSES[chat_id]
+        WATCH_STORE.remove_chat(chat_id)
 
         cancel_message = (
             f"❌ *Takibler İptal Edildi!*\n\n"
@@ -718,7 +3742,7 @@ async def cancel_command(update, context: ContextTypes.DEFAULT_TYPE):
         )
 
     await update.message.reply_text(cancel_message, parse_mode='Markdown')
-    print(f"✅ {chat_id} için takibler iptal edildi")
+    logger.info("✅ %s için takibler iptal edildi", chat_id, extra={'chat_id': chat_id})
 
 
 async def status_command(update, context: ContextTypes.DEFAULT_TYPE):
@@ -726,20 +3750,22 @@ async def status_command(update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     user = update.effective_user
 
-    print(f"📊 /status - Kullanıcı: {user.first_name} (@{user.username}) - Chat ID: {chat_id}")
+    logger.info("📊 /status - Kullanıcı: %s (@%s) - Chat ID: %s", user.first_name, user.username, chat_id,
+                extra={'chat_id': chat_id})
 
-    if chat_id in WATCHED_COURSES and WATCHED_COURSES[chat_id]:
+    courses = WATCHES.watches(chat_id)
+    if courses:
         ders_listesi = []
-        for program_code, crn in WATCHED_COURSES[chat_id]:
+        for program_code, crn in courses:
             ders_listesi.append(f"`{program_code}_{crn}`")
 
         ders_text = "\n".join(ders_listesi)
-        count = len(WATCHED_COURSES[chat_id])
+        count = len(courses)
 
         status_message = (
             f"📊 *Takip Edilen Dersler*\n\n"
             f"📋 *Toplam: {count} ders*\n"
-            f"⏳ *Her dakika kontrol ediliyor*\n\n"
+            f"⏳ *Düzenli olarak kontrol ediliyor (yoğun programlar daha sık)*\n\n"
             f"📝 *Dersler:*\n"
             f"{ders_text}\n\n"
             f"❌ *İptal etmek için: /cancel*\n"
@@ -754,59 +3780,183 @@ async def status_command(update, context: ContextTypes.DEFAULT_TYPE):
         )
 
     await update.message.reply_text(status_message, parse_mode='Markdown')
-    print(f"✅ {chat_id} için durum gösterildi ({count if 'count' in locals() else 0} ders)")
+    logger.info("✅ %s için durum gösterildi (%s ders)", chat_id, count if 'count' in locals() else 0,
+                extra={'chat_id': chat_id})
 
 
-def create_health_server():
-    app = Flask(__name__)
+# === Durum Endpoint'leri (Flask thread'i ve webhook sunucusu ortak kullanır) ===
+def health_status():
+    return {
+        "status": "healthy",
+        "service": "İTÜ Ders Bot",
+        "uptime_seconds": round(time.monotonic() - PROCESS_STARTED_AT),
+        "active_watches": len(WATCHES),
+    }
 
-    @app.route('/')
-    def health():
-        return jsonify({
-            "status": "healthy",
-            "service": "İTÜ Ders Bot",
-            "uptime": "100%"
-        })
 
-    @app.route('/health')
-    def health_check():
-        return jsonify({"status": "ok"})
+def scheduler_status():
+    # Her programın seçilen kontrol aralığı ve son değişim oranı
+    schedules = dict(PROGRAM_SCHEDULES)
+    return {
+        "programs": {code: schedule.to_dict() for code, schedule in sorted(schedules.items())},
+        "min_interval": POLL_MIN_INTERVAL,
+        "max_interval": POLL_MAX_INTERVAL,
+        "events": SEAT_EVENTS.stats(),
+        "role": BOT_ROLE,
+        "leases": PROGRAM_LEASES.stats() if PROGRAM_LEASES.conn is not None else None,
+    }
 
-    port = int(os.environ.get('PORT', '8080'))
-    print(f"🌐 Health server port: {port}")
 
-    app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
+def obs_status():
+    # OBS istek bütçesi: öncelik sınıflarına göre kuyruk derinliği ve bekleme süreleri
+    return {
+        "rate_limiter": OBS_RATE_LIMITER.stats(),
+        "cache": SNAPSHOT_CACHE.stats(),
+        "parse_pool": PARSE_POOL.stats(),
+        "breakers": {breaker.name: breaker.stats() for breaker in list(OBS_BREAKERS.values())},
+        "hedge": {
+            "enabled": OBS_HEDGE,
+            "delay": round(hedge_delay(), 3),
+            "samples": len(OBS_INTERACTIVE_LATENCY.samples),
+            **OBS_HEDGE_STATS,
+        },
+    }
 
 
+def notification_status():
+    # Giden bildirim kuyruğu: bekleyenler, birleştirmeler ve teslim gecikmesi
+    return NOTIFIER.stats()
 
 
+def catalog_status():
+    # Katalog indeksi: taranan programlar, şube sayısı ve tarama sayaçları
+    return CATALOG.stats()
 
-def main():
-    """Ana fonksiyon - KONTENJAN TAKİP MODU"""
-    global WATCHED_COURSES, LAST_REQUEST_TIME
-    WATCHED_COURSES = {}
-    LAST_REQUEST_TIME = {}
-
-    print("🤖 İTÜ DERS KONTENJAN BOTU v3.1 - DAKİKALIK KONTENJAN TAKİP")
-    print("=" * 75)
-    print(f"📂 Toplam {len(PROGRAM_KODLARI)} program kodu yüklendi")
-    print(f"🔗 1. Kutucuk: Lisans (LS) - SABİT")
-    print(f"🔗 2. Kutucuk: Kullanıcı girdisi -> OBS ID")
-    print(f"   📋 Örnek: END -> {PROGRAM_KODLARI.get('END', 'YOK')}")
-    print(f"   📋 Örnek: TUR -> {PROGRAM_KODLARI.get('TUR', 'YOK')}")
-    print(f"   📋 Örnek: KIM -> {PROGRAM_KODLARI.get('KIM', 'YOK')}")
-    print(f"   📋 Örnek: BHB -> {PROGRAM_KODLARI.get('BHB', 'YOK')}")
-    print(f"📊 Kolonlar: [0]CRN [1]Kod [2]Ad [6]Gün [7]Saat [9]KONTENJAN [10]YAZILAN")
-    print(f"⏳ TAKİP: Kontenjan yok → Mesaj | Açılınca → Detaylı bildirim (HER DAKİKA)")
-    print(f"🚨 KOMUTLAR: /stop - Durdur | /cancel - İptal | /status - Durum")
-    print("=" * 75)
-
-    app = (
+
+def tracing_status():
+    # Span dışa aktarımı ve profiler durumu
+    return {
+        "enabled": bool(TRACE_EXPORT_PATH),
+        "export_path": TRACE_EXPORT_PATH or None,
+        "sample_rate": TRACE_SAMPLE_RATE,
+        "pending": len(FINISHED_SPANS),
+        **TRACE_STATS,
+        "profiler": bool(ADMIN_TOKEN),
+        "profiling": PROFILER.lock.locked(),
+    }
+
+
+STATUS_ROUTES = {
+    '/health': health_status,
+    '/scheduler': scheduler_status,
+    '/obs': obs_status,
+    '/notifications': notification_status,
+    '/catalog': catalog_status,
+    '/tracing': tracing_status,
+}
+
+
+def create_health_server(port):
+    """Polling modunda sağlık/durum endpoint'leri (Flask, ayrı thread'de)"""
+    # Flask sadece bu thread'de yüklenir; bot açılışını bekletmez
+    from flask import Flask, jsonify, request
+
+    def profile():
+        token = request.headers.get('X-Admin-Token')
+        status, body = profile_request(token, request.args.get('seconds'))
+        return body, status, {'Content-Type': 'text/plain; charset=utf-8'}
+
+    app_flask = Flask(__name__)
+    app_flask.add_url_rule('/', 'root', lambda: ("OK", 200))  # ← Root için hızlı text
+    app_flask.add_url_rule('/metrics', 'metrics', lambda: (render_metrics(), 200, {'Content-Type': METRICS_CONTENT_TYPE}))
+    for path, handler in STATUS_ROUTES.items():
+        app_flask.add_url_rule(path, handler.__name__, lambda handler=handler: jsonify(handler()))
+    # Yönetici: /profile?seconds=N (X-Admin-Token başlığıyla) - folded yığınlar (Flask thread'i örnekleme süresince bekler)
+    app_flask.add_url_rule('/profile', 'profile', profile)
+
+    logger.info("🌐 Health server port: %s", port)
+    app_flask.run(host='0.0.0.0', port=port, debug=False, threaded=True)
+
+
+async def start_webhook_server(application):
+    """Telegram güncellemelerini ve durum endpoint'lerini tek asyncio sunucusunda sun (aiohttp)
+
+    Dönüş: aiohttp AppRunner - kapanışta cleanup() çağrılır.
+    """
+    from aiohttp import web
+
+    expected_secret = WEBHOOK_SECRET.encode('utf-8') if WEBHOOK_SECRET else None
+
+    async def receive_update(request):
+        # Sabit süreli karşılaştırma: yanıt süresinden gizli anahtar tahmin edilemesin
+        if expected_secret is not None:
+            received = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '').encode('utf-8', 'surrogateescape')
+            if not hmac.compare_digest(received, expected_secret):
+                return web.Response(status=403)
+        try:
+            update = Update.de_json(await request.json(), application.bot)
+        except Exception as e:
+            logger.warning("⚠️  Geçersiz webhook isteği: %s", e)
+            return web.Response(status=400)
+        # Handler'lar application'ın kendi kuyruğunda çalışır; Telegram'a hemen 200 dönülür
+        await application.update_queue.put(update)
+        return web.Response()
+
+    async def root(request):
+        return web.Response(text="OK")
+
+    async def metrics(request):
+        return web.Response(body=render_metrics().encode('utf-8'), headers={'Content-Type': METRICS_CONTENT_TYPE})
+
+    def status_route(handler):
+        async def handle(request):
+            return web.json_response(handler())
+        return handle
+
+    async def profile(request):
+        # Örnekleme ayrı thread'de; event loop (profillenen şey) bu sürede çalışmaya devam eder
+        token = request.headers.get('X-Admin-Token')
+        status, body = await asyncio.get_running_loop().run_in_executor(
+            None, profile_request, token, request.query.get('seconds'))
+        return web.Response(status=status, text=body)
+
+    web_app = web.Application()
+    web_app.router.add_post(WEBHOOK_PATH, receive_update)
+    web_app.router.add_get('/', root)
+    web_app.router.add_get('/metrics', metrics)
+    for path, handler in STATUS_ROUTES.items():
+        web_app.router.add_get(path, status_route(handler))
+    web_app.router.add_get('/profile', profile)
+
+    port = int(os.environ.get('PORT', '8080'))
+    runner = web.AppRunner(web_app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, '0.0.0.0', port).start()
+    logger.info("🪝 Webhook sunucusu port %s, yol %s", port, WEBHOOK_PATH)
+    return runner
+
+
+def build_application(base_url=None, role=None):
+    """Handler'ları ve periyodik işleri kurulmuş Telegram Application'ı oluştur
+
+    base_url verilirse (ya da TELEGRAM_API_BASE_URL) Bot API istekleri oraya gider.
+    role (varsayılan BOT_ROLE): 'frontend' poller kurmaz, 'worker' sadece lease'li programları kontrol eder.
+    """
+    base_url = base_url or TELEGRAM_API_BASE_URL
+    role = role or BOT_ROLE
+    builder = (
         ApplicationBuilder()
         .token(API_KEY)
         .job_queue(JobQueue())   # <-- BUNU EKLİYORSUN
-        .build()
     )
+    if base_url:
+        base_url = base_url.rstrip('/')
+        builder = builder.base_url(f"{base_url}/bot").base_file_url(f"{base_url}/file/bot")
+    if TRACE_EXPORT_PATH:
+        # Bot API çağrıları da span olur (PTB'nin varsayılan havuz boyutuyla)
+        builder = builder.request(TracedHTTPXRequest(connection_pool_size=256))
+    app = builder.build()
+    app.bot_data['role'] = role  # run_application güncelleme modunu buna göre seçer
 
     # Mevcut handler'lara ekleyin
     app.add_handler(CommandHandler("start", start_command))
@@ -814,66 +3964,200 @@ def main():
     app.add_handler(CommandHandler("stop", stop_command))  # YENİ
     app.add_handler(CommandHandler("cancel", cancel_command))  # YENİ
     app.add_handler(CommandHandler("status", status_command))  # YENİ
+    app.add_handler(CommandHandler("open", open_command))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
     app.add_error_handler(error_handler)
 
-    print("✅ Bot başarıyla başlatıldı! (Dakikalık Kontenjan Takip Modu)")
-    print("📱 Telegram'da test edin:")
-    print("   • /start - Botu başlat")
-    print("   • /stop - Botu durdur")
-    print("   • /cancel - Takibi iptal et")
-    print("   • /status - Takip edilen dersleri göster")
-    print("   • END_12345 - Test")
-    print("   • BHB_15079 - Test (35/9 → bildirim YOK)")
-    print("   • BHB_15081 - Test (30/0 → takip mesajı)")
-    print("   • /help - Detaylı yardım")
-    print("⏹️  PyCharm'da durdurmak için: Ctrl+C")
-    print("=" * 75)
-
-    # Health server (arka planda)
-    def create_health_server():
-        app_flask = Flask(__name__)
-
-        @app_flask.route('/')
-        @app_flask.route('/health')
-        def health_check():
-            if request.path == '/':
-                return "OK", 200  # ← Root için hızlı text
-            return jsonify({
-                "status": "healthy",
-                "service": "İTÜ Ders Bot",
-                "uptime": "100%"
-            })
-
-        port = int(os.environ.get('PORT', '8080'))
-        print(f"🌐 Health server port: {port}")
-        app_flask.run(host='0.0.0.0', port=port, debug=False, threaded=True)
-
-    # Server thread başlat
-    # Health server thread başlat
-    server_thread = threading.Thread(target=create_health_server, daemon=True)
-    server_thread.start()
-    time.sleep(5)  # Sağlık kontrol server'ı hazır olsun
-    print("🌐 Health server aktif - Bot başlıyor")
-    async def run_bot():
-        await app.initialize()
-        await app.start()
+    # Tüm takipler için tek ortak zamanlayıcı (program başına tek OBS sorgusu, uyarlamalı aralık)
+    if role != 'frontend':
+        app.job_queue.run_repeating(
+            poll_watched_programs,
+            interval=POLL_TICK,
+            first=POLL_TICK,
+            name=POLLER_JOB_NAME
+        )
+    # Çok süreçli modda takipler SQLite üzerinden paylaşılır, programlar worker'lara lease ile dağılır
+    if role != 'all':
+        app.job_queue.run_repeating(
+            sync_shared_watches,
+            interval=WATCH_SYNC_INTERVAL,
+            first=WATCH_SYNC_INTERVAL,
+            name="watch_sync"
+        )
+    if role == 'worker':
+        app.job_queue.run_repeating(
+            sync_program_leases,
+            interval=LEASE_RENEW_INTERVAL,
+            first=LEASE_RENEW_INTERVAL,
+            name="program_leases"
+        )
+    # Takip deposuna bekleyen yazmaları topluca aktar
+    app.job_queue.run_repeating(
+        flush_watch_store,
+        interval=WATCH_FLUSH_INTERVAL,
+        first=WATCH_FLUSH_INTERVAL,
+        name="watch_store_flush"
+    )
+    # Program kodları: önbellek/manuel liste anında yüklenir, OBS'ten arka planda yenilenir.
+    # Yenileme (ve önbellek dosyasına yazma) tek yerde, frontend'de yapılır; worker'lar önbelleği okur
+    refresh_in = load_startup_program_codes()
+    if role != 'worker':
+        app.job_queue.run_repeating(
+            refresh_program_codes,
+            interval=PROGRAM_CODES_TTL,
+            first=max(1.0, refresh_in),
+            name="program_codes_refresh"
+        )
+    # Katalog modu: tüm programlar arka planda, program program taranır (sorguları /open yanıtlar)
+    if CATALOG_MODE and role != 'worker':
+        app.job_queue.run_repeating(
+            crawl_catalog,
+            interval=CATALOG_TICK,
+            first=CATALOG_TICK,
+            name="catalog_crawler"
+        )
+    # Boşta kalan OBS bağlantı havuzunu sıcak tut (worker'lar sürekli sorguladığı için gerekmez)
+    if role != 'worker':
+        app.job_queue.run_repeating(
+            warm_obs_connections,
+            interval=OBS_WARM_INTERVAL,
+            first=OBS_WARM_INTERVAL,
+            name="obs_warmer"
+        )
+    if TRACE_EXPORT_PATH:
+        app.job_queue.run_repeating(
+            flush_traces,
+            interval=TRACE_FLUSH_INTERVAL,
+            first=TRACE_FLUSH_INTERVAL,
+            name="trace_flush"
+        )
+    return app
+
+
+async def run_application(app, mode=None):
+    """Bot'u başlat ve kapanana kadar çalıştır (polling ya da webhook; worker güncelleme almaz)"""
+    mode = mode or UPDATE_MODE
+    if app.bot_data.get('role', BOT_ROLE) == 'worker':
+        mode = 'worker'
+    startup_start = time.monotonic()
+    logger.info("📂 Toplam %s program kodu hazır", len(PROGRAM_KODLARI))
+
+    # Kayıtlı takipleri tek seferde geri yükle; ortak poller ilk turda hepsini kontrol eder
+    load_start = time.monotonic()
+    await run_db(WATCH_STORE.open)
+    WATCHES.replace(await run_db(WATCH_STORE.load_all))
+    logger.info("💾 %s takip (%s sohbet) geri yüklendi (%.0f ms, %s)",
+                len(WATCHES), WATCHES.chat_count(), (time.monotonic() - load_start) * 1000, WATCH_DB_PATH)
+
+    if mode == 'worker':
+        await run_db(PROGRAM_LEASES.open)
+        await run_db(PROGRAM_LEASES.sync)
+        logger.info("🧩 Worker %s: %s program lease'i alındı (%s canlı worker)",
+                    WORKER_ID, len(PROGRAM_LEASES.owned), PROGRAM_LEASES.live_workers)
+
+    await app.initialize()
+    await app.start()
+    NOTIFIER.start(app.bot)
+    PARSE_POOL.start()
+
+    runner = None
+    if mode == 'webhook':
+        runner = await start_webhook_server(app)
+        if WEBHOOK_URL:
+            await app.bot.set_webhook(
+                f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES
+            )
+            logger.info("🪝 Webhook Telegram'a kaydedildi: %s%s", WEBHOOK_URL.rstrip('/'), WEBHOOK_PATH)
+        else:
+            logger.warning("⚠️  WEBHOOK_URL yok - webhook Telegram'a kaydedilmedi (yerel test)")
+    elif mode != 'worker':
+        # getUpdates tek tüketici ister; worker güncelleme almaz, sadece bildirim gönderir
         await app.updater.start_polling()  # ← POLLING BAŞLAT!
-    
-        print("🤖 Bot aktif ve çalışıyor...")
+
+    logger.info("🤖 Bot aktif ve çalışıyor... (%s, açılış %.2f sn)", mode, time.monotonic() - startup_start)
+    try:
         await asyncio.Event().wait()
-    
-    asyncio.run(run_bot())
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+        if app.updater.running:
+            await app.updater.stop()
+        # app.stop() create_task ile başlatılan görevleri bekler; OBS'i bekleyen kontroller iptal edilir
+        await cancel_program_polls(app)
+        await NOTIFIER.stop()
+        PARSE_POOL.stop()
+        await app.stop()
+        await app.shutdown()
+        if TRACE_EXPORT_PATH:
+            await flush_traces()
+        await run_db(WATCH_STORE.close)
+        await run_db(PROGRAM_LEASES.close)
+        await close_obs_client()
+
+
+def main():
+    """Ana fonksiyon - KONTENJAN TAKİP MODU"""
+    if not API_KEY:
+        logger.error("❌ TELEGRAM_TOKEN bulunamadı! Railway Variables'e ekleyin.")
+        exit(1)
+
+    # Konsol afişi sadece metin formatında; JSON log hattına tek bir yapılandırılmış olay gider
+    console = LOG_FORMAT == 'text'
+    if console:
+        print("🤖 İTÜ DERS KONTENJAN BOTU v3.1 - DAKİKALIK KONTENJAN TAKİP")
+        print("=" * 75)
+        print(f"🔗 1. Kutucuk: Lisans (LS) - SABİT")
+        print(f"🔗 2. Kutucuk: Kullanıcı girdisi -> OBS ID")
+        print(f"📊 Kolonlar: [0]CRN [1]Kod [2]Ad [6]Gün [7]Saat [9]KONTENJAN [10]YAZILAN")
+        print(f"⏳ TAKİP: Kontenjan yok → Mesaj | Açılınca → Detaylı bildirim (UYARLAMALI ARALIK)")
+        print(f"🔁 POLLER: Program sayfası tur başına bir kez çekilir ({POLL_MIN_INTERVAL:.0f}-{POLL_MAX_INTERVAL:.0f} sn, uyarlamalı)")
+        print(f"📡 GÜNCELLEME MODU: {UPDATE_MODE} | ROL: {BOT_ROLE}" + (f" ({WORKER_ID})" if BOT_ROLE == 'worker' else ""))
+        print(f"🚨 KOMUTLAR: /stop - Durdur | /cancel - İptal | /status - Durum")
+        print("=" * 75)
+
+    logger.info("🤖 Bot başlatılıyor (%s, rol: %s)", UPDATE_MODE, BOT_ROLE,
+                extra={'mode': UPDATE_MODE, 'role': BOT_ROLE, 'worker_id': WORKER_ID})
+
+    app = build_application()
+
+    if console:
+        print("✅ Bot başarıyla başlatıldı! (Dakikalık Kontenjan Takip Modu)")
+        print("📱 Telegram'da test edin:")
+        print("   • /start - Botu başlat")
+        print("   • /stop - Botu durdur")
+        print("   • /cancel - Takibi iptal et")
+        print("   • /status - Takip edilen dersleri göster")
+        print("   • END_12345 - Test")
+        print("   • BHB_15079 - Test (35/9 → bildirim YOK)")
+        print("   • BHB_15081 - Test (30/0 → takip mesajı)")
+        print("   • /help - Detaylı yardım")
+        print("⏹️  PyCharm'da durdurmak için: Ctrl+C")
+        print("=" * 75)
+
+    # Webhook modunda sağlık endpoint'leri aynı asyncio sunucusunda; Flask thread'i gerekmez.
+    # Worker'lar frontend'in PORT'unu kullanmaz: sadece WORKER_HEALTH_PORT verilmişse sunucu açar
+    if BOT_ROLE == 'worker':
+        health_port = WORKER_HEALTH_PORT
+    else:
+        health_port = os.environ.get('PORT', '8080') if UPDATE_MODE != 'webhook' else None
+    if health_port:
+        # Health server thread başlat (hazır olması beklenmez; bot paralel başlar)
+        server_thread = threading.Thread(target=create_health_server, args=(int(health_port),), daemon=True)
+        server_thread.start()
+        logger.info("🌐 Health server başlatılıyor - Bot başlıyor")
+
+    asyncio.run(run_application(app))
 
 
 if __name__ == "__main__":
     try:
         main()
     except KeyboardInterrupt:
-        print("\n👋 Bot kullanıcı tarafından durduruldu (Ctrl+C)")
+        logger.info("👋 Bot kullanıcı tarafından durduruldu (Ctrl+C)")
     except Exception as e:
-        print(f"\n💥 Kritik hata: {e}")
-        print(f"   Hata tipi: {type(e)}")
+        logger.exception("💥 Kritik hata: %s", e)
         # Railway'de input() çalışmaz, sessiz kal
-        print("🔄 Railway ortamı algılandı, input beklenmiyor.")
+        logger.info("🔄 Railway ortamı algılandı, input beklenmiyor.")
 
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# bot.py import sırasında TELEGRAM_TOKEN okur; testler gerçek token olmadan çalışır
+os.environ.setdefault('TELEGRAM_TOKEN', 'test')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
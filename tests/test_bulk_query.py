@@ -0,0 +1,43 @@
+import pytest
+
+import bot
+from bot import parse_bulk_query
+
+
+@pytest.fixture(autouse=True)
+def program_codes(monkeypatch):
+    monkeypatch.setattr(bot, 'PROGRAM_KODLARI', {'BLG': '3', 'END': '15', 'MAT': '26'})
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("END_12345 BLG_20001", [("END", "12345"), ("BLG", "20001")]),
+    ("BLG 20001 20002, 20003", [("BLG", "20001"), ("BLG", "20002"), ("BLG", "20003")]),
+    ("BLG_20001 20002", [("BLG", "20001"), ("BLG", "20002")]),
+    ("BLG: 20001; MAT 30001", [("BLG", "20001"), ("MAT", "30001")]),
+    ("blg_20001\nend_12345", [("BLG", "20001"), ("END", "12345")]),
+    ("BLG_20001 BLG 20001", [("BLG", "20001")]),
+])
+def test_accepted_formats(text, expected):
+    assert parse_bulk_query(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "merhaba",
+    "20001",  # program kodu yok
+    "BLG_ABC",
+    "BLG 20001 selam",
+    "BLG",
+])
+def test_unrecognized_text_is_rejected(text):
+    assert parse_bulk_query(text) is None
+
+
+@pytest.mark.parametrize("text", [
+    "SEN 3 kez",  # bilinmeyen kod: tekli sorgu yolunda format hatası alır
+    "XYZ_12345",
+    "BLG 123",  # 5 haneli olmayan CRN
+    "BLG_123456",
+])
+def test_unknown_codes_and_short_crns_are_rejected(text):
+    assert parse_bulk_query(text) is None
@@ -0,0 +1,103 @@
+import pytest
+
+import bot
+from bot import BREAKER_CLOSED, BREAKER_HALF_OPEN, BREAKER_OPEN, CircuitBreaker, ObsCircuitOpen
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(bot.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def make_breaker():
+    return CircuitBreaker('/test', failure_threshold=3, slow_seconds=5, open_seconds=30, max_open_seconds=100)
+
+
+def trip(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.before_request()
+        breaker.record_failure()
+
+
+def test_closed_until_threshold(clock):
+    breaker = make_breaker()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == BREAKER_CLOSED
+    # Başarı ardışık hata sayacını sıfırlar
+    breaker.record_success(0.1)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == BREAKER_CLOSED
+    breaker.record_failure()
+    assert breaker.state == BREAKER_OPEN
+
+
+def test_slow_response_counts_as_failure(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_success(6.0)
+    assert breaker.state == BREAKER_OPEN
+
+
+def test_open_half_open_closed(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    assert breaker.state == BREAKER_OPEN
+
+    # Bekleme dolmadan istekler reddedilir
+    clock[0] += 10
+    with pytest.raises(ObsCircuitOpen):
+        breaker.before_request()
+    assert breaker.rejected == 1
+    assert breaker.retry_in() == 20
+
+    # Bekleme dolunca tek deneme isteği geçer, diğerleri reddedilir
+    clock[0] += 20
+    breaker.before_request()
+    assert breaker.state == BREAKER_HALF_OPEN
+    with pytest.raises(ObsCircuitOpen):
+        breaker.before_request()
+
+    breaker.record_success(0.1)
+    assert breaker.state == BREAKER_CLOSED
+    assert breaker.failures == 0
+    breaker.before_request()
+
+
+def test_failed_probe_reopens_with_doubled_wait(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock[0] += 30
+    breaker.before_request()
+    breaker.record_failure()
+
+    assert breaker.state == BREAKER_OPEN
+    assert breaker.open_seconds == 60
+    assert breaker.trips == 2
+    clock[0] += 30
+    with pytest.raises(ObsCircuitOpen):
+        breaker.before_request()
+
+    # Bekleme max_open_seconds ile sınırlı; başarılı deneme bekleme süresini sıfırlar
+    clock[0] += 30
+    breaker.before_request()
+    breaker.record_failure()
+    assert breaker.open_seconds == 100
+    clock[0] += 100
+    breaker.before_request()
+    breaker.record_success(0.1)
+    assert breaker.state == BREAKER_CLOSED
+    assert breaker.open_seconds == 30
+
+
+def test_cancelled_probe_lets_next_request_probe(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock[0] += 30
+    breaker.before_request()
+    breaker.record_cancelled()
+    breaker.before_request()
+    assert breaker.state == BREAKER_HALF_OPEN
@@ -0,0 +1,103 @@
+import asyncio
+
+from telegram.error import Forbidden, NetworkError, RetryAfter
+
+import bot
+from bot import NotificationQueue
+
+
+class FakeBot:
+    """send_message çağrılarını kaydeder; `errors` sırayla fırlatılır"""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.sent = []
+        self.calls = 0
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.calls += 1
+        if self.errors:
+            error = self.errors.pop(0)
+            if error is not None:
+                raise error
+        self.sent.append((chat_id, text))
+
+
+def deliver(notifications, fake_bot, chat_interval=0.01, timeout=2.0):
+    """Bildirimleri kuyruğa koy, hepsi işlenene kadar kuyruğu çalıştır"""
+    queue = NotificationQueue(global_rate=1000, chat_interval=chat_interval, workers=2)
+
+    async def scenario():
+        for chat_id, text in notifications:
+            queue.enqueue(chat_id, text)
+        queue.start(fake_bot)
+        deadline = asyncio.get_running_loop().time() + timeout
+        while queue.scheduled and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.005)
+        await queue.stop()
+
+    asyncio.run(scenario())
+    return queue
+
+
+def test_pending_notifications_for_a_chat_are_merged():
+    fake_bot = FakeBot()
+    queue = deliver([(1, "a"), (1, "b"), (1, "c")], fake_bot)
+
+    assert fake_bot.sent == [(1, NotificationQueue.SEPARATOR.join(["a", "b", "c"]))]
+    stats = queue.stats()
+    assert (stats['delivered'], stats['messages_sent'], stats['merged']) == (3, 1, 2)
+    assert stats['queued_chats'] == 0
+
+
+def test_chats_are_sent_separately():
+    fake_bot = FakeBot()
+    deliver([(1, "a"), (2, "b")], fake_bot)
+
+    assert sorted(fake_bot.sent) == [(1, "a"), (2, "b")]
+
+
+def test_batches_respect_message_length():
+    fake_bot = FakeBot()
+    long_text = "x" * (bot.TELEGRAM_MAX_MESSAGE_LENGTH // 2)
+    queue = deliver([(1, long_text), (1, long_text), (1, "son")], fake_bot)
+
+    assert len(fake_bot.sent) == 2
+    assert all(len(text) <= bot.TELEGRAM_MAX_MESSAGE_LENGTH for _, text in fake_bot.sent)
+    assert queue.delivered == 3
+
+
+def test_retry_after_pauses_and_resends():
+    fake_bot = FakeBot(errors=[RetryAfter(0.05)])
+    queue = deliver([(1, "a")], fake_bot)
+
+    assert fake_bot.calls == 2
+    assert fake_bot.sent == [(1, "a")]
+    assert queue.retries == 1
+    assert queue.failed == 0
+
+
+def test_network_errors_are_retried_then_dropped():
+    fake_bot = FakeBot(errors=[NetworkError("bağlantı koptu")] * bot.TELEGRAM_SEND_ATTEMPTS)
+    queue = deliver([(1, "a")], fake_bot)
+
+    assert fake_bot.calls == bot.TELEGRAM_SEND_ATTEMPTS
+    assert fake_bot.sent == []
+    assert queue.failed == 1
+
+
+def test_network_error_then_success():
+    fake_bot = FakeBot(errors=[NetworkError("bağlantı koptu"), None])
+    queue = deliver([(1, "a")], fake_bot)
+
+    assert fake_bot.sent == [(1, "a")]
+    assert (queue.retries, queue.failed, queue.delivered) == (1, 0, 1)
+
+
+def test_telegram_error_is_not_retried():
+    fake_bot = FakeBot(errors=[Forbidden("bot engellendi")])
+    queue = deliver([(1, "a"), (1, "b")], fake_bot)
+
+    assert fake_bot.calls == 1
+    assert queue.failed == 2
+    assert queue.pending == {}
@@ -0,0 +1,163 @@
+import asyncio
+
+import pytest
+
+import bot
+from bot import PRIORITY_INTERACTIVE, ParsePool, parse_program_table
+
+
+def worker_setup_state():
+    """Havuz işçisinde çalışır: import sırasındaki süreç başına kurulum atlanmış mı?"""
+    return bot.IS_PARSE_WORKER, bot.LOG_LISTENER is None
+
+
+def program_page(row_count):
+    header = ''.join(f'<th>{h}</th>' for h in (
+        'CRN', 'Ders Kodu', 'Ders Adı', 'Öğretim Yöntemi', 'Eğitmen', 'Bina',
+        'Gün', 'Saat', 'Derslik', 'Kontenjan', 'Yazılan'))
+    rows = ''.join(
+        '<tr>' + ''.join(f'<td>{cell}</td>' for cell in (
+            10000 + i, 'BLG 101E', 'Bilgisayar', 'Yüz yüze', 'Ad Soyad', 'EEB',
+            'Pazartesi', '0830/1129', 'D101', 40, i % 41)) + '</tr>'
+        for i in range(row_count))
+    html = (f'<html><body><table id="dersProgramContainer"><thead><tr>{header}</tr></thead>'
+            f'<tbody>{rows}</tbody></table></body></html>')
+    return html.encode('utf-8')
+
+
+@pytest.fixture(scope='module')
+def started_pool():
+    """Tek işçili havuz; her sayfa havuza gider (işçi açılışı yavaş olduğu için modül başına bir kez)"""
+    pool = ParsePool(workers=1, inline_max_bytes=0, max_pending=1)
+    loop = asyncio.new_event_loop()
+
+    async def start():
+        pool.start()
+
+    loop.run_until_complete(start())
+    yield pool, loop
+    pool.stop()
+    loop.close()
+
+
+def test_pool_not_started_parses_inline():
+    pool = ParsePool(workers=2, inline_max_bytes=0, max_pending=2)
+    page = program_page(3)
+
+    rows = asyncio.run(pool.parse(page))
+
+    assert rows == parse_program_table(page)
+    assert (pool.inline, pool.offloaded) == (1, 0)
+
+
+def test_zero_workers_never_starts_pool():
+    pool = ParsePool(workers=0, inline_max_bytes=0, max_pending=2)
+
+    async def scenario():
+        pool.start()
+        return await pool.parse(program_page(3))
+
+    assert len(asyncio.run(scenario())) == 3
+    assert pool.executor is None
+
+
+def test_small_pages_stay_inline(started_pool):
+    pool, loop = started_pool
+    pool.inline_max_bytes = 10 * 1024
+    try:
+        rows = loop.run_until_complete(pool.parse(program_page(2)))
+    finally:
+        pool.inline_max_bytes = 0
+
+    assert len(rows) == 2
+    assert pool.offloaded == 0
+
+
+def test_pool_result_matches_inline(started_pool):
+    pool, loop = started_pool
+    page = program_page(500)
+    offloaded = pool.offloaded
+
+    rows = loop.run_until_complete(pool.parse(page))
+
+    assert rows == parse_program_table(page)
+    assert rows[0][bot.ROW_CRN] == '10000'
+    assert pool.offloaded == offloaded + 1
+
+
+def test_background_parses_wait_for_free_slot(started_pool):
+    pool, loop = started_pool
+    pages = [program_page(200 + i) for i in range(3)]
+    waited = pool.waited
+
+    async def scenario():
+        return await asyncio.gather(*(pool.parse(page) for page in pages))
+
+    results = loop.run_until_complete(scenario())
+
+    assert [len(rows) for rows in results] == [200, 201, 202]
+    # max_pending=1: ilk iş havuzdayken diğer ikisi yuva bekler
+    assert pool.waited == waited + 2
+    assert pool.pending == 0
+
+
+def test_interactive_parse_uses_pool(started_pool):
+    pool, loop = started_pool
+    offloaded = pool.offloaded
+
+    rows = loop.run_until_complete(pool.parse(program_page(50), priority=PRIORITY_INTERACTIVE))
+
+    assert len(rows) == 50
+    assert pool.offloaded == offloaded + 1
+
+
+def test_interactive_parse_falls_back_inline_when_pool_is_full(started_pool):
+    pool, loop = started_pool
+    page = program_page(100)
+    offloaded, inline, saturated = pool.offloaded, pool.inline, pool.saturated
+
+    async def scenario():
+        await pool.slots.acquire()  # havuz arka plan işleriyle dolu
+        try:
+            return await pool.parse(page, priority=PRIORITY_INTERACTIVE)
+        finally:
+            pool.slots.release()
+
+    rows = loop.run_until_complete(scenario())
+
+    assert rows == parse_program_table(page)
+    assert (pool.offloaded, pool.inline, pool.saturated) == (offloaded, inline + 1, saturated + 1)
+    assert pool.stats()['saturated'] == saturated + 1
+
+
+def test_pool_never_exceeds_max_pending(started_pool):
+    pool, loop = started_pool
+    pages = [program_page(150) for _ in range(4)]
+    peak = 0
+
+    async def watch():
+        nonlocal peak
+        while True:
+            peak = max(peak, pool.pending)
+            await asyncio.sleep(0)
+
+    async def scenario():
+        watcher = asyncio.ensure_future(watch())
+        parses = [pool.parse(page, priority=PRIORITY_INTERACTIVE if i % 2 else bot.PRIORITY_BACKGROUND)
+                  for i, page in enumerate(pages)]
+        results = await asyncio.gather(*parses)
+        watcher.cancel()
+        return results
+
+    results = loop.run_until_complete(scenario())
+
+    assert all(len(rows) == 150 for rows in results)
+    assert peak == pool.max_pending == 1
+
+
+def test_spawned_workers_skip_process_setup(started_pool):
+    pool, _ = started_pool
+
+    assert pool.executor.submit(worker_setup_state).result(timeout=60) == (True, True)
+    assert not bot.IS_PARSE_WORKER
+    assert bot.LOG_LISTENER is not None
@@ -0,0 +1,73 @@
+import pytest
+
+import bot
+from bot import ProgramSchedule
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(bot.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_new_program_is_due_immediately(clock):
+    schedule = ProgramSchedule()
+    assert schedule.next_due <= clock[0]
+    assert schedule.interval == bot.POLL_INTERVAL
+
+
+def test_quiet_program_slows_down_to_max(clock):
+    schedule = ProgramSchedule()
+    for _ in range(50):
+        schedule.record_success(False)
+
+    assert schedule.interval == bot.POLL_MAX_INTERVAL
+    assert schedule.next_due == clock[0] + bot.POLL_MAX_INTERVAL
+    assert schedule.change_rate == 0
+
+
+def test_changing_program_speeds_up_to_min(clock):
+    schedule = ProgramSchedule()
+    for _ in range(19):
+        schedule.record_success(True)
+
+    assert schedule.interval == bot.POLL_MIN_INTERVAL
+    assert schedule.changes == 19
+    assert schedule.change_rate > 0.9
+
+
+def test_single_change_halves_interval(clock):
+    schedule = ProgramSchedule()
+    before = schedule.interval
+    schedule.record_success(True)
+
+    assert schedule.interval == pytest.approx(before * bot.POLL_SPEEDUP_FACTOR)
+    assert schedule.change_rate == pytest.approx(bot.CHURN_EWMA_ALPHA)
+
+
+def test_errors_back_off_with_jitter_and_cap(clock, monkeypatch):
+    # Jitter'ın üst sınırını gözlemle
+    monkeypatch.setattr(bot.random, 'uniform', lambda low, high: high)
+    schedule = ProgramSchedule()
+    interval = schedule.interval
+
+    schedule.record_error()
+    assert schedule.next_due == clock[0] + interval * 2
+    schedule.record_error()
+    assert schedule.next_due == clock[0] + interval * 4
+    for _ in range(10):
+        schedule.record_error()
+    assert schedule.next_due == clock[0] + bot.POLL_ERROR_BACKOFF_MAX
+    # Hata aralığı değiştirmez; başarı sayacı sıfırlar
+    assert schedule.interval == interval
+    schedule.record_success(False)
+    assert schedule.errors == 0
+
+
+def test_error_backoff_never_earlier_than_interval(clock, monkeypatch):
+    monkeypatch.setattr(bot.random, 'uniform', lambda low, high: low)
+    schedule = ProgramSchedule()
+    schedule.record_error()
+
+    assert schedule.next_due == clock[0] + schedule.interval
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+import bot
+
+CODES = {f"K{i:02d}": str(i) for i in range(20)}
+
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    path = tmp_path / "program_codes.json"
+    monkeypatch.setattr(bot, 'PROGRAM_CODES_CACHE_PATH', str(path))
+    monkeypatch.setattr(bot, 'PROGRAM_KODLARI', {})
+    return path
+
+
+def write_cache(path, codes, fetched_at):
+    path.write_text(json.dumps({"fetched_at": fetched_at, "codes": codes}), encoding='utf-8')
+
+
+def fake_fetch(monkeypatch, result):
+    async def load_program_codes():
+        return result
+    monkeypatch.setattr(bot, 'load_program_codes', load_program_codes)
+
+
+def test_save_and_load_roundtrip(cache_path):
+    bot.save_program_codes(CODES)
+    codes, age = bot.load_cached_program_codes()
+
+    assert codes == CODES
+    assert 0 <= age < 5
+    assert not cache_path.with_name(cache_path.name + ".tmp").exists()
+
+
+@pytest.mark.parametrize("content", [
+    "{bozuk json",
+    json.dumps({"codes": CODES}),  # fetched_at yok
+    json.dumps({"fetched_at": "dün", "codes": CODES}),
+    json.dumps({"fetched_at": 0, "codes": ["BLG", "MAT"]}),
+    json.dumps({"fetched_at": 0, "codes": {"BLG": "3"}}),  # şüpheli derecede az kod
+])
+def test_corrupt_cache_is_ignored(cache_path, content):
+    cache_path.write_text(content, encoding='utf-8')
+
+    assert bot.load_cached_program_codes() == (None, None)
+
+
+def test_missing_cache_is_ignored(cache_path):
+    assert bot.load_cached_program_codes() == (None, None)
+
+
+def test_startup_uses_fresh_cache_until_ttl(cache_path):
+    write_cache(cache_path, CODES, time.time() - 3600)
+
+    refresh_in = bot.load_startup_program_codes()
+
+    assert bot.PROGRAM_KODLARI == CODES
+    assert refresh_in == pytest.approx(bot.PROGRAM_CODES_TTL - 3600, abs=5)
+
+
+def test_startup_with_expired_cache_refreshes_now(cache_path):
+    write_cache(cache_path, CODES, time.time() - bot.PROGRAM_CODES_TTL - 60)
+
+    assert bot.load_startup_program_codes() == 0
+    # Süresi dolmuş önbellek yine de yenilemeye kadar kullanılır
+    assert bot.PROGRAM_KODLARI == CODES
+
+
+def test_startup_cache_replaces_current_codes(cache_path):
+    bot.PROGRAM_KODLARI['ESKI'] = '999'
+    write_cache(cache_path, CODES, time.time())
+
+    bot.load_startup_program_codes()
+
+    assert bot.PROGRAM_KODLARI == CODES
+
+
+@pytest.mark.parametrize("content", ["{bozuk json", json.dumps({"fetched_at": time.time(), "codes": {}})])
+def test_startup_falls_back_to_manual_list_on_corrupt_cache(cache_path, content):
+    cache_path.write_text(content, encoding='utf-8')
+
+    assert bot.load_startup_program_codes() == 0
+    assert bot.PROGRAM_KODLARI == bot.get_manual_program_list()
+
+
+def test_startup_without_cache_uses_manual_list(cache_path):
+    assert bot.load_startup_program_codes() == 0
+    assert bot.PROGRAM_KODLARI == bot.get_manual_program_list()
+
+
+def test_refresh_stores_fetched_codes(cache_path, monkeypatch):
+    fake_fetch(monkeypatch, CODES)
+
+    asyncio.run(bot.refresh_program_codes())
+
+    assert bot.PROGRAM_KODLARI == CODES
+    assert bot.load_cached_program_codes()[0] == CODES
+
+
+def test_refresh_drops_codes_removed_from_obs(cache_path, monkeypatch):
+    bot.load_startup_program_codes()  # önbellek yok: manuel liste
+    assert 'BLG' in bot.PROGRAM_KODLARI
+    fake_fetch(monkeypatch, CODES)
+
+    asyncio.run(bot.refresh_program_codes())
+
+    assert bot.PROGRAM_KODLARI == CODES
+    assert 'BLG' not in bot.PROGRAM_KODLARI
+
+
+def test_failed_refresh_keeps_current_codes(cache_path, monkeypatch):
+    write_cache(cache_path, CODES, 0)
+    bot.PROGRAM_KODLARI.update(CODES)
+    fake_fetch(monkeypatch, None)
+
+    asyncio.run(bot.refresh_program_codes())
+
+    assert bot.PROGRAM_KODLARI == CODES
+    assert json.loads(cache_path.read_text(encoding='utf-8'))["fetched_at"] == 0
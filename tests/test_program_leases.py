@@ -0,0 +1,232 @@
+import asyncio
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import bot
+from bot import ProgramLeases, WatchStore
+
+PROGRAMS = [f"P{i}" for i in range(6)]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(bot.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "watches.db")
+    store = WatchStore(path)
+    store.open()
+    for index, program_code in enumerate(PROGRAMS):
+        store.add(index, program_code, "10001")
+    store.close()
+    return path
+
+
+def make_workers(path, count, ttl=30):
+    workers = []
+    for index in range(count):
+        leases = ProgramLeases(path, f"worker{index}", ttl)
+        leases.open()
+        workers.append(leases)
+    return workers
+
+
+def db_owners(path):
+    leases = ProgramLeases(path, "okuyucu", 30)
+    leases.open()
+    try:
+        return dict(leases.conn.execute("SELECT program_code, owner FROM program_leases"))
+    finally:
+        leases.conn.close()
+
+
+def test_single_worker_owns_everything(db_path, clock):
+    worker, = make_workers(db_path, 1)
+
+    assert worker.sync() == set(PROGRAMS)
+    assert worker.live_workers == 1
+
+
+def test_programs_are_split_fairly(db_path, clock):
+    first, second = make_workers(db_path, 2)
+    first.sync()
+    # İkinci worker katılınca birincisi payından fazlasını bırakır, ikincisi boşalanları alır
+    assert second.sync() == set()
+    first.sync()
+    second.sync()
+
+    assert len(first.owned) == len(second.owned) == 3
+    assert first.owned | second.owned == set(PROGRAMS)
+    assert not first.owned & second.owned
+
+
+def test_dead_worker_leases_are_taken_over(db_path, clock):
+    first, second = make_workers(db_path, 2)
+    for _ in range(2):
+        first.sync()
+        second.sync()
+    assert len(second.owned) == 3
+
+    # İkinci worker kalp atışı göndermeden öldü; TTL dolunca lease'leri devralınır
+    clock[0] += 10
+    first.sync()
+    assert len(first.owned) == 3
+    clock[0] += 25
+    assert first.sync() == set(PROGRAMS)
+    assert first.live_workers == 1
+    assert set(db_owners(db_path).values()) == {"worker0"}
+
+
+def test_closed_worker_releases_immediately(db_path, clock):
+    first, second = make_workers(db_path, 2)
+    for _ in range(2):
+        first.sync()
+        second.sync()
+
+    second.close()
+    assert first.sync() == set(PROGRAMS)
+
+
+def test_no_program_is_owned_twice(db_path, clock):
+    workers = make_workers(db_path, 3, ttl=30)
+    rng = random.Random(18)
+    for _ in range(200):
+        clock[0] += rng.uniform(0, 5)
+        rng.choice(workers).sync()
+        owned = [worker.owned for worker in workers]
+        for index, mine in enumerate(owned):
+            for other in owned[index + 1:]:
+                assert not mine & other
+
+    for worker in workers:
+        worker.sync()
+    assert set().union(*(worker.owned for worker in workers)) == set(PROGRAMS)
+    assert len(db_owners(db_path)) == len(PROGRAMS)
+
+
+def test_unwatched_program_lease_is_released(db_path, clock):
+    worker, = make_workers(db_path, 1)
+    worker.sync()
+
+    store = WatchStore(db_path)
+    store.open()
+    store.remove(0, "P0", "10001")
+    store.close()
+
+    assert worker.sync() == set(PROGRAMS) - {"P0"}
+    assert "P0" not in db_owners(db_path)
+
+
+def test_watch_changes_reach_other_process(db_path):
+    frontend, worker = WatchStore(db_path), WatchStore(db_path)
+    frontend.open()
+    worker.open()
+    worker.load_all()
+
+    frontend.add(99, "P9", "20001")
+    frontend.remove(0, "P0", "10001")
+    frontend.flush()
+
+    assert worker.load_changes() == [(True, 99, "P9", "20001"), (False, 0, "P0", "10001")]
+    assert worker.load_changes() == []
+
+    # Değişiklik kaydı budanırsa tam yüklemeye dönülür
+    frontend.add(100, "P9", "20002")
+    frontend.flush()
+    frontend.conn.execute("DELETE FROM watch_changes")
+    frontend.conn.commit()
+    frontend.add(101, "P9", "20003")
+    frontend.flush()
+    assert worker.load_changes() is None
+    frontend.close()
+    worker.close()
+
+
+class SlowLeases:
+    """sync() disk kilidi bekliyormuş gibi thread'i bloklar"""
+
+    def __init__(self):
+        self.owned = frozenset()
+        self.live_workers = 1
+        self.thread = None
+
+    def sync(self):
+        self.thread = threading.current_thread().name
+        time.sleep(0.2)
+        self.owned = frozenset(PROGRAMS)
+        return self.owned
+
+
+def test_lease_sync_does_not_block_event_loop(monkeypatch):
+    leases = SlowLeases()
+    monkeypatch.setattr(bot, 'PROGRAM_LEASES', leases)
+    ticks = []
+
+    async def ticker():
+        while True:
+            ticks.append(None)
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        task = asyncio.ensure_future(ticker())
+        await bot.sync_program_leases(None)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert leases.owned == set(PROGRAMS)
+    assert leases.thread.startswith('sqlite')
+    # Sync sürerken event loop diğer işleri çalıştırmaya devam etti
+    assert len(ticks) >= 10
+
+
+def test_shared_watches_are_synced_through_db_thread(db_path, monkeypatch):
+    store = WatchStore(db_path)
+    registry = bot.WatchRegistry()
+    monkeypatch.setattr(bot, 'WATCH_STORE', store)
+    monkeypatch.setattr(bot, 'WATCHES', registry)
+
+    async def scenario():
+        await bot.run_db(store.open)
+        registry.replace(await bot.run_db(store.load_all))
+
+        frontend = WatchStore(db_path)
+        frontend.open()
+        frontend.add(99, "P9", "20001")
+        frontend.remove(0, "P0", "10001")
+        frontend.close()
+
+        await bot.sync_shared_watches(None)
+        await bot.run_db(store.close)
+
+    asyncio.run(scenario())
+    assert registry.contains(99, "P9", "20001")
+    assert not registry.contains(0, "P0", "10001")
+    assert len(registry) == len(PROGRAMS)
+
+
+def test_shutdown_cancels_running_polls(monkeypatch):
+    monkeypatch.setattr(bot, 'POLL_TASKS', set())
+    application = SimpleNamespace(job_queue=None)
+
+    async def stuck_poll():
+        await asyncio.sleep(3600)  # OBS yanıt vermiyor
+
+    async def scenario():
+        task = asyncio.ensure_future(stuck_poll())
+        bot.POLL_TASKS.add(task)
+        task.add_done_callback(bot.POLL_TASKS.discard)
+        await asyncio.sleep(0)
+        await asyncio.wait_for(bot.cancel_program_polls(application), timeout=1)
+        return task
+
+    task = asyncio.run(scenario())
+    assert task.cancelled()
+    assert bot.POLL_TASKS == set()
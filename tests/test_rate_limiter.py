@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+from bot import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, PriorityTokenBucket
+
+
+def test_burst_passes_without_waiting():
+    limiter = PriorityTokenBucket(rate=1, burst=3)
+
+    async def scenario():
+        started = time.monotonic()
+        for _ in range(3):
+            await limiter.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) < 0.05
+    assert limiter.tokens < 1
+    assert limiter.stats()['background']['granted'] == 3
+
+
+def test_rate_limits_after_burst():
+    limiter = PriorityTokenBucket(rate=50, burst=1)
+
+    async def scenario():
+        started = time.monotonic()
+        for _ in range(4):
+            await limiter.acquire()
+        return time.monotonic() - started
+
+    # İlk token hazır, kalan üçü 20 ms arayla gelir
+    assert asyncio.run(scenario()) >= 3 / 50 * 0.9
+
+
+def test_interactive_waiters_go_first():
+    limiter = PriorityTokenBucket(rate=50, burst=1)
+    order = []
+
+    async def take(priority, name):
+        await limiter.acquire(priority)
+        order.append(name)
+
+    async def scenario():
+        await limiter.acquire()  # kovayı boşalt
+        background = [asyncio.ensure_future(take(PRIORITY_BACKGROUND, f"bg{i}")) for i in range(3)]
+        await asyncio.sleep(0)
+        interactive = asyncio.ensure_future(take(PRIORITY_INTERACTIVE, "user"))
+        await asyncio.gather(interactive, *background)
+
+    asyncio.run(scenario())
+    assert order == ["user", "bg0", "bg1", "bg2"]
+    stats = limiter.stats()
+    assert stats['interactive']['granted'] == 1
+    assert stats['background']['granted'] == 4
+    assert stats['background']['queue_depth'] == 0
+
+
+
+def test_cancelled_waiter_does_not_block_new_callers():
+    limiter = PriorityTokenBucket(rate=0.001, burst=1)
+
+    async def scenario():
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        # Token geri geldi; kuyruk başındaki iptal edilmiş bekleyen yeni isteği bekletmemeli
+        limiter.tokens = 1
+        await asyncio.wait_for(limiter.acquire(), timeout=0.5)
+        limiter.dispatcher.cancel()
+
+    asyncio.run(scenario())
+    assert limiter.stats()['background']['granted'] == 2
+
+
+def test_token_granted_to_cancelled_waiter_is_returned():
+    limiter = PriorityTokenBucket(rate=0.001, burst=2)
+
+    async def scenario():
+        await limiter.acquire()
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        # Dağıtıcının token verdiği anda bekleyen iptal edilir
+        future = limiter.waiters[PRIORITY_BACKGROUND].popleft()
+        future.set_result(None)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        limiter.dispatcher.cancel()
+        return waiter
+
+    waiter = asyncio.run(scenario())
+    assert waiter.cancelled()
+    assert 1 <= limiter.tokens < 1.01
+    assert limiter.stats()['background']['granted'] == 2
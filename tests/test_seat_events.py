@@ -0,0 +1,103 @@
+from bot import (
+    EVENT_CAPACITY_RAISED, EVENT_SEATS_CHANGED, EVENT_SEATS_OPENED, EVENT_SECTION_ADDED, EVENT_SECTION_REMOVED,
+    ProgramSnapshot, SeatEventBus, diff_snapshots,
+)
+
+
+def snapshot(*rows, partial=False):
+    """(crn, kontenjan, yazılan) üçlülerinden snapshot"""
+    return ProgramSnapshot.from_parsed(
+        [(crn, 'BLG 101E', 'Programlama', 'Pazartesi', '0830/1129', capacity, enrolled)
+         for crn, capacity, enrolled in rows], partial=partial)
+
+
+def kinds(events):
+    return sorted((event.kind, event.crn) for event in events)
+
+
+def test_first_snapshot_and_same_rows_have_no_events():
+    first = snapshot(('20001', 30, 30))
+    assert diff_snapshots('BLG', None, first) == []
+    assert diff_snapshots('BLG', first, first.refreshed()) == []
+    assert diff_snapshots('BLG', first, snapshot(('20001', 30, 30))) == []
+
+
+def test_section_added_and_removed():
+    old = snapshot(('20001', 30, 30), ('20002', 40, 40))
+    new = snapshot(('20001', 30, 30), ('20003', 25, 25))
+    assert kinds(diff_snapshots('BLG', old, new)) == [
+        (EVENT_SECTION_ADDED, '20003'),
+        (EVENT_SECTION_REMOVED, '20002'),
+    ]
+
+
+def test_added_section_with_free_seats_is_an_opening():
+    old = snapshot(('20001', 30, 30))
+    new = snapshot(('20001', 30, 30), ('20003', 25, 10))
+    assert kinds(diff_snapshots('BLG', old, new)) == [
+        (EVENT_SEATS_OPENED, '20003'),
+        (EVENT_SECTION_ADDED, '20003'),
+    ]
+
+
+def test_seat_opening():
+    events = diff_snapshots('BLG', snapshot(('20001', 30, 30)), snapshot(('20001', 30, 29)))
+    assert kinds(events) == [(EVENT_SEATS_CHANGED, '20001'), (EVENT_SEATS_OPENED, '20001')]
+    opened = [event for event in events if event.kind == EVENT_SEATS_OPENED][0]
+    assert (opened.old.enrolled, opened.new.enrolled) == (30, 29)
+
+
+def test_capacity_raised_still_full():
+    events = diff_snapshots('BLG', snapshot(('20001', 30, 30)), snapshot(('20001', 35, 35)))
+    assert kinds(events) == [(EVENT_CAPACITY_RAISED, '20001'), (EVENT_SEATS_CHANGED, '20001')]
+
+
+def test_capacity_raised_opens_seats():
+    events = diff_snapshots('BLG', snapshot(('20001', 30, 30)), snapshot(('20001', 35, 30)))
+    assert kinds(events) == [
+        (EVENT_CAPACITY_RAISED, '20001'),
+        (EVENT_SEATS_CHANGED, '20001'),
+        (EVENT_SEATS_OPENED, '20001'),
+    ]
+
+
+def test_partial_snapshot_skips_added_and_removed():
+    old = snapshot(('20001', 30, 30), ('20002', 40, 40))
+    new = snapshot(('20001', 30, 29), partial=True)
+    assert kinds(diff_snapshots('BLG', old, new)) == [
+        (EVENT_SEATS_CHANGED, '20001'),
+        (EVENT_SEATS_OPENED, '20001'),
+    ]
+
+
+def test_bus_publishes_diff_to_subscribers():
+    bus = SeatEventBus()
+    received = []
+    bus.subscribe(lambda program_code, events: received.append((program_code, kinds(events))))
+
+    assert bus.observe('BLG', snapshot(('20001', 30, 30))) == []
+    new = snapshot(('20001', 30, 29))
+    events = bus.observe('BLG', new)
+
+    assert received == [('BLG', [(EVENT_SEATS_CHANGED, '20001'), (EVENT_SEATS_OPENED, '20001')])]
+    assert all(event.observed_at == new.fetched_at for event in events)
+    assert bus.stats()['events'] == {EVENT_SEATS_CHANGED: 1, EVENT_SEATS_OPENED: 1}
+
+    # Unutulan programın bir sonraki snapshot'ı yine ilk snapshot sayılır
+    bus.forget('BLG')
+    assert bus.observe('BLG', snapshot(('20001', 30, 30))) == []
+    assert len(received) == 1
+
+
+def test_bus_survives_failing_subscriber():
+    bus = SeatEventBus()
+    received = []
+
+    @bus.subscribe
+    def broken(program_code, events):
+        raise RuntimeError("abone hatası")
+
+    bus.subscribe(lambda program_code, events: received.append(program_code))
+    bus.observe('BLG', snapshot(('20001', 30, 30)))
+    bus.observe('BLG', snapshot(('20001', 30, 29)))
+    assert received == ['BLG']
@@ -0,0 +1,163 @@
+import asyncio
+
+from bot import ProgramSnapshotCache
+
+
+class FakeSnapshot:
+    """Önbelleğin kullandığı alanlar: stale, age(), size_bytes"""
+
+    def __init__(self, name, size_bytes=10, age=0.0):
+        self.name = name
+        self.size_bytes = size_bytes
+        self.stale = False
+        self._age = age
+
+    def age(self):
+        return self._age
+
+
+def counting_loader(results):
+    """Sıradaki (snapshot, hata) sonucunu döndüren, çağrı sayısını tutan loader"""
+    calls = []
+
+    async def loader(previous):
+        calls.append(previous)
+        await asyncio.sleep(0)
+        return results[len(calls) - 1]
+
+    return loader, calls
+
+
+def test_fresh_entry_is_served_without_loader():
+    cache = ProgramSnapshotCache(ttl=15, max_bytes=1000)
+    first = FakeSnapshot('ilk')
+    loader, calls = counting_loader([(first, None)])
+
+    async def scenario():
+        assert await cache.get(1, loader) == (first, None)
+        assert await cache.get(1, loader) == (first, None)
+
+    asyncio.run(scenario())
+    assert len(calls) == 1
+    assert (cache.misses, cache.hits) == (1, 1)
+
+
+def test_expired_entry_is_reloaded_with_previous():
+    cache = ProgramSnapshotCache(ttl=15, max_bytes=1000)
+    old, new = FakeSnapshot('eski', age=20), FakeSnapshot('yeni')
+    cache.put(1, old)
+    loader, calls = counting_loader([(new, None)])
+
+    snapshot, error = asyncio.run(cache.get(1, loader))
+    assert (snapshot, error) == (new, None)
+    # Loader önceki snapshot'ı alır (koşullu istek/fark hesabı için)
+    assert calls == [old]
+
+
+def test_concurrent_requests_share_one_load():
+    cache = ProgramSnapshotCache(ttl=15, max_bytes=1000)
+    release = None
+    calls = []
+    snapshot = FakeSnapshot('tek')
+
+    async def slow_loader(previous):
+        calls.append(previous)
+        await release.wait()
+        return snapshot, None
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        waiters = [asyncio.ensure_future(cache.get(7, slow_loader)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*waiters)
+
+    results = asyncio.run(scenario())
+    assert results == [(snapshot, None)] * 5
+    assert len(calls) == 1
+    assert (cache.misses, cache.coalesced) == (1, 4)
+    assert cache.inflight == {}
+
+
+def test_error_returns_last_good_snapshot_as_stale():
+    cache = ProgramSnapshotCache(ttl=15, max_bytes=1000)
+    good = FakeSnapshot('iyi', age=30)
+    cache.put(1, good)
+    loader, _ = counting_loader([(None, "OBS yanıt vermedi")])
+
+    snapshot, error = asyncio.run(cache.get(1, loader))
+    assert snapshot is good and error is None
+    assert good.stale
+    assert cache.stale_served == 1
+
+
+def test_error_without_previous_snapshot_is_reported():
+    cache = ProgramSnapshotCache(ttl=15, max_bytes=1000)
+    loader, _ = counting_loader([(None, "OBS yanıt vermedi")])
+
+    assert asyncio.run(cache.get(1, loader)) == (None, "OBS yanıt vermedi")
+    assert cache.entries == {}
+
+
+def test_allow_stale_serves_immediately_and_refreshes_in_background():
+    cache = ProgramSnapshotCache(ttl=15, max_bytes=1000)
+    stale = FakeSnapshot('eski')
+    stale.stale = True
+    cache.put(1, stale)
+    fresh = FakeSnapshot('yeni')
+    loader, calls = counting_loader([(fresh, None)])
+
+    async def scenario():
+        served = await cache.get(1, loader, allow_stale=True)
+        # Arka plandaki yenileme bitsin
+        await asyncio.gather(*cache.inflight.values())
+        return served
+
+    assert asyncio.run(scenario()) == (stale, None)
+    assert calls == [stale]
+    assert cache.entries[1] is fresh
+
+
+def test_stale_entry_without_allow_stale_waits_for_reload():
+    cache = ProgramSnapshotCache(ttl=15, max_bytes=1000)
+    stale = FakeSnapshot('eski')
+    stale.stale = True
+    cache.put(1, stale)
+    fresh = FakeSnapshot('yeni')
+    loader, _ = counting_loader([(fresh, None)])
+
+    assert asyncio.run(cache.get(1, loader)) == (fresh, None)
+
+
+def test_byte_limit_evicts_least_recently_used():
+    cache = ProgramSnapshotCache(ttl=15, max_bytes=25)
+    a, b, c = FakeSnapshot('a'), FakeSnapshot('b'), FakeSnapshot('c')
+    cache.put(1, a)
+    cache.put(2, b)
+    # 1 kullanıldı: en az kullanılan artık 2
+    loader, _ = counting_loader([])
+    asyncio.run(cache.get(1, loader))
+    cache.put(3, c)
+
+    assert list(cache.entries) == [1, 3]
+    assert cache.total_bytes == 20
+    assert cache.evictions == 1
+
+
+def test_newest_entry_is_kept_even_if_over_limit():
+    cache = ProgramSnapshotCache(ttl=15, max_bytes=5)
+    cache.put(1, FakeSnapshot('küçük', size_bytes=4))
+    cache.put(2, FakeSnapshot('büyük', size_bytes=50))
+
+    assert list(cache.entries) == [2]
+    assert cache.total_bytes == 50
+
+
+def test_replacing_entry_updates_byte_count():
+    cache = ProgramSnapshotCache(ttl=15, max_bytes=1000)
+    cache.put(1, FakeSnapshot('a', size_bytes=100))
+    cache.put(1, FakeSnapshot('b', size_bytes=30))
+
+    assert cache.total_bytes == 30
+    assert cache.stats()['entries'] == 1
@@ -0,0 +1,120 @@
+import asyncio
+
+import httpx
+
+import bot
+
+HEADER = ['CRN', 'Ders Kodu', 'Ders Adı', 'Öğretim Yöntemi', 'Eğitmen', 'Bina',
+          'Gün', 'Saat', 'Derslik', 'Kontenjan', 'Yazılan']
+
+
+def course_row(crn, capacity=40, enrolled=40):
+    cells = [crn, 'BLG 101E', 'Bilgisayar', 'Yüz yüze', 'Ad Soyad', 'EEB',
+             'Pazartesi', '0830/1129', 'D101', str(capacity), str(enrolled)]
+    return '<tr>' + ''.join(f'<td>{cell}</td>' for cell in cells) + '</tr>'
+
+
+def page_chunks(rows, header=HEADER):
+    """Sayfayı satır başına bir parça olacak şekilde böl (akış okumasını gözlemlemek için)"""
+    head = '<html><body><table><thead><tr>' + ''.join(f'<th>{h}</th>' for h in header) + '</tr></thead><tbody>'
+    return [head.encode()] + [row.encode() for row in rows] + [b'</tbody></table></body></html>']
+
+
+class CountingStream(httpx.AsyncByteStream):
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.sent = 0
+        self.closed = False
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            self.sent += 1
+            yield chunk
+
+    async def aclose(self):
+        self.closed = True
+
+
+def run_scan(chunks, crn, status_code=200):
+    stream = CountingStream(chunks)
+
+    def handler(request):
+        return httpx.Response(status_code, stream=stream)
+
+    async def scenario():
+        bot.OBS_CLIENT = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        bot.OBS_SEMAPHORE = asyncio.Semaphore(1)
+        try:
+            return await bot.scan_course_stream(1, crn)
+        finally:
+            await bot.OBS_CLIENT.aclose()
+            bot.OBS_CLIENT = None
+
+    return asyncio.run(scenario()), stream
+
+
+def test_finds_row_and_parses_counts():
+    rows = [course_row('10001'), course_row('10002', capacity=30, enrolled=25), course_row('10003')]
+    row, _ = run_scan(page_chunks(rows), '10002')
+
+    assert row == ('10002', 'BLG 101E', 'Bilgisayar', 'Pazartesi', '0830/1129', 30, 25)
+
+
+def test_stops_reading_after_row():
+    rows = [course_row(str(10000 + i)) for i in range(50)]
+    chunks = page_chunks(rows)
+    row, stream = run_scan(chunks, '10003')
+
+    assert row[bot.ROW_CRN] == '10003'
+    assert stream.sent < len(chunks) // 2
+    assert stream.closed
+
+
+def test_missing_crn_reads_whole_page():
+    rows = [course_row(str(10000 + i)) for i in range(5)]
+    chunks = page_chunks(rows)
+    row, stream = run_scan(chunks, '99999')
+
+    assert row is None
+    assert stream.sent == len(chunks)
+
+
+def test_crn_digits_in_other_column_are_skipped():
+    # Önceki satırın Derslik ve Kontenjan hücrelerinde aynı rakamlar geçiyor
+    decoy = course_row('10001', capacity=10002, enrolled=5).replace('<td>D101</td>', '<td>10002</td>')
+    rows = [decoy, course_row('10002', capacity=30, enrolled=25)]
+    row, _ = run_scan(page_chunks(rows), '10002')
+
+    assert row == ('10002', 'BLG 101E', 'Bilgisayar', 'Pazartesi', '0830/1129', 30, 25)
+
+
+def test_crn_only_in_other_column_is_not_found():
+    rows = [course_row('10001').replace('<td>D101</td>', '<td>10002</td>')]
+    row, _ = run_scan(page_chunks(rows), '10002')
+
+    assert row is None
+
+
+def test_unknown_leading_column_is_skipped():
+    header = ['#'] + HEADER
+    # İlk satırın sıra hücresi aranan CRN'le aynı
+    rows = [f'<tr class="satir"><td>{number}</td>' + course_row(crn)[4:]
+            for number, crn in [('10001', '10002'), ('2', '10001')]]
+    row, _ = run_scan(page_chunks(rows, header=header), '10001')
+
+    assert row[bot.ROW_CRN] == '10001'
+    assert row[-2:] == (40, 40)
+
+
+def test_crn_not_first_column_falls_back():
+    # CRN'den önceki hücreler okunmadığı için akış taraması bu düzende çalışmaz
+    header = ['Ders Kodu', 'CRN'] + HEADER[2:]
+    row, _ = run_scan(page_chunks([course_row('10001')], header=header), '10001')
+
+    assert row is None
+
+
+def test_error_status_returns_none():
+    row, _ = run_scan(page_chunks([course_row('10001')]), '10001', status_code=503)
+
+    assert row is None
@@ -0,0 +1,129 @@
+import pytest
+
+import bot
+from bot import ChatActivity, WatchRegistry
+
+
+def test_add_and_remove():
+    registry = WatchRegistry()
+    assert registry.add(1, 'BLG', '20001')
+    assert not registry.add(1, 'BLG', '20001')  # tekrar eklenmez
+    assert registry.add(1, 'END', '12345')
+    assert registry.add(2, 'BLG', '20001')
+
+    assert len(registry) == 3
+    assert registry.chat_count() == 2
+    assert registry.contains(1, 'BLG', '20001')
+    assert registry.watches(1) == [('BLG', '20001'), ('END', '12345')]
+
+    assert registry.remove(1, 'BLG', '20001')
+    assert not registry.remove(1, 'BLG', '20001')
+    assert not registry.contains(1, 'BLG', '20001')
+    assert registry.contains(2, 'BLG', '20001')
+    assert len(registry) == 2
+
+
+def test_watchers_by_program():
+    registry = WatchRegistry()
+    registry.add(1, 'BLG', '20001')
+    registry.add(2, 'BLG', '20001')
+    registry.add(3, 'BLG', '20002')
+    registry.add(3, 'END', '12345')
+
+    watchers = registry.watchers('BLG')
+    assert sorted(watchers) == ['20001', '20002']
+    assert sorted(watchers['20001']) == [1, 2]
+    assert watchers['20002'] == [3]
+    assert registry.watch_count('BLG') == 3
+    assert sorted(registry.programs()) == ['BLG', 'END']
+
+    # Son takipçi gidince CRN ve program girdileri de silinir
+    registry.remove(3, 'END', '12345')
+    assert registry.watchers('END') == {}
+    assert registry.watch_count('END') == 0
+    assert registry.programs() == ['BLG']
+
+
+def test_remove_chat():
+    registry = WatchRegistry()
+    registry.add(1, 'BLG', '20001')
+    registry.add(1, 'END', '12345')
+    registry.add(2, 'BLG', '20001')
+
+    assert sorted(registry.remove_chat(1)) == [('BLG', '20001'), ('END', '12345')]
+    assert registry.remove_chat(1) == []
+    assert registry.watchers('BLG') == {'20001': [2]}
+    assert len(registry) == 1
+
+
+def test_replace():
+    registry = WatchRegistry()
+    registry.add(9, 'MAT', '30001')
+    registry.replace({1: [('BLG', '20001'), ('END', '12345')], 2: [('BLG', '20001')]})
+
+    assert not registry.contains(9, 'MAT', '30001')
+    assert registry.watchers('MAT') == {}
+    assert len(registry) == 3
+    assert registry.chat_count() == 2
+    assert sorted(registry.watchers('BLG')['20001']) == [1, 2]
+
+
+def test_leading_zeros_are_kept():
+    registry = WatchRegistry()
+    registry.add(1, 'BLG', '00123')
+
+    assert registry.contains(1, 'BLG', '00123')
+    assert not registry.contains(1, 'BLG', '123')
+    assert registry.watches(1) == [('BLG', '00123')]
+    assert registry.watchers('BLG') == {'00123': [1]}
+    assert registry.remove_chat(1) == [('BLG', '00123')]
+
+
+@pytest.mark.parametrize("crn", ['1234', '123456', '1234567890123', '+1234', ' 1234', '1_234', '١٢٣٤٥', ''])
+def test_invalid_crn(crn):
+    registry = WatchRegistry()
+    registry.add(1, 'BLG', '20001')
+
+    with pytest.raises(ValueError):
+        registry.add(1, 'BLG', crn)
+    # Sorgular hata vermez, sadece bulamaz
+    assert not registry.contains(1, 'BLG', crn)
+    assert not registry.remove(1, 'BLG', crn)
+    assert registry.key('BLG', crn) is None
+    assert len(registry) == 1
+    assert not bot.CRN_RE.fullmatch(crn)
+
+
+def test_replace_skips_invalid_crns():
+    registry = WatchRegistry()
+    registry.replace({1: [('BLG', '20001'), ('BLG', '1234567890')], 2: [('END', '123')]})
+
+    assert registry.watches(1) == [('BLG', '20001')]
+    assert len(registry) == 1
+
+
+def test_chat_activity_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(bot.time, 'time', lambda: now[0])
+    activity = ChatActivity(ttl=60)
+
+    activity.touch(1)
+    now[0] += 30
+    activity.touch(2)
+    assert activity.get(1) == 1000.0
+    assert len(activity) == 2
+
+    # 1'in son isteği ttl'i geçti: bir sonraki touch() onu atar, 2 kalır
+    now[0] += 40
+    activity.touch(3)
+    assert activity.get(1) is None
+    assert activity.get(2) == 1030.0
+    assert len(activity) == 2
+
+    # Yeniden istek gelen sohbet sıranın sonuna geçer; önündeki süresi dolan atılır
+    now[0] += 5
+    activity.touch(2)
+    now[0] += 58
+    activity.touch(4)
+    assert activity.get(3) is None
+    assert activity.get(2) == 1075.0
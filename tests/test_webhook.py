@@ -0,0 +1,72 @@
+import asyncio
+import socket
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import bot
+
+UPDATE = {"update_id": 1, "message": {"message_id": 1, "date": 0, "chat": {"id": 5, "type": "private"}, "text": "BLG 10001"}}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def webhook(monkeypatch):
+    port = free_port()
+    monkeypatch.setenv('PORT', str(port))
+    monkeypatch.setattr(bot, 'WEBHOOK_SECRET', 'gizli')
+    return f"http://127.0.0.1:{port}{bot.WEBHOOK_PATH}"
+
+
+def post_update(url, headers=None, **kwargs):
+    """Webhook sunucusunu başlat, tek istek at; (durum kodu, kuyruğa düşen update'ler) döndür"""
+    async def scenario():
+        application = SimpleNamespace(bot=None, update_queue=asyncio.Queue())
+        runner = await bot.start_webhook_server(application)
+        try:
+            async with httpx.AsyncClient() as client:
+                response = await client.post(url, headers=headers, **kwargs)
+        finally:
+            await runner.cleanup()
+        queued = []
+        while not application.update_queue.empty():
+            queued.append(application.update_queue.get_nowait())
+        return response.status_code, queued
+
+    return asyncio.run(scenario())
+
+
+def test_valid_secret_queues_update(webhook):
+    status, queued = post_update(webhook, {'X-Telegram-Bot-Api-Secret-Token': 'gizli'}, json=UPDATE)
+
+    assert status == 200
+    assert [update.update_id for update in queued] == [1]
+    assert queued[0].message.text == "BLG 10001"
+
+
+@pytest.mark.parametrize("headers", [
+    None,
+    {'X-Telegram-Bot-Api-Secret-Token': 'yanlis'},
+    {'X-Telegram-Bot-Api-Secret-Token': ''},
+    {'X-Telegram-Bot-Api-Secret-Token': 'gizl'},  # önek
+    {'X-Telegram-Bot-Api-Secret-Token': 'gizli2'},
+    {'X-Telegram-Bot-Api-Secret-Token': 'gizlı'.encode('utf-8')},  # ASCII dışı
+])
+def test_wrong_or_missing_secret_is_rejected(webhook, headers):
+    status, queued = post_update(webhook, headers, json=UPDATE)
+
+    assert status == 403
+    assert queued == []
+
+
+def test_invalid_body_is_rejected(webhook):
+    status, queued = post_update(webhook, {'X-Telegram-Bot-Api-Secret-Token': 'gizli'}, content=b"json degil")
+
+    assert status == 400
+    assert queued == []